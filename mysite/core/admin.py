@@ -1,9 +1,82 @@
+from django import forms
 from django.contrib import admin
-from .models import Profile, Residue, Collection, Reward, UserReward, PointsTransaction
+from django.utils import timezone
+from .models import (
+    Profile, Residue, ResidueType, Collection, Reward, UserReward, PointsTransaction, PointsRule, PointsCampaign, Task,
+)
+from .geo import set_coordinates
+from .residue_types import normalize_type, resolve_type
+from .services import sync_residue_status
 
 admin.site.register(Profile)
-admin.site.register(Residue)
-admin.site.register(Collection)
+
+class ResidueTypeForm(forms.ModelForm):
+    def clean_name(self):
+        name = ' '.join(self.cleaned_data['name'].split())
+        duplicate = ResidueType.objects.filter(key=normalize_type(name)).exclude(pk=self.instance.pk)
+        if duplicate.exists():
+            raise forms.ValidationError(f'Já existe o tipo "{duplicate.first()}" com este nome.')
+        return name
+
+@admin.register(ResidueType)
+class ResidueTypeAdmin(admin.ModelAdmin):
+    form = ResidueTypeForm
+    list_display = ('name', 'key', 'is_reviewed')
+    list_editable = ('is_reviewed',)
+    list_filter = ('is_reviewed',)
+    search_fields = ('key',)
+    readonly_fields = ('key',)
+
+    def save_model(self, request, obj, form, change):
+        obj.key = normalize_type(obj.name)
+        super().save_model(request, obj, form, change)
+        if change and 'name' in form.changed_data:
+            # Os resíduos guardam o nome do tipo; as linhas dos dashboards ficam
+            # em cache pelo updated_at da coleta
+            Residue.objects.filter(catalog_type=obj).update(residue_type=obj.name)
+            Collection.objects.filter(residue__catalog_type=obj).update(updated_at=timezone.now())
+
+@admin.register(Residue)
+class ResidueAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        if 'location' in form.changed_data:
+            set_coordinates(obj)
+        if 'residue_type' in form.changed_data or obj.catalog_type_id is None:
+            obj.catalog_type_id, obj.residue_type = resolve_type(obj.residue_type)
+        super().save_model(request, obj, form, change)
+        if change and {'residue_type', 'location'} & set(form.changed_data):
+            # As linhas dos dashboards ficam em cache pelo updated_at da coleta
+            Collection.objects.filter(residue=obj).update(updated_at=timezone.now())
+
+@admin.register(Collection)
+class CollectionAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        sync_residue_status([obj.id], statuses=[obj.status])
+
 admin.site.register(Reward)
 admin.site.register(UserReward)
-admin.site.register(PointsTransaction)
+
+@admin.register(PointsRule)
+class PointsRuleAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'points_per_kg', 'points_per_unit', 'minimum_points', 'maximum_points', 'is_active')
+
+@admin.register(PointsCampaign)
+class PointsCampaignAdmin(admin.ModelAdmin):
+    list_display = ('name', 'residue_type', 'multiplier', 'starts_at', 'ends_at')
+
+@admin.register(PointsTransaction)
+class PointsTransactionAdmin(admin.ModelAdmin):
+    # O extrato é a fonte da verdade dos saldos: apenas inclusões são permitidas
+    list_display = ('user', 'points_gained', 'transaction_date', 'description')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
@@ -8,3 +8,5 @@ class CoreConfig(AppConfig):
         # Importa os signals para que eles sejam registrados
         # quando a aplicação for iniciada.
         import core.signals
+        # Registra as tarefas da fila (core.tasks) definidas nos serviços.
+        import core.services
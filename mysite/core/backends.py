@@ -0,0 +1,20 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+class ProfileBackend(ModelBackend):
+    """
+    Backend de autenticação que carrega o usuário já com o Profile.
+
+    Os decorators de perfil (`citizen_required` etc.) e o menu do base.html
+    leem `request.user.profile` em toda requisição; com o JOIN feito aqui
+    esse acesso não custa uma consulta extra.
+    """
+
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        try:
+            user = UserModel._default_manager.select_related('profile').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
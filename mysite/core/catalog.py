@@ -0,0 +1,64 @@
+import time
+from bisect import bisect_right
+
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Reward
+
+CATALOG_VERSION_KEY = 'core:rewards:version'
+CATALOG_TIMEOUT = 60 * 60 * 24
+
+
+def _catalog_key(version):
+    return f'core:rewards:catalog:{version}'
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = invalidate_catalog()
+    return version
+
+
+def invalidate_catalog():
+    """
+    Troca a versão do catálogo; as entradas antigas expiram sozinhas.
+
+    A versão é baseada no relógio, e não em um contador, para que a perda da
+    chave de versão (reinício do cache, despejo) nunca reaproveite uma chave
+    com dados antigos.
+    """
+    version = time.time_ns()
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
+
+
+def active_rewards():
+    """
+    Retorna (recompensas ativas e com estoque, ordenadas por custo, lista de custos).
+
+    O resultado fica em cache até a próxima alteração de uma Reward ou até
+    o resgate que esgota uma recompensa.
+    """
+    key = _catalog_key(catalog_version())
+    catalog = cache.get(key)
+    if catalog is None:
+        rewards = list(
+            Reward.objects.filter(Q(stock__isnull=True) | Q(stock__gt=0), is_active=True)
+            .order_by('points_required', 'id')
+        )
+        catalog = (rewards, [reward.points_required for reward in rewards])
+        cache.set(key, catalog, CATALOG_TIMEOUT)
+    return catalog
+
+
+def split_by_affordability(points):
+    """
+    Divide o catálogo em (recompensas que o saldo cobre, demais).
+
+    Como os custos estão ordenados, basta uma busca binária pelo saldo.
+    """
+    rewards, costs = active_rewards()
+    index = bisect_right(costs, points)
+    return rewards[:index], rewards[index:]
@@ -0,0 +1,11 @@
+from django.conf import settings
+
+
+def fragment_cache(request):
+    """
+    Validade dos fragmentos de template em cache ({% cache fragment_timeout ... %}).
+
+    As chaves dos fragmentos incluem o `updated_at` do objeto, então uma
+    alteração gera uma chave nova e a entrada antiga apenas expira.
+    """
+    return {'fragment_timeout': settings.TEMPLATE_FRAGMENT_TIMEOUT}
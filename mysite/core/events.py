@@ -0,0 +1,139 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+# Canal dos eventos do pool de coletas em aberto
+COLLECTIONS_CHANNEL = 'collections'
+# Eventos mantidos por canal para clientes que reconectam com um cursor
+EVENT_BUFFER_SIZE = 1000
+
+
+class Broker(ABC):
+    """
+    Interface do pub/sub de eventos.
+
+    Eventos são dicionários que recebem um `id` crescente por canal; esse id
+    é o cursor com que o cliente pede as novidades. Implementações para
+    vários processos (Redis, PostgreSQL LISTEN/NOTIFY) podem ser configuradas
+    em settings.EVENTS_BROKER.
+    """
+
+    @abstractmethod
+    def publish(self, channel, payload):
+        """Publica `payload` no canal e retorna o evento, já com seu `id`."""
+
+    @abstractmethod
+    def latest(self, channel):
+        """Cursor do evento mais recente do canal (0 se não houver)."""
+
+    @abstractmethod
+    def since(self, channel, cursor):
+        """
+        Retorna (eventos posteriores a `cursor`, cursor atual), ou
+        (None, cursor atual) se o cursor for antigo demais ou desconhecido:
+        houve eventos que não podem mais ser entregues.
+        """
+
+    @abstractmethod
+    async def wait(self, channel, cursor, timeout):
+        """
+        Como `since`, mas aguarda até `timeout` segundos por um evento
+        posterior a `cursor` antes de retornar uma lista vazia.
+        """
+
+
+class InProcessBroker(Broker):
+    """
+    Broker em memória, para um único processo.
+
+    `publish` pode ser chamado de threads (views síncronas); os clientes
+    aguardando no event loop são acordados com `call_soon_threadsafe`.
+    """
+
+    def __init__(self, buffer_size=EVENT_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._events = {}
+        self._sequence = {}
+        self._waiters = {}
+
+    def publish(self, channel, payload):
+        with self._lock:
+            sequence = self._sequence.get(channel, 0) + 1
+            self._sequence[channel] = sequence
+            event = dict(payload, id=sequence)
+            self._events.setdefault(channel, deque(maxlen=self.buffer_size)).append(event)
+            waiters = self._waiters.pop(channel, [])
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(waiter.set)
+        return event
+
+    def latest(self, channel):
+        with self._lock:
+            return self._sequence.get(channel, 0)
+
+    def since(self, channel, cursor):
+        with self._lock:
+            latest = self._sequence.get(channel, 0)
+            events = self._events.get(channel, ())
+            oldest = events[0]['id'] if events else latest + 1
+            if cursor > latest or cursor < oldest - 1:
+                return None, latest
+            return [event for event in events if event['id'] > cursor], latest
+
+    async def wait(self, channel, cursor, timeout):
+        waiter = asyncio.Event()
+        with self._lock:
+            self._waiters.setdefault(channel, []).append((asyncio.get_running_loop(), waiter))
+        # Também ao ser cancelado (cliente desconectado): o waiter não pode
+        # ficar registrado até a próxima publicação
+        try:
+            events, latest = self.since(channel, cursor)
+            if events == []:
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                events, latest = self.since(channel, cursor)
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(channel, [])
+                self._waiters[channel] = [item for item in waiters if item[1] is not waiter]
+        return events, latest
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    Broker configurado em settings.EVENTS_BROKER (um por processo).
+    """
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(getattr(settings, 'EVENTS_BROKER', 'core.events.InProcessBroker'))()
+        return _broker
+
+
+def publish_collection_events(event_type, collection_ids):
+    """
+    Publica um evento por coleta ('created' ou 'claimed') após o commit da
+    transação atual, para que nenhum cliente veja coletas revertidas.
+    """
+    collection_ids = list(collection_ids)
+    if not collection_ids:
+        return
+
+    def publish():
+        broker = get_broker()
+        for collection_id in collection_ids:
+            broker.publish(COLLECTIONS_CHANNEL, {'type': event_type, 'collection_id': collection_id})
+
+    transaction.on_commit(publish)
@@ -0,0 +1,108 @@
+import csv
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Collection, PointsTransaction
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'json')
+
+COLLECTION_COLUMNS = (
+    ('id', 'id'),
+    ('processado_em', 'processed_at'),
+    ('tipo_residuo', 'residue__residue_type'),
+    ('peso_kg', 'residue__weight'),
+    ('unidades', 'residue__units'),
+    ('cidadao', 'residue__citizen__username'),
+    ('coletor', 'collector__username'),
+    ('recicladora', 'processed_by__username'),
+)
+
+LEDGER_COLUMNS = (
+    ('id', 'id'),
+    ('data', 'transaction_date'),
+    ('usuario', 'user__username'),
+    ('pontos', 'points_gained'),
+    ('descricao', 'description'),
+)
+
+
+def parse_date_range(start, end):
+    """
+    Converte datas AAAA-MM-DD (ambas inclusivas e opcionais) em limites
+    [início, fim) no fuso do projeto. Levanta ValueError se forem inválidas.
+    """
+    tz = timezone.get_current_timezone()
+    lower = upper = None
+    if start:
+        lower = timezone.make_aware(datetime.combine(datetime.strptime(start, '%Y-%m-%d'), time.min), tz)
+    if end:
+        upper_day = datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1)
+        upper = timezone.make_aware(datetime.combine(upper_day, time.min), tz)
+    return lower, upper
+
+
+def _date_filter(field, lower, upper):
+    lookups = {}
+    if lower is not None:
+        lookups[f'{field}__gte'] = lower
+    if upper is not None:
+        lookups[f'{field}__lt'] = upper
+    return lookups
+
+
+def processed_collections(lower=None, upper=None):
+    """
+    Coletas processadas no período, na ordem do índice (status, processed_at).
+    """
+    return Collection.objects.filter(
+        status='PROCESSADO', **_date_filter('processed_at', lower, upper)
+    ).order_by('processed_at', 'id').values_list(*(field for _, field in COLLECTION_COLUMNS))
+
+
+def ledger(lower=None, upper=None):
+    """
+    Transações de pontos do período, na ordem do índice (transaction_date, id).
+    """
+    return PointsTransaction.objects.filter(
+        **_date_filter('transaction_date', lower, upper)
+    ).order_by('transaction_date', 'id').values_list(*(field for _, field in LEDGER_COLUMNS))
+
+
+class Echo:
+    """
+    Pseudo-arquivo para o csv.writer: devolve a linha em vez de guardá-la.
+    """
+    def write(self, value):
+        return value
+
+
+def stream_rows(queryset, columns, export_format):
+    """
+    Gera o conteúdo da exportação pedaço a pedaço.
+
+    As linhas são lidas com `iterator(chunk_size=...)` e escritas assim que
+    chegam, de modo que a memória usada não depende do tamanho da exportação.
+    """
+    rows = queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    headers = [name for name, _ in columns]
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+        return
+
+    encoder = DjangoJSONEncoder()
+    yield '['
+    separator = '\n'
+    for row in rows:
+        yield separator + encoder.encode(dict(zip(headers, row)))
+        separator = ',\n'
+    yield '\n]\n'
+
+
+def content_type_for(export_format):
+    return 'text/csv; charset=utf-8' if export_format == 'csv' else 'application/json'
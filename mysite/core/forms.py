@@ -3,6 +3,7 @@ from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
 from django.db import transaction
 from .models import Profile, Residue, Collection
+from .residue_types import normalize_type, resolve_type
 
 class CustomUserCreationForm(UserCreationForm):
     USER_TYPE_CHOICES = (
@@ -26,9 +27,37 @@ class CustomUserCreationForm(UserCreationForm):
         user = super().save(commit=True)
         user.profile.user_type = self.cleaned_data.get('user_type')
         if commit:
-            user.profile.save()
+            user.profile.save(update_fields=['user_type'])
         return user
 
+def residue_type_errors(residue_type):
+    """
+    Regra do tipo de resíduo, usada pelo ResidueForm e pela importação em
+    lote: o nome precisa ter ao menos uma letra ou número além de acentos e
+    espaços, senão não há tipo do catálogo a que levá-lo.
+    """
+    if residue_type and not normalize_type(residue_type):
+        return [('residue_type', 'Informe um tipo de resíduo válido.')]
+    return []
+
+def quantity_errors(weight, units):
+    """
+    Regras de peso e unidades do resíduo, usadas pelo ResidueForm e pela
+    importação em lote. Retorna uma lista de (campo, mensagem); o campo é None
+    para erros que não pertencem a um campo específico.
+    """
+    if not weight and not units:
+        return [(None, "Você deve informar o Peso ou as Unidades do resíduo.")]
+
+    errors = []
+    if weight is not None and weight <= 0:
+        errors.append(('weight', 'O peso deve ser um valor maior que zero.'))
+
+    if units is not None and units <= 0:
+        errors.append(('units', 'A quantidade de unidades deve ser maior que zero.'))
+
+    return errors
+
 class ResidueForm(forms.ModelForm):
     collection_date = forms.DateField(
         label='Data para Coleta (Opcional)',
@@ -49,24 +78,36 @@ class ResidueForm(forms.ModelForm):
             'weight': 'Informe um valor aproximado.',
             'units': 'Se aplicável (ex: garrafas PET).',
         }
+        widgets = {
+            # Sugestões de core:residue_type_autocomplete (ver residue_form.html)
+            'residue_type': forms.TextInput(attrs={'list': 'residue-type-options', 'autocomplete': 'off'}),
+        }
+
+    def clean_residue_type(self):
+        residue_type = self.cleaned_data['residue_type']
+        for _, message in residue_type_errors(residue_type):
+            raise forms.ValidationError(message)
+        return residue_type
 
     def clean(self):
         cleaned_data = super().clean()
-        weight = cleaned_data.get('weight')
-        units = cleaned_data.get('units')
+        for field, message in quantity_errors(cleaned_data.get('weight'), cleaned_data.get('units')):
+            if field is None:
+                raise forms.ValidationError(message)
+            self.add_error(field, message)
 
-        if not weight and not units:
-            raise forms.ValidationError(
-                "Você deve informar o Peso ou as Unidades do resíduo."
-            )
-        
-        if weight is not None and weight <= 0:
-            self.add_error('weight', 'O peso deve ser um valor maior que zero.')
+        return cleaned_data
 
-        if units is not None and units <= 0:
-            self.add_error('units', 'A quantidade de unidades deve ser maior que zero.')
+    def save(self, commit=True):
+        # O tipo digitado é gravado com o nome do catálogo correspondente
+        residue = super().save(commit=False)
+        residue.catalog_type_id, residue.residue_type = resolve_type(residue.residue_type)
+        if commit:
+            residue.save()
+        return residue
 
-        return cleaned_data
+class CSVImportForm(forms.Form):
+    file = forms.FileField(label='Arquivo CSV', help_text='A primeira linha deve conter os nomes das colunas.')
 
 class CollectionStatusForm(forms.ModelForm):
     STATUS_TRANSITIONS = {
@@ -0,0 +1,156 @@
+import hashlib
+import math
+import re
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Precisão do geohash gravado no resíduo (~5 m)
+GEOHASH_PRECISION = 9
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+# Região usada pelo geocodificador offline: (sul, oeste, norte, leste)
+DEFAULT_GEOCODER_BOUNDS = (-23.80, -46.85, -23.35, -46.35)
+
+KM_PER_DEGREE = 111.32
+EARTH_RADIUS_KM = 6371.0
+
+COORDINATES_RE = re.compile(r'^\s*(-?\d+(?:\.\d+)?)\s*[,;]\s*(-?\d+(?:\.\d+)?)\s*$')
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        target, value = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (target[0] + target[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def geohash_bounds(geohash):
+    """
+    Retorna (lat mínima, lat máxima, lng mínima, lng máxima) da célula.
+    """
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = GEOHASH_ALPHABET.index(char)
+        for shift in range(4, -1, -1):
+            target = lng_range if even else lat_range
+            middle = (target[0] + target[1]) / 2
+            if value >> shift & 1:
+                target[0] = middle
+            else:
+                target[1] = middle
+            even = not even
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
+
+
+def geohash_neighbors(geohash):
+    """
+    A célula e suas oito vizinhas, de mesma precisão.
+    """
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(geohash)
+    height, width = lat_max - lat_min, lng_max - lng_min
+    center_lat, center_lng = (lat_min + lat_max) / 2, (lng_min + lng_max) / 2
+    cells = set()
+    for dlat in (-height, 0, height):
+        for dlng in (-width, 0, width):
+            latitude = center_lat + dlat
+            if not -90 <= latitude <= 90:
+                continue
+            longitude = (center_lng + dlng + 180) % 360 - 180
+            cells.add(encode_geohash(latitude, longitude, len(geohash)))
+    return sorted(cells)
+
+
+def next_geohash(geohash):
+    """
+    Primeiro geohash, na ordem do alfabeto base32, depois de todos os que
+    começam por `geohash` (ex.: '6gz' -> '6h'), ou None se não houver.
+
+    Só usa caracteres do alfabeto: a faixa [geohash, next_geohash) vale em
+    qualquer collation, ao contrário de um sufixo como '~', que collations
+    como en_US.UTF-8 ignoram no primeiro nível de comparação.
+    """
+    prefix = geohash.rstrip(GEOHASH_ALPHABET[-1])
+    if not prefix:
+        return None
+    return prefix[:-1] + GEOHASH_ALPHABET[GEOHASH_ALPHABET.index(prefix[-1]) + 1]
+
+
+def cell_radius_km(geohash):
+    """
+    Raio coberto com certeza pela célula e suas vizinhas: qualquer ponto a
+    essa distância de um ponto da célula está em uma das nove células.
+    """
+    lat_min, lat_max, lng_min, lng_max = geohash_bounds(geohash)
+    latitude = max(abs(lat_min), abs(lat_max))
+    height = (lat_max - lat_min) * KM_PER_DEGREE
+    width = (lng_max - lng_min) * KM_PER_DEGREE * math.cos(math.radians(latitude))
+    return min(height, width)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlambda = phi2 - phi1, math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def offline_geocode(address):
+    """
+    Geocodificador offline, usado enquanto não há um serviço real configurado.
+
+    Aceita coordenadas explícitas ("-23.55, -46.63"); para os demais endereços,
+    gera um ponto determinístico dentro de GEOCODER_BOUNDS a partir do texto
+    normalizado, de modo que o mesmo endereço sempre cai no mesmo lugar.
+    """
+    if not address or not address.strip():
+        return None
+    match = COORDINATES_RE.match(address)
+    if match:
+        latitude, longitude = float(match.group(1)), float(match.group(2))
+        if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+            return latitude, longitude
+    south, west, north, east = getattr(settings, 'GEOCODER_BOUNDS', DEFAULT_GEOCODER_BOUNDS)
+    normalized = ' '.join(address.lower().split())
+    digest = hashlib.sha1(normalized.encode()).digest()
+    lat_fraction = int.from_bytes(digest[:8], 'big') / 2 ** 64
+    lng_fraction = int.from_bytes(digest[8:16], 'big') / 2 ** 64
+    return south + (north - south) * lat_fraction, west + (east - west) * lng_fraction
+
+
+def geocode(address):
+    """
+    Converte um endereço em (latitude, longitude) com o geocodificador
+    configurado em settings.GEOCODER. Retorna None se não for possível.
+    """
+    geocoder = import_string(getattr(settings, 'GEOCODER', 'core.geo.offline_geocode'))
+    return geocoder(address)
+
+
+def set_coordinates(residue):
+    """
+    Preenche latitude, longitude e geohash do resíduo a partir do endereço.
+    Não salva o objeto.
+    """
+    point = geocode(residue.location)
+    if point is None:
+        residue.latitude = residue.longitude = None
+        residue.geohash = ''
+    else:
+        residue.latitude, residue.longitude = point
+        residue.geohash = encode_geohash(*point)
+    return residue
@@ -0,0 +1,154 @@
+import csv
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.forms.models import fields_for_model
+
+from .catalog import invalidate_catalog
+from .forms import ResidueForm, quantity_errors, residue_type_errors
+from .geo import set_coordinates
+from .models import Residue, Reward
+from .residue_types import resolve_types
+
+IMPORT_BATCH_SIZE = 500
+
+RESIDUE_COLUMNS = ('residue_type', 'weight', 'units', 'location', 'collection_date')
+REWARD_COLUMNS = ('name', 'description', 'points_required', 'is_active', 'stock', 'per_user_limit')
+REWARD_LABELS = {
+    'name': 'Nome',
+    'description': 'Descrição',
+    'points_required': 'Pontos Necessários',
+    'is_active': 'Ativa',
+    'stock': 'Estoque',
+    'per_user_limit': 'Limite por Usuário',
+}
+
+
+class ImportResult:
+    """
+    Resultado de uma importação: quantas linhas foram gravadas e os erros de
+    cada linha recusada, como (número da linha no arquivo, mensagem).
+    """
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    @property
+    def rejected(self):
+        return len({line for line, _ in self.errors})
+
+
+def _batches(reader, batch_size):
+    while True:
+        batch = []
+        for row in islice(reader, batch_size):
+            batch.append((reader.line_num, row))
+        if not batch:
+            return
+        yield batch
+
+
+def _clean_columns(batch, model, fields):
+    """
+    Valida o lote coluna a coluna com os campos de formulário de `fields`.
+
+    Cada campo é aplicado de uma vez a todas as linhas do lote, em vez de
+    instanciar um formulário por linha. Colunas vazias de campos do modelo
+    que têm valor padrão recebem esse valor. Retorna (valores, erros), ambos
+    com uma entrada por linha.
+    """
+    values = [{} for _ in batch]
+    errors = [[] for _ in batch]
+    for name, field in fields.items():
+        model_field = model._meta.get_field(name)
+        for index, (_, row) in enumerate(batch):
+            raw = (row.get(name) or '').strip()
+            if not raw and model_field.has_default():
+                values[index][name] = model_field.get_default()
+                continue
+            try:
+                values[index][name] = field.clean(raw)
+            except ValidationError as error:
+                errors[index].append((name, ' '.join(error.messages)))
+    return values, errors
+
+
+def _run_import(lines, model, fields, required_columns, validate, build, batch_size, prepare=None):
+    reader = csv.DictReader(lines)
+    missing = [column for column in required_columns if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f'Colunas obrigatórias ausentes no arquivo: {", ".join(missing)}.')
+
+    result = ImportResult()
+    # Um erro no arquivo (codificação, CSV malformado) em qualquer lote desfaz a
+    # importação inteira: nunca fica no banco só o começo do arquivo
+    with transaction.atomic():
+        for batch in _batches(reader, batch_size):
+            values, errors = _clean_columns(batch, model, fields)
+            objects = []
+            for (line, _), row_values, row_errors in zip(batch, values, errors):
+                if not row_errors:
+                    row_errors = validate(row_values)
+                if row_errors:
+                    result.errors.extend(
+                        (line, f'{fields[field].label}: {message}' if field else message)
+                        for field, message in row_errors
+                    )
+                    continue
+                objects.append(build(row_values))
+            if prepare is not None and objects:
+                prepare(objects)
+            model.objects.bulk_create(objects)
+            result.created += len(objects)
+    return result
+
+
+def import_residues(lines, citizen, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Cadastra em lote os resíduos de um CSV para o cidadão `citizen`.
+
+    `lines` é qualquer iterável de linhas de texto (um arquivo aberto, por
+    exemplo), lido em lotes de `batch_size` linhas: o arquivo nunca é
+    carregado inteiro. As linhas passam pelas mesmas regras do ResidueForm;
+    as válidas são gravadas com `bulk_create` e as inválidas, informadas no
+    resultado. O arquivo é importado em uma única transação. Os tipos de
+    resíduo de cada lote são levados ao catálogo de uma vez.
+    """
+    fields = {name: ResidueForm.base_fields[name] for name in RESIDUE_COLUMNS}
+
+    def validate(values):
+        return residue_type_errors(values['residue_type']) + quantity_errors(values['weight'], values['units'])
+
+    def build(values):
+        return set_coordinates(Residue(citizen=citizen, **values))
+
+    def prepare(residues):
+        types = resolve_types([residue.residue_type for residue in residues])
+        for residue in residues:
+            residue.catalog_type_id, residue.residue_type = types[residue.residue_type]
+
+    return _run_import(lines, Residue, fields, ('residue_type', 'location'), validate, build, batch_size, prepare)
+
+
+def import_rewards(lines, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Cadastra em lote as recompensas de um CSV, como `import_residues`.
+
+    O `bulk_create` não dispara signals, por isso o cache do catálogo é
+    invalidado explicitamente ao final.
+    """
+    fields = fields_for_model(Reward, fields=REWARD_COLUMNS, labels=REWARD_LABELS)
+
+    def validate(values):
+        if values['points_required'] <= 0:
+            return [('points_required', 'A quantidade de pontos deve ser maior que zero.')]
+        return []
+
+    def build(values):
+        return Reward(**values)
+
+    result = _run_import(lines, Reward, fields, ('name', 'points_required'), validate, build, batch_size)
+    if result.created:
+        invalidate_catalog()
+    return result
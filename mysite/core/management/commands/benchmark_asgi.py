@@ -0,0 +1,198 @@
+import asyncio
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+import django
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import Client
+
+from .benchmark_views import ROUTES, Command as BenchmarkViewsCommand
+
+# Dashboards de leitura servidos por views assíncronas
+DEFAULT_ROUTES = ('collector_dashboard', 'recycler_dashboard', 'collection_status', 'points_history', 'rewards_list')
+
+
+class Command(BenchmarkViewsCommand):
+    help = (
+        'Compara a vazão das rotas de leitura servidas pelo caminho WSGI (uma thread por '
+        'cliente) e pelo caminho ASGI (event loop), com clientes concorrentes, em uma base '
+        'de teste populada pelo seed_reciclai. Usa os handlers reais do Django, sem servidor HTTP.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--residues', type=int, default=20000, help='Tamanho da base gerada.')
+        parser.add_argument('--citizens', type=int, default=200)
+        parser.add_argument('--collectors', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--concurrency', type=int, default=20, help='Clientes simultâneos.')
+        parser.add_argument('--requests', type=int, default=200, help='Requisições por rota e modo.')
+        parser.add_argument('--routes', nargs='*', default=list(DEFAULT_ROUTES), help='Rotas GET a medir.')
+        parser.add_argument('--output', help='Arquivo JSON com os resultados.')
+        parser.add_argument(
+            '--use-existing-db', action='store_true',
+            help='Usa a base configurada em vez de criar e popular uma base de teste.',
+        )
+
+    def handle(self, *args, **options):
+        invalid = [name for name in options['routes'] if ROUTES.get(name, (None, None))[1] != 'get']
+        if invalid:
+            raise CommandError(f'Apenas rotas GET com cenário de benchmark: {", ".join(invalid)}')
+        if options['concurrency'] < 1 or options['requests'] < options['concurrency']:
+            raise CommandError('Use --concurrency >= 1 e --requests >= --concurrency.')
+
+        with self.benchmark_database(options):
+            results = {}
+            for name in options['routes']:
+                path, query, cookie = self.prepare(name)
+                results[name] = {
+                    'wsgi': self.run_wsgi(path, query, cookie, options['concurrency'], options['requests']),
+                    'asgi': asyncio.run(
+                        self.run_asgi(path, query, cookie, options['concurrency'], options['requests'])
+                    ),
+                }
+
+        self.report(results)
+        if options['output']:
+            payload = {
+                'meta': {
+                    'residues': None if options['use_existing_db'] else options['residues'],
+                    'concurrency': options['concurrency'],
+                    'requests': options['requests'],
+                    'database': connection.vendor,
+                    'django': django.get_version(),
+                    'python': platform.python_version(),
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w') as fp:
+                json.dump(payload, fp, indent=2, sort_keys=True)
+            self.stdout.write(f'Resultados gravados em {options["output"]}.')
+
+    def prepare(self, name):
+        """
+        Retorna (path, query string, cabeçalho Cookie) da requisição da rota,
+        com a sessão do usuário do perfil correspondente já criada.
+        """
+        user_type, _ = ROUTES[name]
+        cookie = ''
+        user = None
+        if user_type is not None:
+            user = self.user_for(user_type)
+            client = Client()
+            client.force_login(user)
+            cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        url, data = self.request_for(name, user)
+        parts = urlsplit(url)
+        query = '&'.join(filter(None, [parts.query, urlencode(data or {}, doseq=True)]))
+        return parts.path, query, cookie
+
+    def run_wsgi(self, path, query, cookie, concurrency, total):
+        handler = WSGIHandler()
+
+        def request():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'testserver', 'HTTP_COOKIE': cookie,
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr, 'wsgi.url_scheme': 'http',
+                'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            statuses = []
+            body = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            try:
+                b''.join(body)
+            finally:
+                body.close()
+            return int(statuses[0].split()[0])
+
+        def worker(count):
+            samples = []
+            for _ in range(count):
+                start = time.perf_counter()
+                status = request()
+                samples.append((time.perf_counter() - start, status))
+            return samples
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            start = time.perf_counter()
+            samples = [s for batch in pool.map(worker, self.split(total, concurrency)) for s in batch]
+            elapsed = time.perf_counter() - start
+        return self.summarize(samples, elapsed)
+
+    async def run_asgi(self, path, query, cookie, concurrency, total):
+        handler = ASGIHandler()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+            'root_path': '', 'headers': [(b'host', b'testserver'), (b'cookie', cookie.encode())],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+
+        async def request():
+            messages = []
+            finished = asyncio.Event()
+            body_sent = False
+
+            async def receive():
+                # Primeiro o corpo (vazio) da requisição; depois, como um
+                # servidor, só informa a desconexão após a resposta completa
+                nonlocal body_sent
+                if not body_sent:
+                    body_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                messages.append(message)
+                if message['type'] == 'http.response.body' and not message.get('more_body'):
+                    finished.set()
+
+            await handler(dict(scope), receive, send)
+            return messages[0]['status']
+
+        async def worker(count):
+            samples = []
+            for _ in range(count):
+                start = time.perf_counter()
+                status = await request()
+                samples.append((time.perf_counter() - start, status))
+            return samples
+
+        start = time.perf_counter()
+        batches = await asyncio.gather(*(worker(count) for count in self.split(total, concurrency)))
+        elapsed = time.perf_counter() - start
+        return self.summarize([s for batch in batches for s in batch], elapsed)
+
+    def split(self, total, parts):
+        return [total // parts + (1 if index < total % parts else 0) for index in range(parts)]
+
+    def summarize(self, samples, elapsed):
+        latencies = sorted(latency * 1000 for latency, _ in samples)
+        return {
+            'requests_per_second': round(len(samples) / elapsed, 1),
+            'p50_ms': round(statistics.median(latencies), 3),
+            'p95_ms': round(statistics.quantiles(latencies, n=20)[-1], 3),
+            'errors': sum(1 for _, status in samples if status != 200),
+        }
+
+    def report(self, results):
+        header = f'{"rota":<22} {"modo":<5} {"req/s":>8} {"p50 ms":>9} {"p95 ms":>9} {"erros":>6}'
+        self.stdout.write(self.style.MIGRATE_HEADING(header))
+        for name, modes in results.items():
+            for mode, result in modes.items():
+                line = (
+                    f'{name:<22} {mode:<5} {result["requests_per_second"]:>8.1f} {result["p50_ms"]:>9.2f} '
+                    f'{result["p95_ms"]:>9.2f} {result["errors"]:>6}'
+                )
+                self.stdout.write(self.style.ERROR(line) if result['errors'] else line)
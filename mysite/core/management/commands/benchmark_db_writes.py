@@ -0,0 +1,156 @@
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from core.models import Collection, Profile, Residue
+from core.residue_types import resolve_type
+from core.services import award_points, claim_collection
+
+# Configuração padrão do SQLite no Django: journal de rollback e o timeout
+# de 5 s do módulo sqlite3, para comparar com settings.SQLITE_PRAGMAS.
+SQLITE_BASELINE_PRAGMAS = {
+    'journal_mode': 'DELETE',
+    'synchronous': 'FULL',
+    'busy_timeout': 5000,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a vazão de escrita com threads concorrentes (créditos de pontos e aceite '
+        'de coletas) em uma base de teste do banco configurado. No SQLite, compara a '
+        'configuração padrão com settings.SQLITE_PRAGMAS (WAL) em uma base em arquivo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=200, help='Operações por thread.')
+        parser.add_argument('--citizens', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        old_test_name = test_settings.get('NAME')
+        directory = None
+        if vendor == 'sqlite':
+            # A base de teste em memória não tem journal nem WAL: usa um arquivo
+            directory = tempfile.mkdtemp()
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+            profiles = [
+                ('sqlite padrão', SQLITE_BASELINE_PRAGMAS),
+                ('sqlite WAL', settings.SQLITE_PRAGMAS),
+            ]
+        else:
+            profiles = [(vendor, None)]
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = []
+            for label, pragmas in profiles:
+                self.populate(options)
+                overrides = {} if pragmas is None else {'SQLITE_PRAGMAS': pragmas}
+                with override_settings(**overrides):
+                    # Novas conexões recebem os PRAGMAs do perfil
+                    connections.close_all()
+                    results.append((label, self.run(options)))
+                connections.close_all()
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = old_test_name
+            if directory is not None:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        header = f'{"perfil":<16} {"ops/s":>9} {"p50 ms":>9} {"p95 ms":>9} {"erros":>7}'
+        self.stdout.write(self.style.MIGRATE_HEADING(header))
+        for label, result in results:
+            self.stdout.write(
+                f'{label:<16} {result["ops_per_second"]:>9.1f} {result["p50_ms"]:>9.2f} '
+                f'{result["p95_ms"]:>9.2f} {result["errors"]:>7}'
+            )
+
+    def populate(self, options):
+        """
+        Recria os dados da carga: cidadãos, um coletor e uma coleta em aberto
+        para cada aceite que as threads vão tentar.
+        """
+        Collection.objects.all().delete()
+        Residue.objects.all().delete()
+        User.objects.all().delete()
+        password = make_password(None)
+        users = User.objects.bulk_create(
+            [User(username=f'bench_{i}', password=password) for i in range(options['citizens'] + 1)]
+        )
+        Profile.objects.bulk_create(
+            [Profile(user=user, user_type='C') for user in users[:-1]] + [Profile(user=users[-1], user_type='L')]
+        )
+        self.citizens, self.collector = users[:-1], users[-1]
+        claims = options['threads'] * options['operations'] // 2 + 1
+        catalog_type_id, residue_type = resolve_type('PET')
+        residues = Residue.objects.bulk_create([
+            Residue(
+                citizen=self.citizens[i % len(self.citizens)], residue_type=residue_type,
+                catalog_type_id=catalog_type_id, units=1, location='Rua A',
+            )
+            for i in range(claims)
+        ])
+        collections = Collection.objects.bulk_create([Collection(residue=residue) for residue in residues])
+        self.collection_ids = iter([collection.id for collection in collections])
+        self.ids_lock = threading.Lock()
+
+    def run(self, options):
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            local_latencies, local_errors = [], 0
+            try:
+                for operation in range(options['operations']):
+                    start = time.perf_counter()
+                    try:
+                        if operation % 2:
+                            with self.ids_lock:
+                                collection_id = next(self.collection_ids)
+                            claim_collection(collection_id, self.collector)
+                        else:
+                            award_points(rng.choice(self.citizens), 1, 'Benchmark de escrita')
+                    except OperationalError:
+                        local_errors += 1
+                        continue
+                    local_latencies.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                errors.append(local_errors)
+
+        threads = [
+            threading.Thread(target=worker, args=(seed,))
+            for seed in range(options['seed'], options['seed'] + options['threads'])
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency * 1000 for latency in latencies)
+        return {
+            'ops_per_second': len(latencies) / elapsed,
+            'p50_ms': statistics.median(latencies) if latencies else 0.0,
+            'p95_ms': statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0.0,
+            'errors': sum(errors),
+        }
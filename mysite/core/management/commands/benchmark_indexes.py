@@ -0,0 +1,145 @@
+import io
+import statistics
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.models import Collection, PointsTransaction, Profile, Residue
+from core.pagination import PAGE_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Mostra o plano (EXPLAIN) e o tempo das consultas mais usadas pelas views, '
+        'com e sem os índices definidos em Meta.indexes, em uma base de teste populada '
+        'pelo seed_reciclai e destruída ao final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--residues', type=int, default=20000, help='Tamanho da base gerada.')
+        parser.add_argument('--citizens', type=int, default=200)
+        parser.add_argument('--collectors', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--repeat', type=int, default=20, help='Execuções por consulta.')
+        parser.add_argument(
+            '--skip-without', action='store_true',
+            help='Não remove os índices temporariamente (mede apenas o cenário atual).',
+        )
+        parser.add_argument(
+            '--use-existing-db', action='store_true',
+            help='Usa a base configurada em vez de criar e popular uma base de teste.',
+        )
+        parser.add_argument(
+            '--drop-indexes', action='store_true',
+            help=(
+                'Com --use-existing-db, remove e recria os índices da base configurada para '
+                'medir o cenário sem eles. Trava as tabelas; nunca use em produção.'
+            ),
+        )
+
+    def handle(self, *args, **options):
+        if options['drop_indexes'] and not options['use_existing_db']:
+            raise CommandError('--drop-indexes só se aplica com --use-existing-db.')
+        old_name = None
+        if not options['use_existing_db']:
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            call_command(
+                'seed_reciclai', residues=options['residues'], citizens=options['citizens'],
+                collectors=options['collectors'], seed=options['seed'], verbosity=0,
+                stdout=io.StringIO(),
+            )
+        try:
+            self.benchmark(options)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def benchmark(self, options):
+        queries = self.hot_queries()
+        if not queries:
+            self.stderr.write('Base vazia: popule-a antes de rodar o benchmark.')
+            return
+
+        self.analyze()
+        with_indexes = self.run_queries(queries, options['repeat'], 'com índices')
+        if options['skip_without']:
+            return
+        if options['use_existing_db'] and not options['drop_indexes']:
+            # Os índices da base configurada só são removidos a pedido explícito
+            self.stdout.write('Cenário sem índices omitido; use --drop-indexes para medi-lo nesta base.')
+            return
+
+        models = (Collection, Residue, PointsTransaction)
+        self.set_indexes(models, add=False)
+        try:
+            self.analyze()
+            without_indexes = self.run_queries(queries, options['repeat'], 'sem índices')
+        finally:
+            self.set_indexes(models, add=True)
+            self.analyze()
+
+        self.stdout.write(self.style.MIGRATE_HEADING('Resumo (mediana em ms)'))
+        for name in queries:
+            before, after = without_indexes[name], with_indexes[name]
+            speedup = before / after if after else float('inf')
+            self.stdout.write(f'  {name:<28} sem: {before:9.3f}  com: {after:9.3f}  ({speedup:.1f}x)')
+
+    def hot_queries(self):
+        """
+        Reproduz as consultas das views, com a mesma ordenação e o mesmo
+        tamanho de página.
+        """
+        citizen = Profile.objects.filter(user_type='C').values_list('user_id', flat=True).first()
+        collector = Profile.objects.filter(user_type='L').values_list('user_id', flat=True).first()
+        if citizen is None or collector is None:
+            return {}
+        page = PAGE_SIZE + 1
+        return {
+            'coletas_disponiveis': Collection.objects.filter(status='SOLICITADA').order_by('created_at', 'id')[:page],
+            'coletas_do_coletor': Collection.objects.filter(
+                collector_id=collector, status__in=['ATRIBUIDA', 'EM_ROTA', 'COLETADA']
+            ).order_by('-updated_at'),
+            'fila_da_recicladora': Collection.objects.filter(
+                status='ENTREGUE_RECICLADORA'
+            ).order_by('updated_at', 'id')[:page],
+            'ultimas_processadas': Collection.objects.filter(status='PROCESSADO').order_by('-processed_at')[:10],
+            'coletas_do_cidadao': Collection.objects.filter(
+                residue__citizen_id=citizen
+            ).order_by('-updated_at', '-id')[:page],
+            'residuos_do_cidadao': Residue.objects.filter(citizen_id=citizen).order_by('-created_at', '-id')[:page],
+            'extrato_de_pontos': PointsTransaction.objects.filter(
+                user_id=citizen
+            ).order_by('-transaction_date', '-id')[:page],
+        }
+
+    def run_queries(self, queries, repeat, label):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'=== {label} ==='))
+        timings = {}
+        for name, queryset in queries.items():
+            list(queryset.all())  # aquecimento do cache de páginas do banco
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[name] = statistics.median(samples)
+            self.stdout.write(self.style.SUCCESS(f'{name}: {timings[name]:.3f} ms'))
+            self.stdout.write(queryset.explain())
+        return timings
+
+    def analyze(self):
+        # Atualiza as estatísticas do planner; sem isso o SQLite tende a
+        # ignorar índices parciais logo após a criação.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def set_indexes(self, models, add):
+        with connection.schema_editor() as schema_editor:
+            for model in models:
+                for index in model._meta.indexes:
+                    if add:
+                        schema_editor.add_index(model, index)
+                    else:
+                        schema_editor.remove_index(model, index)
@@ -0,0 +1,143 @@
+import os
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.db.models import Count, Sum
+
+from core.models import PointsTransaction, Profile, Reward, UserReward
+from core.services import claim_reward
+
+
+class Command(BaseCommand):
+    help = (
+        'Teste de carga dos resgates: centenas de threads resgatando ao mesmo tempo uma '
+        'recompensa de estoque limitado, em uma base de teste do banco configurado. '
+        'Mede resgates por segundo e confere que não houve venda além do estoque, do '
+        'limite por usuário ou do saldo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=300, help='Cidadãos resgatando ao mesmo tempo.')
+        parser.add_argument('--attempts', type=int, default=3, help='Tentativas de resgate por cidadão.')
+        parser.add_argument('--stock', type=int, default=500)
+        parser.add_argument('--per-user-limit', type=int, default=2)
+        parser.add_argument('--points', type=int, default=100, help='Saldo inicial de cada cidadão.')
+        parser.add_argument('--cost', type=int, default=30, help='Custo da recompensa em pontos.')
+
+    def handle(self, *args, **options):
+        test_settings = connection.settings_dict.setdefault('TEST', {})
+        old_test_name = test_settings.get('NAME')
+        directory = None
+        if connection.vendor == 'sqlite':
+            # Base em arquivo, com WAL e busy_timeout, como em produção
+            directory = tempfile.mkdtemp()
+            test_settings['NAME'] = os.path.join(directory, 'benchmark.sqlite3')
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            reward = self.populate(options)
+            connections.close_all()
+            result = self.run(reward, options)
+            problems = self.verify(reward, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            test_settings['NAME'] = old_test_name
+            if directory is not None:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        self.stdout.write(
+            f'{result["redeemed"]} resgates em {result["elapsed"]:.2f} s '
+            f'({result["redeemed"] / result["elapsed"]:.1f} resgates/s); '
+            f'p50 {result["p50_ms"]:.2f} ms, p95 {result["p95_ms"]:.2f} ms; '
+            f'{result["errors"]} erro(s) de banco.'
+        )
+        for reason, count in result['rejected'].most_common():
+            self.stdout.write(f'  {count:>6} recusa(s): {reason}')
+        if problems:
+            raise CommandError('Inconsistências encontradas:\n' + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('Nenhum resgate além do estoque, do limite ou do saldo.'))
+
+    def populate(self, options):
+        password = make_password(None)
+        users = User.objects.bulk_create(
+            [User(username=f'bench_{i}', password=password) for i in range(options['threads'])]
+        )
+        Profile.objects.bulk_create([Profile(user=user, user_type='C', points=options['points']) for user in users])
+        self.citizens = users
+        return Reward.objects.create(
+            name='Voucher do benchmark', points_required=options['cost'],
+            stock=options['stock'], per_user_limit=options['per_user_limit'],
+        )
+
+    def run(self, reward, options):
+        barrier = threading.Barrier(len(self.citizens))
+        lock = threading.Lock()
+        latencies, rejected, errors = [], Counter(), []
+
+        def worker(citizen):
+            local_latencies, local_rejected, local_errors = [], Counter(), 0
+            try:
+                barrier.wait()
+                for _ in range(options['attempts']):
+                    start = time.perf_counter()
+                    try:
+                        user_reward, error = claim_reward(citizen, reward)
+                    except OperationalError:
+                        local_errors += 1
+                        continue
+                    if user_reward is None:
+                        local_rejected[error] += 1
+                    else:
+                        local_latencies.append(time.perf_counter() - start)
+            finally:
+                connection.close()
+            with lock:
+                latencies.extend(local_latencies)
+                rejected.update(local_rejected)
+                errors.append(local_errors)
+
+        threads = [threading.Thread(target=worker, args=(citizen,)) for citizen in self.citizens]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency * 1000 for latency in latencies)
+        return {
+            'redeemed': len(latencies),
+            'elapsed': elapsed,
+            'p50_ms': statistics.median(latencies) if latencies else 0.0,
+            'p95_ms': statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else 0.0,
+            'rejected': rejected,
+            'errors': sum(errors),
+        }
+
+    def verify(self, reward, options):
+        """Confere o estado final do banco contra as regras do resgate."""
+        problems = []
+        reward.refresh_from_db()
+        redeemed = UserReward.objects.filter(reward=reward).count()
+        if redeemed + reward.stock != options['stock']:
+            problems.append(f'{redeemed} resgates registrados, mas o estoque caiu {options["stock"] - reward.stock}.')
+        over_limit = (
+            UserReward.objects.filter(reward=reward).values('user')
+            .annotate(total=Count('id')).filter(total__gt=options['per_user_limit']).count()
+        )
+        if over_limit:
+            problems.append(f'{over_limit} cidadão(s) acima do limite por usuário.')
+        if Profile.objects.filter(points__lt=0).exists():
+            problems.append('Saldo negativo.')
+        spent = -(PointsTransaction.objects.filter(points_gained__lt=0).aggregate(total=Sum('points_gained'))['total'] or 0)
+        if spent != redeemed * options['cost']:
+            problems.append(f'{spent} pontos debitados para {redeemed} resgates.')
+        return problems
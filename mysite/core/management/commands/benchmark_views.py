@@ -0,0 +1,282 @@
+import io
+import json
+import platform
+import statistics
+import time
+from contextlib import contextmanager
+
+import django
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models.signals import post_init
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from core import urls as core_urls
+from core.models import Collection, Profile, Residue, Reward
+
+# Nome da rota -> (perfil que faz a requisição, método HTTP).
+# Perfil None = visitante anônimo; 'staff' = usuário da equipe (is_staff).
+ROUTES = {
+    'public_index': (None, 'get'),
+    'signup': (None, 'get'),
+    'dashboard': ('C', 'get'),
+    'residue_list': ('C', 'get'),
+    'residue_create': ('C', 'post'),
+    'residue_import': ('C', 'post'),
+    'residue_type_autocomplete': ('C', 'get'),
+    'request_collection': ('C', 'post'),
+    'collection_status': ('C', 'get'),
+    'collection_changes': ('C', 'get'),
+    'points_history': ('C', 'get'),
+    'rewards_list': ('C', 'get'),
+    'redeem_reward': ('C', 'post'),
+    'collector_dashboard': ('L', 'get'),
+    'collector_route': ('L', 'get'),
+    'accept_collection': ('L', 'post'),
+    'claim_next': ('L', 'post'),
+    'collection_updates': ('L', 'get'),
+    'collection_events': ('L', 'get'),
+    'collection_transition': ('L', 'get'),
+    'bulk_collection_transition': ('L', 'post'),
+    'recycler_dashboard': ('R', 'get'),
+    'process_collection': ('R', 'post'),
+    'bulk_process': ('R', 'post'),
+    'export_collections': ('R', 'get'),
+    'export_ledger': ('staff', 'get'),
+    'reward_import': ('staff', 'post'),
+    'request_metrics': ('staff', 'get'),
+}
+
+# Linhas dos arquivos enviados nos cenários de importação
+IMPORT_ROWS = 500
+
+
+def read_content(response):
+    if not response.streaming:
+        return response.content
+    if response.is_async:
+        # Streams assíncronos (SSE) são lidos no event loop, como em um servidor ASGI
+        async def consume():
+            return b''.join([chunk async for chunk in response.streaming_content])
+        return async_to_sync(consume)()
+    return b''.join(response)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede latência (p50/p95), número de consultas, linhas carregadas e tamanho da '
+        'resposta de cada rota de core/urls.py, em uma base de teste populada pelo '
+        'seed_reciclai. Requisições que alteram dados são revertidas ao final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--residues', type=int, default=20000, help='Tamanho da base gerada.')
+        parser.add_argument('--citizens', type=int, default=200)
+        parser.add_argument('--collectors', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--repeat', type=int, default=20, help='Requisições por rota.')
+        parser.add_argument('--routes', nargs='*', help='Mede apenas estas rotas.')
+        parser.add_argument('--output', help='Arquivo JSON com os resultados.')
+        parser.add_argument('--compare', help='JSON de uma execução anterior para comparar.')
+        parser.add_argument(
+            '--use-existing-db', action='store_true',
+            help='Usa a base configurada em vez de criar e popular uma base de teste.',
+        )
+
+    def handle(self, *args, **options):
+        names = options['routes'] or self.route_names()
+        unknown = [name for name in names if name not in ROUTES]
+        if unknown:
+            raise CommandError(f'Rotas sem cenário de benchmark: {", ".join(unknown)}')
+
+        with self.benchmark_database(options):
+            results = {name: self.measure(name, options['repeat']) for name in names}
+
+        self.report(results)
+        if options['compare']:
+            with open(options['compare']) as fp:
+                self.compare(json.load(fp)['results'], results)
+        if options['output']:
+            payload = {
+                'meta': {
+                    'residues': None if options['use_existing_db'] else options['residues'],
+                    'repeat': options['repeat'],
+                    'seed': options['seed'],
+                    'database': connection.vendor,
+                    'django': django.get_version(),
+                    'python': platform.python_version(),
+                },
+                'results': results,
+            }
+            with open(options['output'], 'w') as fp:
+                json.dump(payload, fp, indent=2, sort_keys=True)
+            self.stdout.write(f'Resultados gravados em {options["output"]}.')
+
+    @contextmanager
+    def benchmark_database(self, options):
+        """
+        Base de teste populada pelo seed_reciclai (ou a base configurada, com
+        --use-existing-db), destruída ao final.
+        """
+        setup_test_environment()
+        old_name = None
+        if not options['use_existing_db']:
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            call_command(
+                'seed_reciclai', residues=options['residues'], citizens=options['citizens'],
+                collectors=options['collectors'], seed=options['seed'], verbosity=0,
+                stdout=io.StringIO(),
+            )
+        try:
+            yield
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def route_names(self):
+        return [pattern.name for pattern in core_urls.urlpatterns if pattern.name]
+
+    def user_for(self, user_type):
+        if user_type == 'staff':
+            user, _ = User.objects.get_or_create(username='benchmark_staff', defaults={'is_staff': True})
+            return user
+        profile = Profile.objects.filter(user_type=user_type).select_related('user').order_by('id').first()
+        if profile is None:
+            raise CommandError(f'Nenhum usuário do tipo {user_type} na base.')
+        return profile.user
+
+    def request_for(self, name, user):
+        """
+        Retorna (url, dados do POST) para a rota, escolhendo na base um objeto
+        válido para os parâmetros da URL.
+        """
+        data = None
+        if name == 'residue_create':
+            data = {'residue_type': 'Garrafa PET', 'units': 10, 'location': 'Rua do Benchmark, 1'}
+        elif name == 'residue_import':
+            rows = ''.join(f'Garrafa PET,,{i + 1},Rua do Benchmark {i},\n' for i in range(IMPORT_ROWS))
+            data = {'file': self.csv_file('residue_type,weight,units,location,collection_date\n' + rows)}
+        elif name == 'reward_import':
+            rows = ''.join(f'Brinde {i},Brinde do benchmark,{(i + 1) * 10},\n' for i in range(IMPORT_ROWS))
+            data = {'file': self.csv_file('name,description,points_required,is_active\n' + rows)}
+        elif name == 'residue_type_autocomplete':
+            data = {'q': 'pa'}
+        elif name == 'collection_events':
+            # Encerra o stream logo após o cabeçalho, em vez de manter a conexão aberta
+            data = {'timeout': 0}
+        elif name == 'claim_next':
+            data = {'quantity': 5}
+        elif name == 'request_collection':
+            residue = self.first(name, Residue.objects.filter(citizen=user, status='AGUARDANDO_SOLICITACAO_DE_COLETA'))
+            return reverse('core:request_collection', args=[residue.id]), data
+        elif name == 'redeem_reward':
+            reward = self.first(name, Reward.objects.filter(is_active=True).order_by('points_required'))
+            return reverse('core:redeem_reward', args=[reward.id]), data
+        elif name == 'accept_collection':
+            collection = self.first(name, Collection.objects.filter(status='SOLICITADA').order_by('created_at'))
+            return reverse('core:accept_collection', args=[collection.id]), data
+        elif name == 'collection_transition':
+            collection = self.first(name, Collection.objects.filter(collector=user, status='ATRIBUIDA'))
+            return reverse('core:collection_transition', args=[collection.id]), data
+        elif name == 'bulk_collection_transition':
+            ids = list(Collection.objects.filter(collector=user, status='ATRIBUIDA').values_list('id', flat=True)[:50])
+            data = {'collection_ids': ids, 'status': 'EM_ROTA'}
+        elif name == 'bulk_process':
+            ids = list(Collection.objects.filter(status='ENTREGUE_RECICLADORA').values_list('id', flat=True)[:50])
+            data = {'collection_ids': ids}
+        elif name == 'process_collection':
+            collection = self.first(name, Collection.objects.filter(status='ENTREGUE_RECICLADORA'))
+            return reverse('core:process_collection', args=[collection.id]), data
+        return reverse(f'core:{name}'), data
+
+    def csv_file(self, content):
+        return SimpleUploadedFile('benchmark.csv', content.encode(), content_type='text/csv')
+
+    def first(self, name, queryset):
+        obj = queryset.first()
+        if obj is None:
+            raise CommandError(f'A base não tem dados para o cenário da rota {name}; aumente a base gerada.')
+        return obj
+
+    def measure(self, name, repeat):
+        user_type, method = ROUTES[name]
+        client = Client()
+        user = None
+        if user_type is not None:
+            user = self.user_for(user_type)
+            client.force_login(user)
+        url, data = self.request_for(name, user)
+
+        rows = 0
+
+        def count_rows(sender, **kwargs):
+            nonlocal rows
+            rows += 1
+
+        latencies, queries, loaded, sizes = [], [], [], []
+        post_init.connect(count_rows)
+        try:
+            for _ in range(repeat + 1):
+                rows = 0
+                # Arquivos enviados são lidos a cada requisição; volta ao início
+                for value in (data or {}).values():
+                    if hasattr(value, 'seek'):
+                        value.seek(0)
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as ctx:
+                        start = time.perf_counter()
+                        response = getattr(client, method)(url, data)
+                        content = read_content(response)
+                        elapsed = (time.perf_counter() - start) * 1000
+                    transaction.set_rollback(True)
+                latencies.append(elapsed)
+                queries.append(len(ctx.captured_queries))
+                loaded.append(rows)
+                sizes.append(len(content))
+        finally:
+            post_init.disconnect(count_rows)
+
+        # A primeira requisição serve de aquecimento e não entra nas métricas.
+        latencies, queries, loaded, sizes = latencies[1:], queries[1:], loaded[1:], sizes[1:]
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        return {
+            'url': url,
+            'method': method.upper(),
+            'status': response.status_code,
+            'p50_ms': round(statistics.median(latencies), 3),
+            'p95_ms': round(p95, 3),
+            'queries': max(queries),
+            'rows': max(loaded),
+            'bytes': max(sizes),
+        }
+
+    def report(self, results):
+        header = f'{"rota":<28} {"status":>6} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8} {"linhas":>8} {"bytes":>9}'
+        self.stdout.write(self.style.MIGRATE_HEADING(header))
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<28} {result["status"]:>6} {result["p50_ms"]:>9.2f} {result["p95_ms"]:>9.2f} '
+                f'{result["queries"]:>8} {result["rows"]:>8} {result["bytes"]:>9}'
+            )
+
+    def compare(self, previous, results):
+        self.stdout.write(self.style.MIGRATE_HEADING('Comparação com a execução anterior'))
+        for name, result in results.items():
+            before = previous.get(name)
+            if before is None:
+                self.stdout.write(f'{name:<28} (nova rota)')
+                continue
+            line = (
+                f'{name:<28} p50 {before["p50_ms"]:.2f} -> {result["p50_ms"]:.2f} ms, '
+                f'queries {before["queries"]} -> {result["queries"]}, '
+                f'linhas {before["rows"]} -> {result["rows"]}'
+            )
+            regressed = result['queries'] > before['queries'] or result['p50_ms'] > before['p50_ms'] * 1.2
+            self.stdout.write(self.style.WARNING(line) if regressed else line)
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import exports
+
+DATASETS = {
+    'collections': (exports.processed_collections, exports.COLLECTION_COLUMNS),
+    'ledger': (exports.ledger, exports.LEDGER_COLUMNS),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta as coletas processadas ou o extrato de pontos em CSV ou JSON, '
+        'lendo a base em lotes para manter o uso de memória constante.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument('--format', choices=exports.EXPORT_FORMATS, default='csv')
+        parser.add_argument('--start', help='Data inicial (AAAA-MM-DD), inclusiva.')
+        parser.add_argument('--end', help='Data final (AAAA-MM-DD), inclusiva.')
+        parser.add_argument('--output', help='Arquivo de saída; por padrão, a saída padrão.')
+
+    def handle(self, *args, **options):
+        try:
+            lower, upper = exports.parse_date_range(options['start'], options['end'])
+        except ValueError:
+            raise CommandError('Datas inválidas. Use o formato AAAA-MM-DD.')
+
+        queryset_for, columns = DATASETS[options['dataset']]
+        chunks = exports.stream_rows(queryset_for(lower, upper), columns, options['format'])
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as fp:
+                fp.writelines(chunks)
+            self.stderr.write(f'Exportação gravada em {options["output"]}.')
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from core.geo import set_coordinates
+from core.models import Residue
+
+
+class Command(BaseCommand):
+    help = (
+        'Preenche latitude, longitude e geohash dos resíduos a partir do endereço. '
+        'Por padrão, apenas dos que ainda não têm coordenadas; use --all para recalcular todos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recalcula também os resíduos já geocodificados.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        queryset = Residue.objects.only('id', 'location').order_by('id')
+        if not options['all']:
+            queryset = queryset.filter(geohash='')
+
+        # Paginação por id: o filtro geohash='' muda conforme os lotes são gravados
+        last_id, total = 0, 0
+        while True:
+            batch = list(queryset.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            for residue in batch:
+                set_coordinates(residue)
+            Residue.objects.bulk_update(batch, ['latitude', 'longitude', 'geohash'])
+            last_id = batch[-1].id
+            total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'{total} resíduo(s) geocodificado(s).'))
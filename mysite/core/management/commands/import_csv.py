@@ -0,0 +1,49 @@
+import csv
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core import imports
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa resíduos ou recompensas de um arquivo CSV, com as mesmas regras de '
+        'validação do cadastro individual. O arquivo é lido em lotes e as linhas '
+        'válidas são gravadas com bulk_create; as inválidas são listadas. Um erro no '
+        'arquivo (codificação, CSV malformado) desfaz a importação inteira.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=['residues', 'rewards'])
+        parser.add_argument('path', help='Arquivo CSV (UTF-8) com cabeçalho.')
+        parser.add_argument('--citizen', help='Usuário dono dos resíduos importados (obrigatório para residues).')
+        parser.add_argument('--batch-size', type=int, default=imports.IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['dataset'] == 'residues':
+            if not options['citizen']:
+                raise CommandError('Informe --citizen para importar resíduos.')
+            citizen = User.objects.filter(username=options['citizen'], profile__user_type='C').first()
+            if citizen is None:
+                raise CommandError(f'Cidadão {options["citizen"]} não encontrado.')
+
+            def run_import(lines):
+                return imports.import_residues(lines, citizen, options['batch_size'])
+        else:
+            def run_import(lines):
+                return imports.import_rewards(lines, options['batch_size'])
+
+        try:
+            with open(options['path'], newline='', encoding='utf-8-sig') as fp:
+                result = run_import(fp)
+        except OSError as error:
+            raise CommandError(f'Não foi possível ler o arquivo: {error}')
+        except (ValueError, csv.Error) as error:
+            raise CommandError(f'Arquivo inválido: {error}. Nenhuma linha foi importada.')
+
+        for line, message in result.errors:
+            self.stdout.write(f'Linha {line}: {message}')
+        self.stdout.write(self.style.SUCCESS(f'{result.created} linha(s) importada(s).'))
+        if result.errors:
+            self.stdout.write(self.style.WARNING(f'{result.rejected} linha(s) recusada(s).'))
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from core.models import Collection, PointsStatistics, PointsTransaction, RecyclingStatistics
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula do zero as estatísticas materializadas (RecyclingStatistics e '
+        'PointsStatistics) a partir das coletas processadas e do extrato de pontos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        with transaction.atomic():
+            RecyclingStatistics.objects.all().delete()
+            PointsStatistics.objects.all().delete()
+            recycling = self.rebuild_recycling(batch_size)
+            points = self.rebuild_points(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Estatísticas recalculadas: {recycling} linha(s) de reciclagem, {points} de pontos.'
+        ))
+
+    def flush(self, model, rows, batch_size, force=False):
+        if rows and (force or len(rows) >= batch_size):
+            model.objects.bulk_create(rows, batch_size=batch_size)
+            return []
+        return rows
+
+    def rebuild_recycling(self, batch_size):
+        """
+        Agrega no banco e percorre o resultado em blocos com `iterator()`, para
+        que a memória usada não dependa do tamanho do histórico.
+        """
+        processed = Collection.objects.filter(status='PROCESSADO', residue__catalog_type__isnull=False).order_by()
+        aggregates = {
+            'weight': Sum('residue__weight'),
+            'units': Sum('residue__units'),
+            'collections': Count('id'),
+        }
+        owners = (
+            processed.values(owner=F('residue__citizen_id'), type=F('residue__catalog_type_id')),
+            processed.filter(processed_by__isnull=False).values(
+                owner=F('processed_by_id'), type=F('residue__catalog_type_id')
+            ),
+        )
+        total = 0
+        rows = []
+        for queryset in owners:
+            for row in queryset.annotate(**aggregates).iterator(chunk_size=batch_size):
+                rows.append(RecyclingStatistics(
+                    user_id=row['owner'],
+                    catalog_type_id=row['type'],
+                    weight=row['weight'] or 0,
+                    units=row['units'] or 0,
+                    collections=row['collections'],
+                ))
+                total += 1
+                rows = self.flush(RecyclingStatistics, rows, batch_size)
+        self.flush(RecyclingStatistics, rows, batch_size, force=True)
+        return total
+
+    def rebuild_points(self, batch_size):
+        aggregates = PointsTransaction.objects.order_by().values('user_id').annotate(
+            earned=Sum('points_gained', filter=Q(points_gained__gt=0)),
+            spent=Sum('points_gained', filter=Q(points_gained__lt=0)),
+        )
+        total = 0
+        rows = []
+        for row in aggregates.iterator(chunk_size=batch_size):
+            rows.append(PointsStatistics(
+                user_id=row['user_id'],
+                points_earned=row['earned'] or 0,
+                points_spent=-(row['spent'] or 0),
+            ))
+            total += 1
+            rows = self.flush(PointsStatistics, rows, batch_size)
+        self.flush(PointsStatistics, rows, batch_size, force=True)
+        return total
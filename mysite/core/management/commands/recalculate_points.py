@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import exports
+from core.models import Collection
+from core.services import rescore_collections
+
+COLUMNS = (
+    'id', 'residue__citizen_id', 'residue__residue_type', 'residue__weight', 'residue__units',
+    'processed_at', 'points_awarded',
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula pelas regras de pontuação vigentes os pontos das coletas já '
+        'processadas e credita (ou debita) a diferença de cada cidadão no extrato. '
+        'Percorre as coletas em lotes pontuados de uma vez.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Processadas a partir desta data (AAAA-MM-DD), inclusiva.')
+        parser.add_argument('--end', help='Processadas até esta data (AAAA-MM-DD), inclusiva.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--dry-run', action='store_true', help='Apenas informa as diferenças.')
+
+    def handle(self, *args, **options):
+        try:
+            lower, upper = exports.parse_date_range(options['start'], options['end'])
+        except ValueError:
+            raise CommandError('Datas inválidas. Use o formato AAAA-MM-DD.')
+
+        # Coletas ainda sem pontos estão na fila de crédito e ficam com o worker
+        queryset = Collection.objects.filter(status='PROCESSADO', points_awarded__isnull=False)
+        if lower is not None:
+            queryset = queryset.filter(processed_at__gte=lower)
+        if upper is not None:
+            queryset = queryset.filter(processed_at__lt=upper)
+
+        start = time.perf_counter()
+        scanned = changed = net = 0
+        citizens = set()
+        last_id = 0
+        while True:
+            # Paginação por id: cada lote é uma consulta pelo índice da chave primária
+            rows = list(queryset.filter(id__gt=last_id).order_by('id').values_list(*COLUMNS)[:options['batch_size']])
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            batch_changed, deltas = rescore_collections(rows, apply=not options['dry_run'])
+            scanned += len(rows)
+            changed += len(batch_changed)
+            net += sum(deltas.values())
+            citizens.update(deltas)
+        elapsed = time.perf_counter() - start
+
+        verb = 'seriam alteradas' if options['dry_run'] else 'alteradas'
+        self.stdout.write(self.style.SUCCESS(
+            f'{scanned} coleta(s) analisada(s) em {elapsed:.2f} s, {changed} {verb}; '
+            f'diferença líquida de {net} ponto(s) para {len(citizens)} cidadão(s).'
+        ))
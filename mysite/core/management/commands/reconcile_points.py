@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from core.models import PointsTransaction, Profile
+
+
+def ledger_balance():
+    """
+    Subquery com a soma do extrato (PointsTransaction) do usuário do perfil.
+    """
+    totals = PointsTransaction.objects.filter(user=OuterRef('user')).order_by().values('user').annotate(
+        total=Sum('points_gained')
+    ).values('total')
+    return Coalesce(Subquery(totals, output_field=IntegerField()), 0)
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula o saldo de cada perfil a partir do extrato de pontos, que é a fonte '
+        'da verdade, e informa as divergências. Use --fix para corrigir os saldos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Grava o saldo do extrato nos perfis divergentes.')
+
+    def handle(self, *args, **options):
+        drifted = Profile.objects.annotate(ledger_points=ledger_balance()).exclude(points=F('ledger_points'))
+        rows = list(drifted.values_list('id', 'user__username', 'points', 'ledger_points'))
+
+        if not rows:
+            self.stdout.write(self.style.SUCCESS('Nenhuma divergência entre saldos e extrato.'))
+            return
+
+        for _, username, points, ledger_points in rows:
+            self.stdout.write(f'{username}: saldo {points}, extrato {ledger_points} (diferença {points - ledger_points})')
+        self.stdout.write(self.style.WARNING(f'{len(rows)} perfil(is) com divergência.'))
+
+        if options['fix']:
+            ids = [row[0] for row in rows]
+            fixed = Profile.objects.filter(id__in=ids).update(points=ledger_balance())
+            self.stdout.write(self.style.SUCCESS(f'{fixed} saldo(s) corrigido(s).'))
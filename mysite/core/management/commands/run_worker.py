@@ -0,0 +1,74 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+
+from core.models import Task
+from core.tasks import TASK_BATCH_SIZE, run_pending
+
+
+class Command(BaseCommand):
+    help = (
+        'Executa as tarefas da fila em banco (crédito de pontos, estatísticas e '
+        'notificações) com um pool de threads, cada uma com sua própria conexão.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Threads consumindo a fila.')
+        parser.add_argument('--batch-size', type=int, default=TASK_BATCH_SIZE, help='Tarefas reivindicadas por vez.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Espera (s) quando a fila está vazia.')
+        parser.add_argument('--once', action='store_true', help='Esvazia a fila e termina.')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('Use --workers >= 1 e --batch-size >= 1.')
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        totals = {'claimed': 0, 'errors': 0}
+
+        def worker():
+            try:
+                while not stop.is_set():
+                    close_old_connections()
+                    try:
+                        claimed = run_pending(options['batch_size'])
+                    except OperationalError:
+                        # Banco ocupado: tenta de novo depois da espera
+                        with lock:
+                            totals['errors'] += 1
+                        stop.wait(options['poll_interval'])
+                        continue
+                    with lock:
+                        totals['claimed'] += claimed
+                    if not claimed:
+                        if options['once']:
+                            return
+                        stop.wait(options['poll_interval'])
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(options['workers'])]
+        start = time.perf_counter()
+        self.stdout.write(f'{len(threads)} worker(s) consumindo a fila.')
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write('Encerrando após as tarefas em andamento...')
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'{totals["claimed"]} tarefa(s) executada(s) em {elapsed:.2f} s; '
+            f'{totals["errors"]} erro(s) de banco ao reivindicar.'
+        )
+        failed = Task.objects.filter(status='FALHOU').count()
+        if failed:
+            self.stdout.write(self.style.WARNING(f'{failed} tarefa(s) falharam após todas as tentativas.'))
@@ -0,0 +1,265 @@
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from core.geo import set_coordinates
+from core.models import Collection, PointsTransaction, Profile, Residue, ResidueType, Reward, UserReward
+from core.points import get_evaluator
+from core.residue_types import invalidate_types, resolve_types
+
+RESIDUE_TYPES = (
+    'Garrafa PET', 'Papelão', 'Vidro', 'Alumínio', 'Papel',
+    'Óleo de Cozinha', 'Eletrônicos', 'Plástico', 'Metal', 'Tetra Pak',
+)
+
+# Distribuição dos resíduos por status da coleta; None = coleta ainda não solicitada.
+COLLECTION_STATUS_WEIGHTS = (
+    (None, 15),
+    ('SOLICITADA', 15),
+    ('ATRIBUIDA', 5),
+    ('EM_ROTA', 5),
+    ('COLETADA', 5),
+    ('ENTREGUE_RECICLADORA', 10),
+    ('PROCESSADO', 40),
+    ('CANCELADA', 5),
+)
+
+SEED_PASSWORD = 'password'
+
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """
+    Desliga temporariamente auto_now/auto_now_add para que o bulk_create
+    grave as datas geradas em vez de `timezone.now()`.
+    """
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    try:
+        for field, _, _ in saved:
+            field.auto_now = field.auto_now_add = False
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = (
+        'Popula a base com dados sintéticos para testes de desempenho. Usa bulk_create '
+        'em lotes (sem disparar os signals de post_save) e é reproduzível via --seed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--citizens', type=int, default=1000)
+        parser.add_argument('--collectors', type=int, default=50)
+        parser.add_argument('--recyclers', type=int, default=5)
+        parser.add_argument('--residues', type=int, default=100000)
+        parser.add_argument('--rewards', type=int, default=20)
+        parser.add_argument('--redemptions', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--days', type=int, default=365, help='Janela de datas dos registros gerados.')
+        parser.add_argument(
+            '--start', default='2025-01-01',
+            help='Data inicial (AAAA-MM-DD) da janela; fixa para que a base seja reproduzível.',
+        )
+        parser.add_argument('--prefix', default='seed_', help='Prefixo dos usernames criados.')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.prefix = options['prefix']
+        start = datetime.strptime(options['start'], '%Y-%m-%d')
+        self.start = timezone.make_aware(start, timezone.get_default_timezone())
+        self.window = timedelta(days=options['days']).total_seconds()
+
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Já existem usuários com o prefixo "{self.prefix}"; use outro --prefix.'
+            )
+
+        began = time.perf_counter()
+        citizens = self.create_users('cidadao', 'C', options['citizens'])
+        collectors = self.create_users('coletor', 'L', options['collectors'])
+        recyclers = self.create_users('recicladora', 'R', options['recyclers'])
+        if not citizens or not collectors:
+            raise CommandError('São necessários ao menos um cidadão e um coletor.')
+
+        points = dict.fromkeys(citizens, 0)
+        timestamp_fields = (
+            Residue._meta.get_field('created_at'),
+            Collection._meta.get_field('created_at'),
+            Collection._meta.get_field('updated_at'),
+            PointsTransaction._meta.get_field('transaction_date'),
+            UserReward._meta.get_field('date_redeemed'),
+        )
+        with explicit_timestamps(*timestamp_fields):
+            processed = self.create_residues_and_collections(
+                options['residues'], citizens, collectors, recyclers, points
+            )
+            rewards = self.create_rewards(options['rewards'])
+            self.create_redemptions(options['redemptions'], rewards, points)
+        self.update_balances(points)
+        call_command('rebuild_statistics', batch_size=self.batch_size, stdout=self.stdout)
+
+        elapsed = time.perf_counter() - began
+        self.stdout.write(self.style.SUCCESS(
+            f'Base populada em {elapsed:.1f}s ({processed} coletas processadas). '
+            f'Senha de todos os usuários: "{SEED_PASSWORD}".'
+        ))
+
+    def timestamp(self, fraction):
+        return self.start + timedelta(seconds=self.window * fraction)
+
+    def batches(self, total):
+        for offset in range(0, total, self.batch_size):
+            yield offset, min(self.batch_size, total - offset)
+
+    def create_users(self, role, user_type, count):
+        password = make_password(SEED_PASSWORD)
+        ids = []
+        for offset, size in self.batches(count):
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'{self.prefix}{role}_{offset + i}', password=password)
+                    for i in range(size)
+                ])
+                Profile.objects.bulk_create([
+                    Profile(user_id=user.pk, user_type=user_type) for user in users
+                ])
+            ids.extend(user.pk for user in users)
+        self.stdout.write(f'{count} usuários do tipo {role} criados.')
+        return ids
+
+    def create_residues_and_collections(self, count, citizens, collectors, recyclers, points):
+        statuses = [status for status, _ in COLLECTION_STATUS_WEIGHTS]
+        weights = [weight for _, weight in COLLECTION_STATUS_WEIGHTS]
+        # Pontos das coletas processadas pelas regras vigentes (core.points)
+        evaluator = get_evaluator()
+        types = resolve_types(RESIDUE_TYPES)
+        # Os tipos da carga são uma lista curada: já entram revisados
+        ResidueType.objects.filter(id__in=[type_id for type_id, _ in types.values()]).update(is_reviewed=True)
+        invalidate_types()
+        processed = 0
+        for offset, size in self.batches(count):
+            rows = []
+            for i in range(size):
+                status = self.rng.choices(statuses, weights)[0]
+                created_at = self.timestamp((offset + i) / count)
+                if status is None:
+                    residue_status = 'AGUARDANDO_SOLICITACAO_DE_COLETA'
+                elif status == 'PROCESSADO':
+                    residue_status = 'PROCESSADO'
+                else:
+                    residue_status = 'COLETA_SOLICITADA'
+                weight, units = None, None
+                if self.rng.random() < 0.5:
+                    weight = Decimal(self.rng.randint(10, 5000)) / 100
+                else:
+                    units = self.rng.randint(1, 200)
+                catalog_type_id, residue_type = types[self.rng.choice(RESIDUE_TYPES)]
+                residue = set_coordinates(Residue(
+                    citizen_id=self.rng.choice(citizens),
+                    residue_type=residue_type,
+                    catalog_type_id=catalog_type_id,
+                    weight=weight,
+                    units=units,
+                    location=f'Rua {self.rng.randint(1, 2000)}, {self.rng.randint(1, 999)}',
+                    status=residue_status,
+                    created_at=created_at,
+                ))
+                rows.append((residue, status))
+
+            with transaction.atomic():
+                Residue.objects.bulk_create([residue for residue, _ in rows])
+                collections = []
+                ledger = []
+                for residue, status in rows:
+                    if status is None:
+                        continue
+                    requested_at = residue.created_at + timedelta(hours=self.rng.randint(1, 48))
+                    updated_at = requested_at + timedelta(hours=self.rng.randint(0, 240))
+                    collection = Collection(
+                        residue_id=residue.pk,
+                        status=status,
+                        collector_id=None if status == 'SOLICITADA' else self.rng.choice(collectors),
+                        created_at=requested_at,
+                        updated_at=updated_at if status != 'SOLICITADA' else requested_at,
+                    )
+                    if status == 'PROCESSADO':
+                        collection.processed_at = updated_at
+                        collection.processed_by_id = self.rng.choice(recyclers) if recyclers else None
+                        collection.points_awarded = evaluator.score(
+                            residue.residue_type, residue.weight, residue.units, updated_at
+                        )
+                        points[residue.citizen_id] += collection.points_awarded
+                        ledger.append(PointsTransaction(
+                            user_id=residue.citizen_id,
+                            points_gained=collection.points_awarded,
+                            transaction_date=updated_at,
+                            description=f'Coleta de {residue.residue_type} processada.',
+                        ))
+                    collections.append(collection)
+                Collection.objects.bulk_create(collections)
+                PointsTransaction.objects.bulk_create(ledger)
+            processed += len(ledger)
+            self.stdout.write(f'  {offset + size}/{count} resíduos criados.')
+        return processed
+
+    def create_rewards(self, count):
+        rewards = Reward.objects.bulk_create([
+            Reward(
+                name=f'Recompensa {i + 1}',
+                description='Recompensa gerada para testes de desempenho.',
+                points_required=self.rng.randint(1, 50) * 10,
+                is_active=self.rng.random() < 0.9,
+            )
+            for i in range(count)
+        ])
+        self.stdout.write(f'{count} recompensas criadas.')
+        return [reward for reward in rewards if reward.is_active]
+
+    def create_redemptions(self, count, rewards, points):
+        if not rewards:
+            return
+        citizens = list(points)
+        for offset, size in self.batches(count):
+            redeemed = []
+            ledger = []
+            for _ in range(size):
+                citizen = self.rng.choice(citizens)
+                reward = self.rng.choice(rewards)
+                if points[citizen] < reward.points_required:
+                    continue
+                points[citizen] -= reward.points_required
+                redeemed_at = self.timestamp(self.rng.random())
+                redeemed.append(UserReward(user_id=citizen, reward_id=reward.pk, date_redeemed=redeemed_at))
+                ledger.append(PointsTransaction(
+                    user_id=citizen,
+                    points_gained=-reward.points_required,
+                    transaction_date=redeemed_at,
+                    description=f'Resgate da recompensa: {reward.name}',
+                ))
+            with transaction.atomic():
+                UserReward.objects.bulk_create(redeemed)
+                PointsTransaction.objects.bulk_create(ledger)
+        self.stdout.write('Resgates de recompensas criados.')
+
+    def update_balances(self, points):
+        citizens = list(points)
+        for offset, size in self.batches(len(citizens)):
+            chunk = citizens[offset:offset + size]
+            profiles = list(Profile.objects.filter(user_id__in=chunk).only('id', 'user_id'))
+            for profile in profiles:
+                profile.points = points[profile.user_id]
+            Profile.objects.bulk_update(profiles, ['points'])
+        self.stdout.write('Saldos de pontos atualizados.')
@@ -0,0 +1,137 @@
+import bisect
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+# Limites superiores (ms) das faixas do histograma de latência
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Limites superiores das faixas do histograma de consultas por requisição
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+# Consultas repetidas mostradas no log de requisições lentas
+REPEATED_QUERIES_SHOWN = 5
+
+# Medição da requisição em andamento. Views assíncronas executam o ORM em
+# threads via sync_to_async, que copia o contexto: as consultas feitas
+# nessas threads continuam sendo atribuídas à requisição certa.
+_current = ContextVar('core_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Consultas de uma requisição: quantidade, tempo total de SQL e quantas
+    vezes cada comando (com os parâmetros como placeholders) foi executado.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, sql, seconds):
+        with self._lock:
+            self.queries += 1
+            self.sql_seconds += seconds
+            self.statements[sql] += 1
+
+    def repeated_statements(self, limit=REPEATED_QUERIES_SHOWN):
+        """Comandos executados mais de uma vez, do mais repetido ao menos (N+1)."""
+        return [(sql, count) for sql, count in self.statements.most_common(limit) if count > 1]
+
+
+def start_request():
+    """Começa a medir a requisição atual; devolve (métricas, token do contexto)."""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def finish_request(token):
+    _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper (connection.execute_wrappers) que atribui cada consulta
+    à requisição em andamento; fora de uma requisição só executa.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.record(sql, time.perf_counter() - start)
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.maximum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def snapshot(self, requests):
+        labels = [str(bound) for bound in self.bounds] + ['+Inf']
+        return {
+            'mean': round(self.total / requests, 3) if requests else 0,
+            'max': round(self.maximum, 3),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class ViewStats:
+    def __init__(self):
+        self.requests = 0
+        self.slow = 0
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_ms = 0.0
+
+
+class MetricsRegistry:
+    """
+    Histogramas agregados por view (nome da URL resolvida), em memória.
+
+    Cada processo mantém os seus; com vários workers, cada um responde pelas
+    requisições que atendeu.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view_name, elapsed_ms, metrics, slow):
+        with self._lock:
+            stats = self._views.setdefault(view_name, ViewStats())
+            stats.requests += 1
+            stats.slow += slow
+            stats.latency_ms.observe(elapsed_ms)
+            stats.queries.observe(metrics.queries)
+            stats.sql_ms += metrics.sql_seconds * 1000
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view_name: {
+                    'requests': stats.requests,
+                    'slow_requests': stats.slow,
+                    'latency_ms': stats.latency_ms.snapshot(stats.requests),
+                    'queries': stats.queries.snapshot(stats.requests),
+                    'sql_ms': {'total': round(stats.sql_ms, 3), 'mean': round(stats.sql_ms / stats.requests, 3)},
+                }
+                for view_name, stats in sorted(self._views.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,75 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """
+    Mede cada requisição: tempo total, número de consultas e tempo de SQL.
+
+    Envia os valores no cabeçalho Server-Timing, agrega histogramas por view
+    em `core.metrics.registry` e registra no log as requisições acima de
+    settings.REQUEST_METRICS_SLOW_MS ou settings.REQUEST_METRICS_SLOW_QUERIES,
+    com os comandos SQL mais repetidos (sinal de N+1). Em respostas em
+    streaming, só é medido o que acontece até o início da resposta.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        request_metrics, token = metrics.start_request()
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.process(request, response, request_metrics, start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        request_metrics, token = metrics.start_request()
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+        return self.process(request, response, request_metrics, start)
+
+    def process(self, request, response, request_metrics, start):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        sql_ms = request_metrics.sql_seconds * 1000
+        response['Server-Timing'] = (
+            f'app;dur={elapsed_ms:.1f}, db;dur={sql_ms:.1f};desc="{request_metrics.queries} consultas"'
+        )
+
+        match = request.resolver_match
+        if match is None:
+            return response
+        view_name = match.view_name
+        slow = view_name not in settings.REQUEST_METRICS_IGNORE and (
+            elapsed_ms >= settings.REQUEST_METRICS_SLOW_MS
+            or request_metrics.queries >= settings.REQUEST_METRICS_SLOW_QUERIES
+        )
+        metrics.registry.observe(view_name, elapsed_ms, request_metrics, slow)
+        if slow:
+            repeated = ''.join(
+                f'\n  {count}x {sql}' for sql, count in request_metrics.repeated_statements()
+            )
+            logger.warning(
+                'Requisição lenta: %s %s (%s) em %.1f ms, %d consultas (%.1f ms em SQL).%s',
+                request.method, request.path, view_name, elapsed_ms, request_metrics.queries, sql_ms,
+                f' Consultas repetidas:{repeated}' if repeated else '',
+            )
+        return response
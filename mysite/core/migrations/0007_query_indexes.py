@@ -0,0 +1,39 @@
+# Generated by Django 5.0.13 on 2026-10-18 13:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_reward_description_reward_is_active'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='collection',
+            index=models.Index(fields=['status', 'updated_at', 'id'], name='collection_status_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='collection',
+            index=models.Index(fields=['status', '-processed_at'], name='collection_status_proc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='collection',
+            index=models.Index(fields=['collector', 'status', '-updated_at'], name='collection_collector_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='collection',
+            index=models.Index(condition=models.Q(('status', 'SOLICITADA')), fields=['created_at', 'id'], name='collection_open_pool_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pointstransaction',
+            index=models.Index(fields=['user', '-transaction_date', '-id'], name='points_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='residue',
+            index=models.Index(fields=['citizen', '-created_at', '-id'], name='residue_citizen_created_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.13 on 2026-10-18 13:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_residue_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reward',
+            name='per_user_limit',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reward',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.13 on 2026-10-18 14:00
+
+from django.db import migrations, models
+
+# Valor fixo concedido por coleta antes das regras de pontuação
+LEGACY_POINTS_PER_COLLECTION = 10
+
+
+def set_legacy_points(apps, schema_editor):
+    Collection = apps.get_model('core', 'Collection')
+    Collection.objects.filter(status='PROCESSADO').update(points_awarded=LEGACY_POINTS_PER_COLLECTION)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_task_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PointsCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('residue_type', models.CharField(blank=True, max_length=100)),
+                ('multiplier', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PointsRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('residue_type', models.CharField(blank=True, max_length=100, unique=True)),
+                ('points_per_kg', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('points_per_unit', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('minimum_points', models.PositiveIntegerField(default=0)),
+                ('maximum_points', models.PositiveIntegerField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='collection',
+            name='points_awarded',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(set_legacy_points, migrations.RunPython.noop),
+    ]
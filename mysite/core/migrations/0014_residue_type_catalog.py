@@ -0,0 +1,84 @@
+# Generated by Django 5.0.13 on 2026-10-18 14:10
+
+import unicodedata
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, Count, Value, When
+
+# Grafias por UPDATE: cada uma ocupa cinco parâmetros (IN e dois CASE), abaixo
+# do limite de 999 do SQLite
+BATCH_SIZE = 150
+# Tipo dos resíduos antigos cujo texto não tem chave (só espaços ou acentos soltos)
+UNNAMED_TYPE = 'Não informado'
+
+
+def normalize_type(name):
+    # Cópia de core.residue_types.normalize_type na data desta migração
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def map_residue_types(apps, schema_editor):
+    """
+    Cria um tipo do catálogo por nome normalizado e liga cada resíduo ao seu.
+
+    As grafias existentes vêm de uma única consulta agrupada; o nome do tipo
+    é a grafia mais usada. Textos sem chave vão para o tipo UNNAMED_TYPE, para
+    que nenhum resíduo fique sem tipo. Os resíduos são atualizados em um
+    UPDATE por lote de grafias, com CASEs que levam cada grafia ao id e ao
+    nome do tipo: depois da migração, `residue_type` guarda o nome do catálogo.
+    """
+    Residue = apps.get_model('core', 'Residue')
+    ResidueType = apps.get_model('core', 'ResidueType')
+
+    spellings = {}
+    for row in Residue.objects.order_by().values('residue_type').annotate(total=Count('id')):
+        key = normalize_type(row['residue_type']) or normalize_type(UNNAMED_TYPE)
+        spellings.setdefault(key, []).append((-row['total'], row['residue_type']))
+    names = {key: ' '.join(min(group)[1].split()) for key, group in spellings.items()}
+    if normalize_type(UNNAMED_TYPE) in names:
+        names[normalize_type(UNNAMED_TYPE)] = UNNAMED_TYPE
+    ResidueType.objects.bulk_create(
+        [ResidueType(name=name, key=key) for key, name in names.items()],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    types = {key: (type_id, name) for type_id, key, name in ResidueType.objects.values_list('id', 'key', 'name')}
+    mapping = [(spelling, *types[key]) for key, group in spellings.items() for _, spelling in group]
+    for offset in range(0, len(mapping), BATCH_SIZE):
+        batch = mapping[offset:offset + BATCH_SIZE]
+        Residue.objects.filter(residue_type__in=[spelling for spelling, _, _ in batch]).update(
+            catalog_type=Case(*[When(residue_type=spelling, then=Value(type_id)) for spelling, type_id, _ in batch]),
+            residue_type=Case(*[When(residue_type=spelling, then=Value(name)) for spelling, _, name in batch]),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_points_rules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResidueType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=100, unique=True)),
+                ('aliases', models.TextField(blank=True, help_text='Outros nomes aceitos para o tipo, um por linha.')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='residue',
+            name='catalog_type',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='residues', to='core.residuetype'),
+        ),
+        migrations.RunPython(map_residue_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.0.13 on 2026-10-18 16:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+BATCH_SIZE = 1000
+
+
+def mark_existing_types_reviewed(apps, schema_editor):
+    # Os tipos da 0014 vêm da grafia mais usada na base: já contam como revisados
+    apps.get_model('core', 'ResidueType').objects.update(is_reviewed=True)
+
+
+def rebuild_recycling_statistics(apps, schema_editor):
+    """
+    Recalcula as estatísticas de reciclagem, agora por tipo do catálogo, como
+    o comando rebuild_statistics.
+    """
+    Collection = apps.get_model('core', 'Collection')
+    RecyclingStatistics = apps.get_model('core', 'RecyclingStatistics')
+
+    processed = Collection.objects.filter(status='PROCESSADO', residue__catalog_type__isnull=False).order_by()
+    aggregates = {
+        'weight': Sum('residue__weight'),
+        'units': Sum('residue__units'),
+        'collections': Count('id'),
+    }
+    owners = (
+        processed.values(owner=F('residue__citizen_id'), type=F('residue__catalog_type_id')),
+        processed.filter(processed_by__isnull=False).values(
+            owner=F('processed_by_id'), type=F('residue__catalog_type_id')
+        ),
+    )
+    rows = []
+    for queryset in owners:
+        for row in queryset.annotate(**aggregates).iterator(chunk_size=BATCH_SIZE):
+            rows.append(RecyclingStatistics(
+                user_id=row['owner'],
+                catalog_type_id=row['type'],
+                weight=row['weight'] or 0,
+                units=row['units'] or 0,
+                collections=row['collections'],
+            ))
+            if len(rows) >= BATCH_SIZE:
+                RecyclingStatistics.objects.bulk_create(rows)
+                rows = []
+    RecyclingStatistics.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_residue_type_catalog'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='residuetype',
+            name='is_reviewed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_existing_types_reviewed, migrations.RunPython.noop),
+        # As estatísticas são derivadas: a tabela é recriada com a chave do
+        # catálogo e preenchida de novo a partir das coletas processadas
+        migrations.DeleteModel(
+            name='RecyclingStatistics',
+        ),
+        migrations.CreateModel(
+            name='RecyclingStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('units', models.IntegerField(default=0)),
+                ('collections', models.IntegerField(default=0)),
+                ('catalog_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='core.residuetype')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recycling_statistics', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'catalog_type'), name='recycling_stats_user_type_uniq')],
+            },
+        ),
+        migrations.RunPython(rebuild_recycling_statistics, migrations.RunPython.noop),
+    ]
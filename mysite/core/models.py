@@ -16,6 +16,26 @@ class Profile(models.Model):
         return f'{self.user.username} - {self.get_user_type_display()}'
 
 
+class ResidueType(models.Model):
+    """
+    Tipo de resíduo do catálogo. `key` é o nome normalizado (ver
+    core.residue_types.normalize_type): grafias que diferem apenas em
+    maiúsculas, acentos ou espaços são o mesmo tipo. Tipos criados a partir
+    do texto digitado por um cidadão ficam pendentes até a revisão da equipe,
+    que pode corrigir o nome; só os revisados são sugeridos no cadastro.
+    """
+    name = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, unique=True)
+    aliases = models.TextField(blank=True, help_text='Outros nomes aceitos para o tipo, um por linha.')
+    is_reviewed = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 class Residue(models.Model):
     STATUS_CHOICES = (
         ('AGUARDANDO_SOLICITACAO_DE_COLETA', 'Aguardando Solicitação de Coleta'),
@@ -23,11 +43,20 @@ class Residue(models.Model):
         ('PROCESSADO', 'Processado'), # Renomeado para consistência
     )
     citizen = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Nome do tipo do catálogo, copiado de catalog_type para exibição e exportação
     residue_type = models.CharField(max_length=100)
+    # Tipo do catálogo; agrupamentos por tipo usam esta chave, e não o texto
+    catalog_type = models.ForeignKey(
+        ResidueType, on_delete=models.PROTECT, null=True, blank=True, related_name='residues'
+    )
     weight = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     units = models.IntegerField(null=True, blank=True)
     location = models.CharField(max_length=255)
     collection_date = models.DateField(null=True, blank=True)
+    # Coordenadas do endereço, preenchidas por core.geo.set_coordinates
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, default='')
     status = models.CharField(
         max_length=50,
         choices=STATUS_CHOICES,
@@ -35,10 +64,49 @@ class Residue(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Lista de resíduos do cidadão (residue_list)
+            models.Index(fields=['citizen', '-created_at', '-id'], name='residue_citizen_created_idx'),
+            # Busca por proximidade: faixas de prefixo do geohash
+            models.Index(fields=['geohash'], name='residue_geohash_idx'),
+        ]
+
     def __str__(self):
         return f'{self.residue_type} - {self.citizen.username}'
 
 
+class CollectionQuerySet(models.QuerySet):
+    """
+    Projeções nomeadas usadas pelos dashboards.
+
+    Cada projeção carrega, em uma única consulta, apenas as colunas que o
+    template correspondente exibe, evitando o N+1 ao acessar
+    `collection.residue`, `collection.residue.citizen` e `collection.collector`.
+    """
+
+    def for_citizen_status(self):
+        return self.select_related('residue').only(
+            'id', 'status', 'created_at', 'updated_at',
+            'residue__id', 'residue__residue_type', 'residue__location',
+        )
+
+    def for_collector_dashboard(self):
+        return self.select_related('residue').only(
+            'id', 'status', 'collector_id', 'created_at', 'updated_at',
+            'residue__id', 'residue__residue_type', 'residue__location',
+            'residue__latitude', 'residue__longitude',
+        )
+
+    def for_recycler_dashboard(self):
+        return self.select_related('residue__citizen', 'collector').only(
+            'id', 'status', 'created_at', 'updated_at', 'processed_at',
+            'residue__id', 'residue__residue_type', 'residue__location',
+            'residue__citizen__id', 'residue__citizen__username',
+            'collector__id', 'collector__username',
+        )
+
+
 class Collection(models.Model):
     STATUS_CHOICES = (
         ('SOLICITADA', 'Solicitada'),
@@ -59,6 +127,28 @@ class Collection(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     processed_at = models.DateTimeField(null=True, blank=True) # Novo campo
+    processed_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='processed_collections'
+    )
+    # Pontos creditados ao cidadão pelo processamento (ver core.points)
+    points_awarded = models.IntegerField(null=True, blank=True)
+
+    objects = CollectionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Fila da recicladora e demais filtros por status ordenados por data
+            models.Index(fields=['status', 'updated_at', 'id'], name='collection_status_updated_idx'),
+            models.Index(fields=['status', '-processed_at'], name='collection_status_proc_idx'),
+            # Coletas ativas do coletor
+            models.Index(fields=['collector', 'status', '-updated_at'], name='collection_collector_idx'),
+            # Pool de coletas em aberto; parcial onde o banco suporta
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(status='SOLICITADA'),
+                name='collection_open_pool_idx',
+            ),
+        ]
 
     def __str__(self):
         return f'Coleta para {self.residue.residue_type} - Status: {self.get_status_display()}'
@@ -69,11 +159,48 @@ class Reward(models.Model):
     description = models.TextField(default='Descrição padrão')
     points_required = models.IntegerField()
     is_active = models.BooleanField(default=True)
+    # Unidades disponíveis em campanhas limitadas (vazio = ilimitado)
+    stock = models.PositiveIntegerField(null=True, blank=True)
+    # Resgates permitidos por usuário (vazio = sem limite)
+    per_user_limit = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self):
         return self.name
 
 
+class PointsRule(models.Model):
+    """
+    Regra de pontuação de um tipo de resíduo; a regra com tipo vazio vale
+    para os tipos sem regra própria. Os pontos da coleta são
+    peso * pontos por kg + unidades * pontos por unidade, limitados ao
+    intervalo [mínimo, máximo].
+    """
+    residue_type = models.CharField(max_length=100, unique=True, blank=True)
+    points_per_kg = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    points_per_unit = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    minimum_points = models.PositiveIntegerField(default=0)
+    maximum_points = models.PositiveIntegerField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.residue_type or 'Demais tipos'
+
+
+class PointsCampaign(models.Model):
+    """
+    Multiplicador dos pontos das coletas processadas dentro da janela
+    [starts_at, ends_at), para um tipo de resíduo ou para todos (tipo vazio).
+    """
+    name = models.CharField(max_length=100)
+    residue_type = models.CharField(max_length=100, blank=True)
+    multiplier = models.DecimalField(max_digits=5, decimal_places=2)
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+
+    def __str__(self):
+        return f'{self.name} (x{self.multiplier})'
+
+
 class UserReward(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     reward = models.ForeignKey(Reward, on_delete=models.CASCADE)
@@ -88,5 +215,85 @@ class PointsTransaction(models.Model):
     transaction_date = models.DateTimeField(auto_now_add=True)
     description = models.CharField(max_length=255)
 
+    class Meta:
+        indexes = [
+            # Extrato de pontos do usuário (points_history)
+            models.Index(fields=['user', '-transaction_date', '-id'], name='points_user_date_idx'),
+            # Exportação do extrato por período
+            models.Index(fields=['transaction_date', 'id'], name='points_date_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user.username} - {self.points_gained} pontos em {self.transaction_date}'
+
+
+class RecyclingStatistics(models.Model):
+    """
+    Totais materializados de reciclagem por usuário e tipo do catálogo.
+
+    Para o cidadão, soma os seus resíduos processados; para a recicladora,
+    as coletas que ela processou. Mantido incrementalmente por
+    `core.stats` e recalculável com `manage.py rebuild_statistics`.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='recycling_statistics')
+    catalog_type = models.ForeignKey(ResidueType, on_delete=models.PROTECT, related_name='+')
+    weight = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.IntegerField(default=0)
+    collections = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'catalog_type'], name='recycling_stats_user_type_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.user.username} - {self.catalog_type}: {self.collections} coleta(s)'
+
+
+class PointsStatistics(models.Model):
+    """
+    Totais materializados de pontos ganhos e gastos por usuário.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='points_statistics')
+    points_earned = models.IntegerField(default=0)
+    points_spent = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user.username} - ganhos {self.points_earned}, gastos {self.points_spent}'
+
+
+class Task(models.Model):
+    """
+    Tarefa da fila em banco (core.tasks), executada por `manage.py run_worker`.
+
+    `key` é a chave de idempotência: enfileirar de novo a mesma chave não
+    cria outra tarefa. `attempts` também serve de ficha da execução em
+    andamento: um worker só conclui a tarefa se ninguém a reivindicou depois.
+    """
+    STATUS_CHOICES = (
+        ('PENDENTE', 'Pendente'),
+        ('EXECUTANDO', 'Executando'),
+        ('CONCLUIDA', 'Concluída'),
+        ('FALHOU', 'Falhou'),
+    )
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDENTE')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Fim do prazo do worker que está executando a tarefa
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Próximas tarefas a executar
+            models.Index(fields=['status', 'run_after', 'id'], name='task_status_run_after_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} - {self.get_status_display()}'
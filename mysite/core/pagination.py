@@ -0,0 +1,96 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+PAGE_SIZE = 25
+
+
+class KeysetPage:
+    """
+    Uma página de resultados obtida por paginação keyset (cursor).
+    """
+    def __init__(self, object_list, next_cursor, is_first):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def encode_cursor(value, pk):
+    payload = json.dumps([value.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Retorna a tupla (valor, id) codificada no cursor, ou None se ele for inválido.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(value), int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def _keyset_queryset(queryset, cursor, order_field):
+    descending = order_field.startswith('-')
+    field = order_field.lstrip('-')
+    id_field = '-id' if descending else 'id'
+    queryset = queryset.order_by(order_field, id_field)
+
+    position = decode_cursor(cursor)
+    if position is not None:
+        value, pk = position
+        lookup = 'lt' if descending else 'gt'
+        queryset = queryset.filter(
+            Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'id__{lookup}': pk})
+        )
+    return queryset, field, position
+
+
+def _keyset_page(rows, field, position, page_size):
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, field), last.pk)
+    return KeysetPage(rows, next_cursor, is_first=position is None)
+
+
+def paginate_keyset(queryset, cursor, order_field, page_size=PAGE_SIZE):
+    """
+    Pagina `queryset` pelo par (`order_field`, id) a partir de `cursor`.
+
+    `order_field` segue a convenção de `order_by` ('-created_at' para ordem
+    decrescente). O id é usado como desempate, garantindo ordem estável, e a
+    página seguinte é filtrada por `WHERE (campo, id) > (valor, id)` em vez de
+    OFFSET, de modo que a página N custa o mesmo que a primeira.
+    """
+    queryset, field, position = _keyset_queryset(queryset, cursor, order_field)
+    return _keyset_page(list(queryset[:page_size + 1]), field, position, page_size)
+
+
+async def apaginate_keyset(queryset, cursor, order_field, page_size=PAGE_SIZE):
+    """
+    Versão assíncrona de `paginate_keyset`, para views async.
+    """
+    queryset, field, position = _keyset_queryset(queryset, cursor, order_field)
+    rows = [row async for row in queryset[:page_size + 1].aiterator()]
+    return _keyset_page(rows, field, position, page_size)
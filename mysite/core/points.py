@@ -0,0 +1,131 @@
+import math
+import threading
+import time
+
+from django.core.cache import cache
+
+from .models import PointsCampaign, PointsRule
+from .residue_types import get_index, normalize_type, types_version
+
+RULES_VERSION_KEY = 'core:points_rules:version'
+# Sem nenhuma regra aplicável, cada coleta vale um valor fixo
+POINTS_PER_COLLECTION = 10
+# Tolerância para que produtos como 1,15 kg x 100 não caiam para baixo no arredondamento
+_EPSILON = 1e-9
+
+
+def rules_version():
+    version = cache.get(RULES_VERSION_KEY)
+    if version is None:
+        version = invalidate_rules()
+    return version
+
+
+def invalidate_rules():
+    """
+    Troca a versão das regras de pontuação (ver `invalidate_catalog`); cada
+    processo recompila o avaliador na próxima consulta.
+    """
+    version = time.time_ns()
+    cache.set(RULES_VERSION_KEY, version, None)
+    return version
+
+
+class PointsEvaluator:
+    """
+    Regras e campanhas compiladas em estruturas de consulta em memória.
+
+    As regras viram tuplas de floats por tipo e as campanhas, listas de
+    janelas por tipo, de modo que pontuar uma coleta não consulta o banco nem
+    instancia modelos. Regras, campanhas e coletas são levadas à chave do
+    tipo do catálogo pelo `canonical_key` (ver core.residue_types): uma regra
+    para "Garrafa PET" vale para "garráfa pet" e para os apelidos do tipo.
+    """
+
+    def __init__(self, rules, campaigns, canonical_key=normalize_type):
+        self.canonical_key = canonical_key
+        self.rules = {}
+        for rule in rules:
+            self.rules[canonical_key(rule.residue_type)] = (
+                float(rule.points_per_kg),
+                float(rule.points_per_unit),
+                rule.minimum_points,
+                rule.maximum_points,
+            )
+        # Tipos sem regra própria usam a regra de tipo vazio, se houver
+        self.fallback = self.rules.pop('', (0.0, 0.0, POINTS_PER_COLLECTION, POINTS_PER_COLLECTION))
+        self.campaigns = {}
+        for campaign in campaigns:
+            self.campaigns.setdefault(canonical_key(campaign.residue_type), []).append(
+                (campaign.starts_at, campaign.ends_at, float(campaign.multiplier))
+            )
+        self.global_campaigns = self.campaigns.pop('', [])
+
+    def score(self, residue_type, weight, units, moment):
+        return self.score_batch([residue_type], [weight], [units], [moment])[0]
+
+    def score_batch(self, residue_types, weights, units, moments):
+        """
+        Pontua um lote a partir de colunas paralelas (tipos, pesos, unidades e
+        momentos do processamento); retorna a lista de pontos.
+
+        As linhas são agrupadas por tipo: regra e campanhas são resolvidas uma
+        vez por grupo, e cada grupo é calculado em laços sobre as colunas, sem
+        consultas nem objetos por linha. Entre as campanhas ativas no momento
+        de cada coleta, vale o maior multiplicador.
+        """
+        by_name = {}
+        for index, residue_type in enumerate(residue_types):
+            by_name.setdefault(residue_type, []).append(index)
+        groups = {}
+        for residue_type, indexes in by_name.items():
+            groups.setdefault(self.canonical_key(residue_type), []).extend(indexes)
+
+        scores = [0] * len(residue_types)
+        for key, indexes in groups.items():
+            per_kg, per_unit, minimum, maximum = self.rules.get(key, self.fallback)
+            upper = math.inf if maximum is None else maximum
+            raw = [
+                float(weights[i] or 0) * per_kg + (units[i] or 0) * per_unit
+                for i in indexes
+            ]
+            base = [min(max(math.floor(value + _EPSILON), minimum), upper) for value in raw]
+
+            campaigns = self.campaigns.get(key, []) + self.global_campaigns
+            if campaigns:
+                for position, i in enumerate(indexes):
+                    moment = moments[i]
+                    multiplier = max(
+                        (factor for start, end, factor in campaigns if moment is not None and start <= moment < end),
+                        default=1.0,
+                    )
+                    scores[i] = math.floor(base[position] * multiplier + _EPSILON)
+            else:
+                for position, i in enumerate(indexes):
+                    scores[i] = base[position]
+        return scores
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def get_evaluator():
+    """
+    Avaliador compilado da versão atual das regras e do catálogo de tipos,
+    mantido em memória no processo até a próxima alteração de uma regra,
+    campanha ou tipo.
+    """
+    version = (rules_version(), types_version())
+    with _compiled_lock:
+        evaluator = _compiled.get(version)
+    if evaluator is None:
+        evaluator = PointsEvaluator(
+            PointsRule.objects.filter(is_active=True),
+            PointsCampaign.objects.all(),
+            get_index().canonical_key,
+        )
+        with _compiled_lock:
+            _compiled.clear()
+            _compiled[version] = evaluator
+    return evaluator
@@ -0,0 +1,190 @@
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import ResidueType
+
+TYPES_VERSION_KEY = 'core:residue_types:version'
+AUTOCOMPLETE_LIMIT = 10
+
+
+def types_version():
+    version = cache.get(TYPES_VERSION_KEY)
+    if version is None:
+        version = invalidate_types()
+    return version
+
+
+def invalidate_types():
+    """
+    Troca a versão do catálogo de tipos (ver `invalidate_catalog`); cada
+    processo reconstrói o índice na próxima consulta.
+    """
+    version = time.time_ns()
+    cache.set(TYPES_VERSION_KEY, version, None)
+    return version
+
+
+def normalize_type(name):
+    """
+    Chave de um nome de tipo: sem acentos, em minúsculas (casefold) e com
+    os espaços colapsados, de modo que "Garrafa  PET" e "garrafa pet" coincidam.
+    """
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def display_name(name):
+    """
+    Nome de exibição de um tipo criado a partir do texto digitado: espaços
+    colapsados e, se foi digitado todo em minúsculas, com a inicial maiúscula.
+    Siglas e nomes com maiúsculas são mantidos como vieram.
+    """
+    name = ' '.join(name.split())
+    if name.islower():
+        return name[0].upper() + name[1:]
+    return name
+
+
+class ResidueTypeIndex:
+    """
+    Catálogo de tipos compilado em memória para normalização e autocompletar.
+
+    `exact` leva a chave de cada nome e apelido ao tipo, e `canonical`, à
+    chave do tipo; `entries` é uma lista ordenada com as chaves a partir de
+    cada palavra, em que um prefixo vira uma faixa contígua encontrada por
+    busca binária: "pet" encontra tanto "PET" quanto "Garrafa PET". Tipos
+    pendentes de revisão são reconhecidos, mas não sugeridos.
+    """
+
+    def __init__(self, types):
+        self.exact = {}
+        self.canonical = {}
+        entries = []
+        for residue_type in types:
+            value = (residue_type.id, residue_type.name)
+            names = [residue_type.key] + [normalize_type(alias) for alias in residue_type.aliases.splitlines()]
+            for position, key in enumerate(filter(None, names)):
+                # O nome do tipo tem prioridade sobre o apelido de outro
+                if position == 0 or key not in self.exact:
+                    self.exact[key] = value
+                    self.canonical[key] = residue_type.key
+                if not residue_type.is_reviewed:
+                    continue
+                words = key.split(' ')
+                for start in range(len(words)):
+                    rank = (start > 0) * 2 + (position > 0)
+                    entries.append((' '.join(words[start:]), rank, residue_type.key, value))
+        entries.sort()
+        self.entries = entries
+        self.keys = [entry[0] for entry in entries]
+
+    def match(self, name):
+        """Retorna (id, nome) do tipo com este nome ou apelido, ou None."""
+        return self.exact.get(normalize_type(name))
+
+    def canonical_key(self, name):
+        """
+        Chave do tipo do catálogo com este nome ou apelido; para nomes fora do
+        catálogo, o próprio nome normalizado.
+        """
+        key = normalize_type(name)
+        return self.canonical.get(key, key)
+
+    def complete(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        """
+        Tipos com alguma palavra começando por `prefix`, como (id, nome):
+        primeiro os que começam pelo prefixo, depois os demais, em ordem alfabética.
+        """
+        prefix = normalize_type(prefix)
+        if not prefix:
+            return []
+        found = {}
+        index = bisect_left(self.keys, prefix)
+        while index < len(self.keys) and self.keys[index].startswith(prefix):
+            _, rank, key, value = self.entries[index]
+            if value not in found or (rank, key) < found[value]:
+                found[value] = (rank, key)
+            index += 1
+        return sorted(found, key=found.get)[:limit]
+
+
+_compiled = {}
+_compiled_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Índice da versão atual do catálogo, mantido em memória no processo até a
+    próxima alteração de um tipo.
+    """
+    version = types_version()
+    with _compiled_lock:
+        index = _compiled.get(version)
+    if index is None:
+        index = ResidueTypeIndex(ResidueType.objects.only('id', 'name', 'key', 'aliases', 'is_reviewed'))
+        with _compiled_lock:
+            _compiled.clear()
+            _compiled[version] = index
+    return index
+
+
+def resolve_types(names):
+    """
+    Leva cada nome digitado ao tipo do catálogo; retorna {nome: (id, nome do tipo)}.
+
+    Os nomes conhecidos são resolvidos pelo índice em memória e confirmados
+    em uma consulta pela chave primária: um índice montado dentro de uma
+    transação depois revertida pode conter tipos que não existem. Os demais
+    viram tipos novos, pendentes de revisão (ver `display_name`), em um único
+    INSERT (a chave única absorve inserções concorrentes do mesmo tipo) e são
+    lidos de volta em uma consulta. Um nome sem chave (só espaços ou acentos
+    soltos) levanta ValueError: valide-o antes com
+    core.forms.residue_type_errors.
+    """
+    index = get_index()
+    found, missing = {}, {}
+    # Na ordem de chegada: um tipo novo leva a primeira grafia em que aparece
+    for name in dict.fromkeys(names):
+        value = index.match(name)
+        if value is not None:
+            found[name] = value
+        elif normalize_type(name):
+            missing.setdefault(normalize_type(name), []).append(name)
+        else:
+            raise ValueError(f'Tipo de resíduo sem nome normalizável: {name!r}')
+
+    resolved = {}
+    if found:
+        existing = set(
+            ResidueType.objects.filter(id__in={type_id for type_id, _ in found.values()}).values_list('id', flat=True)
+        )
+        for name, value in found.items():
+            if value[0] in existing:
+                resolved[name] = value
+            else:
+                missing.setdefault(normalize_type(name), []).append(name)
+        if len(existing) < len({type_id for type_id, _ in found.values()}):
+            invalidate_types()
+    if missing:
+        ResidueType.objects.bulk_create(
+            [ResidueType(name=display_name(group[0]), key=key) for key, group in missing.items()],
+            ignore_conflicts=True,
+        )
+        for residue_type in ResidueType.objects.filter(key__in=missing):
+            for name in missing[residue_type.key]:
+                resolved[name] = (residue_type.id, residue_type.name)
+        # bulk_create não dispara signals. Só após o commit: um índice montado
+        # antes levaria a tipos que um rollback desfaria
+        transaction.on_commit(invalidate_types)
+    return resolved
+
+
+def resolve_type(name):
+    """Como `resolve_types`, para um nome só; retorna (id, nome do tipo)."""
+    return resolve_types([name])[name]
@@ -0,0 +1,190 @@
+import math
+import time
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+from .geo import (
+    GEOHASH_PRECISION, KM_PER_DEGREE, cell_radius_km, encode_geohash, geohash_neighbors, haversine_km, next_geohash,
+)
+from .models import Collection
+
+NEAREST_DEFAULT = 25
+# Precisão do geohash em que a busca por proximidade começa (~1,2 km x 0,6 km)
+SEARCH_START_PRECISION = 6
+# Tempo máximo gasto melhorando a rota com 2-opt
+ROUTE_IMPROVE_SECONDS = 0.25
+
+
+def _cell_range(cell):
+    # Todos os geohashes com prefixo `cell` ficam em [cell, next_geohash(cell)):
+    # a faixa usa o índice, ao contrário do LIKE gerado por `startswith`.
+    end = next_geohash(cell)
+    if end is None:
+        return Q(residue__geohash__gte=cell)
+    return Q(residue__geohash__gte=cell, residue__geohash__lt=end)
+
+
+def nearest_open_collections(latitude, longitude, limit=NEAREST_DEFAULT):
+    """
+    As `limit` coletas em aberto ('SOLICITADA') mais próximas do ponto.
+
+    Procura primeiro na célula do geohash do ponto e nas oito vizinhas, que
+    garantem cobertura até `cell_radius_km`; se não houver coletas suficientes
+    dentro desse raio, repete com células maiores. Cada tentativa é uma
+    consulta por faixas do índice de geohash, e só as coletas escolhidas são
+    carregadas como objetos. Cada coleta recebe o atributo `distance_km`.
+    """
+    origin = encode_geohash(latitude, longitude, GEOHASH_PRECISION)
+    open_pool = Collection.objects.filter(status='SOLICITADA').exclude(residue__geohash='')
+    ranked = []
+    for precision in range(SEARCH_START_PRECISION, 0, -1):
+        cell = origin[:precision]
+        rows = open_pool.filter(reduce(or_, map(_cell_range, geohash_neighbors(cell)))).values_list(
+            'id', 'residue__latitude', 'residue__longitude'
+        )
+        ranked = sorted((haversine_km(latitude, longitude, lat, lng), pk) for pk, lat, lng in rows)
+        radius = cell_radius_km(cell)
+        if sum(1 for distance, _ in ranked[:limit] if distance <= radius) >= limit:
+            break
+    else:
+        rows = open_pool.values_list('id', 'residue__latitude', 'residue__longitude')
+        ranked = sorted((haversine_km(latitude, longitude, lat, lng), pk) for pk, lat, lng in rows)
+
+    ranked = ranked[:limit]
+    collections = Collection.objects.for_collector_dashboard().in_bulk([pk for _, pk in ranked])
+    result = []
+    for distance, pk in ranked:
+        collection = collections[pk]
+        collection.distance_km = distance
+        result.append(collection)
+    return result
+
+
+def _project(points, origin_latitude):
+    # Projeção equiretangular em km: suficiente para distâncias dentro de uma cidade
+    scale = KM_PER_DEGREE * math.cos(math.radians(origin_latitude))
+    return [(lng * scale, lat * KM_PER_DEGREE) for lat, lng in points]
+
+
+def _nearest_neighbour_order(points, start):
+    """
+    Ordem de visita pelo vizinho mais próximo, partindo de `start`.
+
+    Os pontos ficam em uma grade uniforme; a busca examina anéis de células
+    ao redor da posição atual e para assim que nenhum anel ainda não visto
+    pode conter um ponto mais próximo, evitando o custo O(n²) da busca ingênua.
+    """
+    if not points:
+        return []
+    xs, ys = [x for x, _ in points], [y for _, y in points]
+    min_x, min_y = min(xs), min(ys)
+    area = max(max(xs) - min_x, 1e-9) * max(max(ys) - min_y, 1e-9)
+    size = max(math.sqrt(area / len(points)), 1e-6)
+    grid = {}
+    for index, (x, y) in enumerate(points):
+        grid.setdefault((int((x - min_x) // size), int((y - min_y) // size)), set()).add(index)
+
+    order = []
+    current = start
+    while grid:
+        cx, cy = int((current[0] - min_x) // size), int((current[1] - min_y) // size)
+        best, best_distance, ring = None, math.inf, 0
+        while True:
+            if 8 * ring >= len(grid):
+                # Restam poucas células ocupadas: mais barato examinar todas
+                cells = list(grid)
+            elif ring == 0:
+                cells = [(cx, cy)]
+            else:
+                cells = [(cx + dx, cy + dy) for dx in range(-ring, ring + 1) for dy in (-ring, ring)]
+                cells += [(cx + dx, cy + dy) for dx in (-ring, ring) for dy in range(-ring + 1, ring)]
+            for cell in cells:
+                for index in grid.get(cell, ()):
+                    distance = math.dist(current, points[index])
+                    if distance < best_distance:
+                        best, best_distance = index, distance
+            # Pontos fora dos anéis já vistos estão a pelo menos ring * size
+            if 8 * ring >= len(grid) or (best is not None and best_distance <= ring * size):
+                break
+            ring += 1
+        cell = (int((points[best][0] - min_x) // size), int((points[best][1] - min_y) // size))
+        grid[cell].discard(best)
+        if not grid[cell]:
+            del grid[cell]
+        order.append(best)
+        current = points[best]
+    return order
+
+
+def _two_opt(path, points, start, deadline):
+    """
+    Melhora a ordem com 2-opt (caminho aberto a partir de `start`), invertendo
+    trechos enquanto isso encurtar a rota ou até `deadline`.
+    """
+    def position(i):
+        return start if i < 0 else points[path[i]]
+
+    improved = True
+    while improved and time.perf_counter() < deadline:
+        improved = False
+        for i in range(len(path) - 1):
+            a, b = position(i - 1), position(i)
+            for k in range(i + 1, len(path)):
+                c = position(k)
+                delta = math.dist(a, c) - math.dist(a, b)
+                if k + 1 < len(path):
+                    e = position(k + 1)
+                    delta += math.dist(b, e) - math.dist(c, e)
+                if delta < -1e-9:
+                    path[i:k + 1] = reversed(path[i:k + 1])
+                    b = position(i)
+                    improved = True
+            if time.perf_counter() >= deadline:
+                break
+    return path
+
+
+def suggest_route(collector, latitude=None, longitude=None, time_limit=ROUTE_IMPROVE_SECONDS):
+    """
+    Sugere a ordem de visita das coletas 'ATRIBUIDA' do coletor.
+
+    Parte do ponto informado (ou da primeira coleta) e monta a rota pelo
+    vizinho mais próximo, refinada com 2-opt dentro de `time_limit` segundos.
+    Coletas sem coordenadas vão para o fim. Retorna (coletas na ordem
+    sugerida, distância total em km); cada coleta recebe `leg_km`, a
+    distância desde a parada anterior.
+    """
+    collections = list(
+        Collection.objects.for_collector_dashboard()
+        .filter(collector=collector, status='ATRIBUIDA')
+        .order_by('created_at', 'id')
+    )
+    located = [c for c in collections if c.residue.latitude is not None]
+    unlocated = [c for c in collections if c.residue.latitude is None]
+    if not located:
+        for collection in unlocated:
+            collection.leg_km = None
+        return unlocated, 0.0
+
+    coordinates = [(c.residue.latitude, c.residue.longitude) for c in located]
+    if latitude is None or longitude is None:
+        latitude, longitude = coordinates[0]
+    points = _project(coordinates, latitude)
+    start = _project([(latitude, longitude)], latitude)[0]
+
+    deadline = time.perf_counter() + time_limit
+    order = _two_opt(_nearest_neighbour_order(points, start), points, start, deadline)
+
+    route, total = [], 0.0
+    previous = (latitude, longitude)
+    for index in order:
+        collection = located[index]
+        collection.leg_km = haversine_km(*previous, *coordinates[index])
+        total += collection.leg_km
+        previous = coordinates[index]
+        route.append(collection)
+    for collection in unlocated:
+        collection.leg_km = None
+    return route + unlocated, total
@@ -0,0 +1,417 @@
+import hashlib
+
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+
+from .events import publish_collection_events
+from .forms import CollectionStatusForm
+from .catalog import invalidate_catalog
+from .models import Collection, PointsTransaction, Profile, Residue, Reward, UserReward
+from .points import get_evaluator
+from .stats import record_points, record_processed
+from .tasks import enqueue, enqueue_many, register
+
+# Status do resíduo correspondente a cada status da coleta. 'CANCELADA' não
+# altera o resíduo.
+RESIDUE_STATUS_BY_COLLECTION_STATUS = {
+    'SOLICITADA': 'COLETA_SOLICITADA',
+    'ATRIBUIDA': 'COLETA_SOLICITADA',
+    'EM_ROTA': 'COLETA_SOLICITADA',
+    'COLETADA': 'COLETA_SOLICITADA',
+    'ENTREGUE_RECICLADORA': 'COLETA_SOLICITADA',
+    'PROCESSADO': 'PROCESSADO',
+}
+
+
+def sync_residue_status(collection_ids, statuses=None):
+    """
+    Alinha o status dos resíduos ao das coletas informadas.
+
+    Substitui o antigo signal de post_save: funciona igualmente para uma
+    coleta ou para lotes alterados via `bulk_update`/`QuerySet.update()`.
+    Executa no máximo um UPDATE por status de resíduo, unido às coletas pelo
+    id, e só grava as linhas cujo status realmente muda. Quem já sabe para
+    quais status as coletas foram pode restringi-los em `statuses`, evitando
+    UPDATEs que não encontrariam linhas.
+    Retorna o número de resíduos atualizados.
+    """
+    collection_ids = list(collection_ids)
+    if not collection_ids:
+        return 0
+    by_residue_status = {}
+    for collection_status, residue_status in RESIDUE_STATUS_BY_COLLECTION_STATUS.items():
+        if statuses is not None and collection_status not in statuses:
+            continue
+        by_residue_status.setdefault(residue_status, []).append(collection_status)
+
+    updated = 0
+    for residue_status, collection_statuses in by_residue_status.items():
+        updated += Residue.objects.filter(
+            collection__id__in=collection_ids,
+            collection__status__in=collection_statuses,
+        ).exclude(status=residue_status).update(status=residue_status)
+    return updated
+
+
+def award_points(user, points, description):
+    """
+    Credita `points` ao usuário e registra a transação no extrato.
+
+    O saldo é atualizado com `F()` em um único UPDATE, sem ler o perfil,
+    de modo que créditos concorrentes nunca se sobrescrevem.
+    """
+    with transaction.atomic():
+        Profile.objects.filter(user=user).update(points=F('points') + points)
+        record_points(earned={user.pk: points})
+        return PointsTransaction.objects.create(user=user, points_gained=points, description=description)
+
+
+def spend_points(user, points, description):
+    """
+    Debita `points` do usuário se houver saldo suficiente.
+
+    A verificação de saldo e o débito acontecem no mesmo UPDATE condicional
+    (`WHERE points >= N`), o que impede gasto duplo em resgates simultâneos.
+    Retorna a transação criada ou None se o saldo for insuficiente.
+    """
+    with transaction.atomic():
+        updated = Profile.objects.filter(user=user, points__gte=points).update(points=F('points') - points)
+        if not updated:
+            return None
+        record_points(spent={user.pk: points})
+        return PointsTransaction.objects.create(user=user, points_gained=-points, description=description)
+
+
+def claim_reward(user, reward):
+    """
+    Resgata a recompensa: débito dos pontos, limite por usuário e baixa do
+    estoque em uma única transação.
+
+    Cada verificação é a condição do próprio UPDATE, sem leitura prévia: o
+    débito (`WHERE points >= N`) trava o perfil até o commit, o que enfileira
+    os resgates simultâneos do mesmo usuário antes da contagem do limite; a
+    baixa do estoque (`WHERE stock > 0`) vem por último, para que a linha da
+    recompensa, disputada por todos, fique travada o mínimo possível.
+    Retorna (UserReward criado, None) ou (None, motivo da recusa).
+    """
+    with transaction.atomic():
+        if spend_points(user, reward.points_required, f'Resgate da recompensa: {reward.name}') is None:
+            return None, 'Você não tem pontos suficientes para resgatar esta recompensa.'
+        if reward.per_user_limit is not None:
+            redeemed = UserReward.objects.filter(user=user, reward=reward).count()
+            if redeemed >= reward.per_user_limit:
+                transaction.set_rollback(True)
+                return None, 'Você já atingiu o limite de resgates desta recompensa.'
+        user_reward = UserReward.objects.create(user=user, reward=reward)
+        if reward.stock is not None:
+            if not Reward.objects.filter(pk=reward.pk, stock__gt=0).update(stock=F('stock') - 1):
+                transaction.set_rollback(True)
+                return None, 'Esta recompensa está esgotada.'
+    if reward.stock is not None and Reward.objects.filter(pk=reward.pk, stock=0).exists():
+        # A última unidade saiu: o catálogo em cache deixa de oferecê-la
+        invalidate_catalog()
+    return user_reward, None
+
+
+def claim_collection(collection_id, collector):
+    """
+    Atribui a coleta ao coletor se ela ainda estiver 'SOLICITADA'.
+
+    A verificação e a atribuição são um único `UPDATE ... WHERE status =
+    'SOLICITADA'`: entre coletores concorrentes, exatamente um vence, sem
+    leitura prévia nem trava explícita. Retorna True se a coleta foi atribuída.
+    O resíduo já está 'COLETA_SOLICITADA' antes e depois da atribuição, por
+    isso não há status a sincronizar.
+    """
+    claimed = Collection.objects.filter(id=collection_id, status='SOLICITADA').update(
+        collector=collector, status='ATRIBUIDA', updated_at=timezone.now()
+    )
+    if claimed:
+        publish_collection_events('claimed', [collection_id])
+    return claimed == 1
+
+
+def claim_next_collections(collector, quantity):
+    """
+    Atribui ao coletor as `quantity` coletas em aberto mais antigas.
+
+    Onde o banco suporta, as linhas são travadas com `SKIP LOCKED`, de modo
+    que coletores simultâneos recebem lotes distintos sem esperar uns pelos
+    outros. O UPDATE continua condicionado ao status, o que mantém o resultado
+    correto também em bancos sem `SELECT ... FOR UPDATE` (SQLite).
+    Retorna os ids das coletas atribuídas.
+    """
+    with transaction.atomic():
+        candidates = list(
+            Collection.objects.select_for_update(skip_locked=True)
+            .filter(status='SOLICITADA')
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)[:quantity]
+        )
+        if not candidates:
+            return []
+        Collection.objects.filter(id__in=candidates, status='SOLICITADA').update(
+            collector=collector, status='ATRIBUIDA', updated_at=timezone.now()
+        )
+        claimed = list(
+            Collection.objects.filter(id__in=candidates, collector=collector, status='ATRIBUIDA')
+            .values_list('id', flat=True)
+        )
+        publish_collection_events('claimed', claimed)
+        return claimed
+
+
+def _transition_error(current_status, next_status):
+    return f"Transição de status inválida de '{current_status}' para '{next_status}'."
+
+
+def bulk_transition_collections(collector, collection_ids, next_status):
+    """
+    Aplica `next_status` a várias coletas do coletor de uma só vez.
+
+    As transições são validadas em memória contra
+    `CollectionStatusForm.STATUS_TRANSITIONS` e aplicadas com um UPDATE por
+    status de origem (condicionado a esse status), em vez de um formulário e
+    um save por coleta. Retorna (ids atualizados, {id: motivo da recusa}).
+    """
+    collection_ids = set(collection_ids)
+    rejected = {}
+    by_status = {}
+    with transaction.atomic():
+        rows = (
+            Collection.objects.select_for_update()
+            .filter(id__in=collection_ids)
+            .values_list('id', 'status', 'collector_id')
+        )
+        found = set()
+        for collection_id, status, collector_id in rows:
+            found.add(collection_id)
+            allowed = [choice for choice, _ in CollectionStatusForm.STATUS_TRANSITIONS.get(status, [])]
+            if collector_id != collector.id:
+                rejected[collection_id] = 'Coleta atribuída a outro coletor.'
+            elif next_status not in allowed:
+                rejected[collection_id] = _transition_error(status, next_status)
+            else:
+                by_status.setdefault(status, []).append(collection_id)
+        for missing_id in collection_ids - found:
+            rejected[missing_id] = 'Coleta não encontrada.'
+
+        now = timezone.now()
+        updated = []
+        for status, ids in by_status.items():
+            count = Collection.objects.filter(id__in=ids, status=status, collector=collector).update(
+                status=next_status, updated_at=now
+            )
+            if count != len(ids):
+                # Outra requisição alterou alguma coleta entre a leitura e a escrita
+                transaction.set_rollback(True)
+                return [], {i: 'Coleta alterada por outra requisição; tente novamente.' for i in collection_ids}
+            updated.extend(ids)
+        sync_residue_status(updated, statuses=[next_status])
+    return updated, rejected
+
+
+def bulk_process_collections(collection_ids, recycler):
+    """
+    Processa várias coletas entregues na recicladora de uma só vez.
+
+    Na requisição ficam apenas as mudanças de status: uma leitura, um UPDATE
+    das coletas, um dos resíduos e o INSERT da tarefa que credita os pontos
+    (`enqueue_processed_credit`), independentemente de quantas coletas são
+    processadas. Retorna (ids processados, {id: motivo da recusa}).
+    """
+    collection_ids = set(collection_ids)
+    with transaction.atomic():
+        processed = list(
+            Collection.objects.select_for_update()
+            .filter(id__in=collection_ids, status='ENTREGUE_RECICLADORA')
+            .values_list('id', flat=True)
+        )
+        rejected = {
+            collection_id: 'Coleta não está aguardando processamento.'
+            for collection_id in collection_ids - set(processed)
+        }
+        if not processed:
+            return [], rejected
+
+        now = timezone.now()
+        count = Collection.objects.filter(id__in=processed, status='ENTREGUE_RECICLADORA').update(
+            status='PROCESSADO', processed_at=now, updated_at=now, processed_by=recycler
+        )
+        if count != len(processed):
+            transaction.set_rollback(True)
+            return [], {i: 'Coleta alterada por outra requisição; tente novamente.' for i in collection_ids}
+
+        sync_residue_status(processed, statuses=['PROCESSADO'])
+        enqueue_processed_credit(processed, recycler.id)
+    return processed, rejected
+
+
+def enqueue_processed_credit(collection_ids, recycler_id):
+    """
+    Enfileira, na transação do processamento, o crédito dos pontos das
+    coletas. A chave de idempotência vem dos ids: o mesmo lote nunca é
+    creditado duas vezes.
+    """
+    collection_ids = sorted(collection_ids)
+    digest = hashlib.sha1(','.join(map(str, collection_ids)).encode()).hexdigest()
+    enqueue(
+        'credit_processed_collections', key=f'coletas-processadas:{digest}',
+        collection_ids=collection_ids, recycler_id=recycler_id,
+    )
+
+
+def _credit_points(credits, ledger):
+    """
+    Grava o extrato (`ledger`) e soma `credits` ({user_id: pontos}, que podem
+    ser negativos) aos saldos em um único UPDATE, atualizando as estatísticas.
+    """
+    credits = {user_id: points for user_id, points in credits.items() if points}
+    PointsTransaction.objects.bulk_create(ledger)
+    if not credits:
+        return
+    Profile.objects.filter(user_id__in=credits).update(
+        points=F('points') + Case(
+            *[When(user_id=user_id, then=Value(points)) for user_id, points in credits.items()],
+            output_field=IntegerField(),
+        )
+    )
+    record_points(
+        earned={user_id: points for user_id, points in credits.items() if points > 0},
+        spent={user_id: -points for user_id, points in credits.items() if points < 0},
+    )
+
+
+def _set_points_awarded(points_by_id):
+    """Grava `points_awarded` das coletas em um UPDATE, com um WHEN por valor distinto."""
+    by_points = {}
+    for collection_id, points in points_by_id.items():
+        by_points.setdefault(points, []).append(collection_id)
+    Collection.objects.filter(id__in=points_by_id).update(
+        points_awarded=Case(
+            *[When(id__in=ids, then=Value(points)) for points, ids in by_points.items()],
+            output_field=IntegerField(),
+        )
+    )
+
+
+@register('credit_processed_collections')
+def credit_processed_collections(collection_ids, recycler_id):
+    """
+    Tarefa: pontua as coletas processadas pelas regras vigentes (core.points),
+    credita os pontos, registra o extrato e as estatísticas e enfileira a
+    notificação de cada cidadão.
+
+    Usa um número constante de consultas para o lote: uma leitura, um UPDATE
+    dos pontos das coletas, um `bulk_create` do extrato, um UPDATE dos saldos,
+    os incrementos das estatísticas e o INSERT das notificações. Roda na
+    mesma transação que conclui a tarefa.
+    """
+    rows = list(
+        Collection.objects.filter(id__in=collection_ids, status='PROCESSADO', points_awarded__isnull=True)
+        .values_list(
+            'id', 'residue__citizen_id', 'residue__residue_type', 'residue__weight', 'residue__units',
+            'processed_at', 'residue__catalog_type_id',
+        )
+    )
+    if not rows:
+        return
+
+    ids, citizens, types, weights, units, moments, catalog_types = zip(*rows)
+    scores = get_evaluator().score_batch(types, weights, units, moments)
+    credits = {}
+    ledger = []
+    for citizen_id, residue_type, points in zip(citizens, types, scores):
+        credits[citizen_id] = credits.get(citizen_id, 0) + points
+        ledger.append(PointsTransaction(
+            user_id=citizen_id,
+            points_gained=points,
+            description=f'Coleta de {residue_type} processada.',
+        ))
+    _set_points_awarded(dict(zip(ids, scores)))
+    _credit_points(credits, ledger)
+    record_processed(zip(citizens, catalog_types, weights, units), recycler_id)
+    enqueue_many('notify_collection_processed', [
+        (f'notificacao-coleta-processada:{collection_id}', {'collection_id': collection_id})
+        for collection_id in ids
+    ])
+
+
+def rescore_collections(rows, apply=True):
+    """
+    Recalcula os pontos de coletas já processadas pelas regras vigentes.
+
+    `rows` são tuplas (id, citizen_id, residue_type, weight, units,
+    processed_at, points_awarded) de coletas já creditadas. Cada cidadão
+    recebe no extrato um único ajuste com a diferença do lote (positiva ou
+    negativa). Com `apply=False`, só calcula. Retorna ({collection_id: novos
+    pontos} das coletas alteradas, {citizen_id: diferença}).
+
+    As linhas podem ter sido lidas fora de transação: ao aplicar, as coletas
+    alteradas são relidas com trava e só entram as que ainda têm o
+    `points_awarded` lido. Assim, duas execuções sobrepostas (ou a repetição
+    de uma interrompida) nunca lançam o mesmo ajuste duas vezes.
+    """
+    if not rows:
+        return {}, {}
+    ids, citizens, types, weights, units, moments, awarded = zip(*rows)
+    scores = get_evaluator().score_batch(types, weights, units, moments)
+    changes = [
+        (collection_id, citizen_id, old, new)
+        for collection_id, citizen_id, old, new in zip(ids, citizens, awarded, scores)
+        if old != new
+    ]
+    if not apply or not changes:
+        return _summarize_rescore(changes)
+
+    with transaction.atomic():
+        current = dict(
+            Collection.objects.select_for_update()
+            .filter(id__in=[change[0] for change in changes])
+            .values_list('id', 'points_awarded')
+        )
+        changed, deltas = _summarize_rescore(
+            [change for change in changes if current.get(change[0]) == change[2]]
+        )
+        if changed:
+            _set_points_awarded(changed)
+            _credit_points(deltas, [
+                PointsTransaction(
+                    user_id=citizen_id, points_gained=delta,
+                    description='Ajuste de pontos: recálculo pelas regras de pontuação.',
+                )
+                for citizen_id, delta in deltas.items()
+            ])
+    return changed, deltas
+
+
+def _summarize_rescore(changes):
+    changed = {}
+    deltas = {}
+    for collection_id, citizen_id, old, new in changes:
+        changed[collection_id] = new
+        deltas[citizen_id] = deltas.get(citizen_id, 0) + new - old
+    return changed, {citizen_id: delta for citizen_id, delta in deltas.items() if delta}
+
+
+@register('notify_collection_processed')
+def notify_collection_processed(collection_id):
+    """
+    Tarefa: avisa o cidadão por e-mail que a coleta foi processada.
+
+    O envio não participa da transação: se a conclusão da tarefa falhar
+    depois dele, a nova tentativa pode repetir o e-mail.
+    """
+    collection = Collection.objects.select_related('residue__citizen').get(pk=collection_id)
+    citizen = collection.residue.citizen
+    if not citizen.email:
+        return
+    send_mail(
+        'Sua coleta foi processada',
+        f'Olá, {citizen.username}! O resíduo "{collection.residue.residue_type}" foi processado '
+        f'pela recicladora e {collection.points_awarded} pontos foram creditados no seu saldo.',
+        None,
+        [citizen.email],
+    )
@@ -1,7 +1,14 @@
-from django.db.models.signals import post_save
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.contrib.auth.models import User
 from django.dispatch import receiver
-from .models import Profile, Collection
+from .catalog import invalidate_catalog
+from .metrics import record_query
+from .models import PointsCampaign, PointsRule, Profile, Residue, ResidueType, Reward
+from .points import invalidate_rules
+from .residue_types import invalidate_types, resolve_type
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -19,19 +26,73 @@ def save_user_profile(sender, instance, **kwargs):
     """
     Salva o Profile associado sempre que o User for salvo.
     """
-    # Garante que o perfil exista antes de tentar salvá-lo
+    # Garante que o perfil exista antes de tentar salvá-lo. O saldo de pontos
+    # nunca é gravado por aqui: ele só muda por UPDATEs atômicos (ver services),
+    # e regravar um perfil carregado antes poderia desfazer créditos recentes.
     if hasattr(instance, 'profile'):
-        instance.profile.save()
+        instance.profile.save(update_fields=['user_type'])
 
-@receiver(post_save, sender=Collection)
-def update_residue_status_on_collection_change(sender, instance, **kwargs):
+@receiver(post_save, sender=Reward)
+@receiver(post_delete, sender=Reward)
+def invalidate_rewards_catalog(sender, **kwargs):
     """
-    Atualiza o status do Residue para corresponder ao da Collection.
+    Descarta o catálogo de recompensas em cache sempre que uma Reward muda.
+
+    Só após o commit, como as regras de pontuação e o índice de tipos: uma
+    listagem concorrente guardaria o catálogo anterior sob a versão nova.
+    """
+    transaction.on_commit(invalidate_catalog)
+
+@receiver(post_save, sender=PointsRule)
+@receiver(post_delete, sender=PointsRule)
+@receiver(post_save, sender=PointsCampaign)
+@receiver(post_delete, sender=PointsCampaign)
+def invalidate_points_rules(sender, **kwargs):
+    """
+    Força a recompilação das regras de pontuação quando uma regra ou campanha muda.
+
+    Só após o commit: um avaliador compilado antes dele leria as regras
+    antigas e ficaria guardado no processo com a versão nova (ou com uma
+    regra que um rollback desfaz) até a próxima alteração.
+    """
+    transaction.on_commit(invalidate_rules)
+
+@receiver(post_save, sender=ResidueType)
+@receiver(post_delete, sender=ResidueType)
+def invalidate_residue_types(sender, **kwargs):
+    """
+    Força a reconstrução do índice de tipos de resíduo quando um tipo muda.
+
+    Só após o commit: um índice montado antes dele poderia guardar um tipo
+    que um rollback desfaz, ou perder a alteração.
+    """
+    transaction.on_commit(invalidate_types)
+
+@receiver(pre_save, sender=Residue)
+def link_residue_catalog_type(sender, instance, **kwargs):
+    """
+    Liga ao catálogo o resíduo gravado sem tipo, com o nome do tipo. O
+    cadastro, a importação e o admin já resolvem o tipo antes de gravar.
+    """
+    if instance.catalog_type_id is None:
+        instance.catalog_type_id, instance.residue_type = resolve_type(instance.residue_type)
+
+@receiver(connection_created)
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    Aplica settings.SQLITE_PRAGMAS a cada nova conexão SQLite.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """
+    Conta as consultas de cada conexão na requisição em andamento (ver
+    core.middleware.RequestMetricsMiddleware).
     """
-    residue = instance.residue
-    if instance.status == 'PROCESSADO' and residue.status != 'PROCESSADO':
-        residue.status = 'PROCESSADO'
-        residue.save()
-    elif instance.status in ['SOLICITADA', 'ATRIBUIDA', 'EM_ROTA', 'COLETADA', 'ENTREGUE_RECICLADORA'] and residue.status != 'COLETA_SOLICITADA':
-        residue.status = 'COLETA_SOLICITADA'
-        residue.save()
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
@@ -0,0 +1,108 @@
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db.models import Case, DecimalField, F, IntegerField, Q, Value, When
+
+from .models import PointsStatistics, RecyclingStatistics
+
+RECYCLING_FIELDS = {
+    'weight': DecimalField(max_digits=14, decimal_places=2),
+    'units': IntegerField(),
+    'collections': IntegerField(),
+}
+POINTS_FIELDS = {
+    'points_earned': IntegerField(),
+    'points_spent': IntegerField(),
+}
+
+
+def _apply_deltas(model, key_fields, value_fields, deltas):
+    """
+    Soma `deltas` ({chave: {campo: valor}}) às linhas de `model`.
+
+    Garante a existência das linhas com um `bulk_create(ignore_conflicts)` e
+    aplica todos os incrementos em um único UPDATE com `F() + CASE`, de modo
+    que atualizações concorrentes da mesma linha nunca se sobrescrevem.
+    """
+    if not deltas:
+        return
+    model.objects.bulk_create(
+        [model(**dict(zip(key_fields, key))) for key in deltas],
+        ignore_conflicts=True,
+    )
+    conditions = {key: Q(**dict(zip(key_fields, key))) for key in deltas}
+    updates = {}
+    for field, output_field in value_fields.items():
+        whens = [
+            When(conditions[key], then=Value(delta.get(field, 0), output_field=output_field))
+            for key, delta in deltas.items()
+        ]
+        updates[field] = F(field) + Case(*whens, default=Value(0, output_field=output_field), output_field=output_field)
+    model.objects.filter(reduce(or_, conditions.values())).update(**updates)
+
+
+def record_processed(items, recycler_id):
+    """
+    Contabiliza coletas processadas nas estatísticas do cidadão e da recicladora.
+
+    `items` é uma sequência de (citizen_id, catalog_type_id, weight, units).
+    """
+    deltas = {}
+    for citizen_id, catalog_type_id, weight, units in items:
+        for user_id in (citizen_id, recycler_id):
+            if user_id is None:
+                continue
+            delta = deltas.setdefault((user_id, catalog_type_id), {'weight': Decimal('0'), 'units': 0, 'collections': 0})
+            delta['weight'] += weight or 0
+            delta['units'] += units or 0
+            delta['collections'] += 1
+    _apply_deltas(RecyclingStatistics, ('user_id', 'catalog_type_id'), RECYCLING_FIELDS, deltas)
+
+
+def record_points(earned=None, spent=None):
+    """
+    Contabiliza pontos ganhos e gastos; recebe dicionários {user_id: pontos}.
+    """
+    deltas = {}
+    for field, values in (('points_earned', earned), ('points_spent', spent)):
+        for user_id, points in (values or {}).items():
+            deltas.setdefault((user_id,), {})[field] = points
+    _apply_deltas(PointsStatistics, ('user_id',), POINTS_FIELDS, deltas)
+
+
+def _summary(by_type, points):
+    return {
+        'by_type': by_type,
+        'total_weight': sum((row.weight for row in by_type), Decimal('0')),
+        'total_units': sum(row.units for row in by_type),
+        'total_collections': sum(row.collections for row in by_type),
+        'points_earned': points.points_earned if points else 0,
+        'points_spent': points.points_spent if points else 0,
+    }
+
+
+def statistics_for(user, include_points=True):
+    """
+    Resumo das estatísticas do usuário para os dashboards: uma consulta, mais
+    uma para os pontos quando `include_points` (usado só para cidadãos).
+    """
+    by_type = list(
+        RecyclingStatistics.objects.filter(user=user).select_related('catalog_type')
+        .order_by('-collections', 'catalog_type__name')
+    )
+    points = PointsStatistics.objects.filter(user=user).first() if include_points else None
+    return _summary(by_type, points)
+
+
+async def astatistics_for(user, include_points=True):
+    """
+    Versão assíncrona de `statistics_for`, para views async.
+    """
+    by_type = [
+        row async for row in
+        RecyclingStatistics.objects.filter(user=user).select_related('catalog_type')
+        .order_by('-collections', 'catalog_type__name').aiterator()
+    ]
+    points = await PointsStatistics.objects.filter(user=user).afirst() if include_points else None
+    return _summary(by_type, points)
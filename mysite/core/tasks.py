@@ -0,0 +1,124 @@
+import traceback
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+# Tempo que um worker tem para concluir uma tarefa antes que outro a retome
+TASK_LEASE_SECONDS = 300
+# Espera antes da nova tentativa: TASK_RETRY_BASE_SECONDS * 2 ** (tentativas - 1)
+TASK_RETRY_BASE_SECONDS = 5
+TASK_RETRY_MAX_SECONDS = 60 * 60
+TASK_BATCH_SIZE = 10
+
+_handlers = {}
+
+
+def register(name):
+    """
+    Registra a função como a tarefa `name`; ela recebe o payload como
+    argumentos nomeados.
+    """
+    def decorator(func):
+        _handlers[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, key=None, **payload):
+    """
+    Enfileira a tarefa na transação atual: se a transação for revertida, a
+    tarefa também é. Uma `key` já enfileirada é ignorada.
+    """
+    enqueue_many(name, [(key, payload)])
+
+
+def enqueue_many(name, items):
+    """
+    Enfileira várias tarefas `name` em um único INSERT; `items` é uma
+    sequência de (key, payload).
+    """
+    Task.objects.bulk_create(
+        [Task(name=name, key=key, payload=payload) for key, payload in items],
+        ignore_conflicts=True,
+    )
+
+
+def claim_tasks(limit=TASK_BATCH_SIZE):
+    """
+    Reivindica até `limit` tarefas prontas para execução.
+
+    São elegíveis as pendentes cujo `run_after` já passou e as em execução
+    cujo prazo venceu (o worker morreu). Como em `claim_next_collections`,
+    as linhas são travadas com SKIP LOCKED onde o banco suporta e o UPDATE
+    repete a condição; a tentativa é contada já na reivindicação.
+    """
+    now = timezone.now()
+    ready = Q(status='PENDENTE', run_after__lte=now) | Q(status='EXECUTANDO', locked_until__lt=now)
+    with transaction.atomic():
+        candidates = list(
+            Task.objects.select_for_update(skip_locked=True)
+            .filter(ready)
+            .order_by('run_after', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not candidates:
+            return []
+        Task.objects.filter(ready, id__in=candidates).update(
+            status='EXECUTANDO',
+            attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=TASK_LEASE_SECONDS),
+        )
+        return list(
+            Task.objects.filter(id__in=candidates, status='EXECUTANDO', locked_until__gt=now).order_by('run_after', 'id')
+        )
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=min(TASK_RETRY_BASE_SECONDS * 2 ** (attempts - 1), TASK_RETRY_MAX_SECONDS))
+
+
+def run_task(task):
+    """
+    Executa uma tarefa reivindicada. Retorna True se ela foi concluída.
+
+    Os efeitos da tarefa e a sua conclusão são gravados na mesma transação,
+    e a conclusão exige que `attempts` não tenha mudado: se o prazo venceu e
+    outro worker retomou a tarefa, esta execução é revertida por inteiro.
+    Em caso de erro, a tarefa volta para a fila com espera exponencial, até
+    `max_attempts` tentativas.
+    """
+    current = Task.objects.filter(pk=task.pk, status='EXECUTANDO', attempts=task.attempts)
+    try:
+        with transaction.atomic():
+            handler = _handlers.get(task.name)
+            if handler is None:
+                raise LookupError(f'Tarefa desconhecida: {task.name}')
+            handler(**task.payload)
+            if not current.update(status='CONCLUIDA', finished_at=timezone.now(), locked_until=None, last_error=''):
+                transaction.set_rollback(True)
+                return False
+        return True
+    except Exception:
+        error = traceback.format_exc()
+        if task.attempts >= task.max_attempts:
+            current.update(status='FALHOU', finished_at=timezone.now(), locked_until=None, last_error=error)
+        else:
+            current.update(
+                status='PENDENTE', run_after=timezone.now() + _retry_delay(task.attempts),
+                locked_until=None, last_error=error,
+            )
+        return False
+
+
+def run_pending(limit=TASK_BATCH_SIZE):
+    """
+    Reivindica e executa um lote de tarefas. Retorna quantas foram reivindicadas.
+    """
+    tasks = claim_tasks(limit)
+    for task in tasks:
+        run_task(task)
+    return len(tasks)
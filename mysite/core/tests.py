@@ -1,7 +1,56 @@
-from django.test import TestCase, Client
+import asyncio
+import importlib
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.apps import apps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import AsyncClient, TestCase, TransactionTestCase, Client
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
 from django.contrib.auth.models import User
-from .models import Residue, Profile, Collection, Reward
+from django.utils import timezone
+from django.utils.http import http_date
+from . import metrics, urls as core_urls
+from .catalog import split_by_affordability
+from .events import COLLECTIONS_CHANNEL, InProcessBroker
+from .geo import encode_geohash, geocode, geohash_neighbors, haversine_km, next_geohash, set_coordinates
+from .imports import import_residues
+from .stats import statistics_for
+from .tasks import claim_tasks, enqueue, register, run_pending, run_task
+from .management.commands.benchmark_views import ROUTES as BENCHMARK_ROUTES
+from .management.commands.recalculate_points import COLUMNS as RECALCULATE_COLUMNS
+from .models import (
+    Residue, Profile, Collection, Reward, UserReward, PointsTransaction, PointsStatistics, RecyclingStatistics,
+    PointsCampaign, PointsRule, ResidueType, Task,
+)
+from .pagination import PAGE_SIZE, paginate_keyset
+from .points import get_evaluator, invalidate_rules
+from .residue_types import get_index, invalidate_types, resolve_types
+from .routing import nearest_open_collections, suggest_route
+from .services import (
+    award_points, bulk_process_collections, bulk_transition_collections, claim_collection,
+    claim_next_collections, claim_reward, enqueue_processed_credit, rescore_collections, spend_points,
+    sync_residue_status,
+)
 
 class UserCreationTest(TestCase):
     def test_user_and_profile_creation(self):
@@ -66,6 +115,14 @@ class CollectorFlowTest(TestCase):
         self.collection.refresh_from_db()
         self.assertEqual(self.collection.status, 'ENTREGUE_RECICLADORA')
 
+    def test_failed_residue_sync_keeps_collection_status(self):
+        Collection.objects.filter(id=self.collection.id).update(status='ATRIBUIDA', collector=self.collector)
+        with mock.patch('core.views.sync_residue_status', side_effect=OperationalError('database is locked')):
+            with self.assertRaises(OperationalError):
+                self.client.post(reverse('core:collection_transition', args=[self.collection.id]), {'status': 'EM_ROTA'})
+        self.collection.refresh_from_db()
+        self.assertEqual(self.collection.status, 'ATRIBUIDA')
+
 class RecyclerFlowTest(TestCase):
     def setUp(self):
         self.client = Client()
@@ -83,6 +140,10 @@ class RecyclerFlowTest(TestCase):
         self.assertEqual(self.collection.status, 'PROCESSADO')
         self.residue.refresh_from_db()
         self.assertEqual(self.residue.status, 'PROCESSADO')
+        # Os pontos são creditados pelo worker da fila
+        self.citizen.profile.refresh_from_db()
+        self.assertEqual(self.citizen.profile.points, 0)
+        run_pending()
         self.citizen.profile.refresh_from_db()
         self.assertEqual(self.citizen.profile.points, 10)
 
@@ -106,3 +167,1238 @@ class PointsAndRewardsTest(TestCase):
         self.client.post(reverse('core:redeem_reward', args=[self.reward.id]))
         self.user.profile.refresh_from_db()
         self.assertEqual(self.user.profile.points, 20)
+
+    def test_stock_and_per_user_limit(self):
+        self.user.profile.points = 500
+        self.user.profile.save()
+        limited = Reward.objects.create(name='Camiseta', points_required=10, stock=3, per_user_limit=2)
+        self.assertIsNotNone(claim_reward(self.user, limited)[0])
+        self.assertIsNotNone(claim_reward(self.user, limited)[0])
+        self.assertEqual(
+            claim_reward(self.user, limited), (None, 'Você já atingiu o limite de resgates desta recompensa.')
+        )
+
+        other = User.objects.create_user(username='other')
+        Profile.objects.filter(user=other).update(points=100)
+        self.assertIn(limited, split_by_affordability(0)[1])
+        self.assertIsNotNone(claim_reward(other, limited)[0])
+        self.assertEqual(claim_reward(other, limited), (None, 'Esta recompensa está esgotada.'))
+
+        # Recusas não deixam débito nem resgate para trás
+        self.assertEqual(Profile.objects.get(user=other).points, 90)
+        self.assertEqual(UserReward.objects.filter(reward=limited).count(), 3)
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.points, 480)
+        limited.refresh_from_db()
+        self.assertEqual(limited.stock, 0)
+        # O resgate da última unidade tira a recompensa do catálogo
+        self.assertNotIn(limited, split_by_affordability(1000)[0])
+
+class DashboardQueryCountTest(TestCase):
+    """
+    Garante que os dashboards executam um número constante de consultas,
+    independentemente da quantidade de coletas exibidas.
+    """
+    def setUp(self):
+        self.client = Client()
+        self.citizen = User.objects.create_user(username='citizen', password='password')
+        self.collector = User.objects.create_user(username='collector', password='password')
+        self.collector.profile.user_type = 'L'
+        self.collector.profile.save()
+        self.recycler = User.objects.create_user(username='recycler', password='password')
+        self.recycler.profile.user_type = 'R'
+        self.recycler.profile.save()
+
+    def create_collections(self, count):
+        for i in range(count):
+            for status, collector in (
+                ('SOLICITADA', None),
+                ('EM_ROTA', self.collector),
+                ('ENTREGUE_RECICLADORA', self.collector),
+                ('PROCESSADO', self.collector),
+            ):
+                residue = Residue.objects.create(
+                    citizen=self.citizen, residue_type=f'Tipo {i}', units=1, location='Rua A'
+                )
+                Collection.objects.create(residue=residue, status=status, collector=collector)
+
+    def assertConstantQueries(self, username, url_name, expected):
+        self.client.login(username=username, password='password')
+        url = reverse(url_name)
+        self.create_collections(1)
+        with self.assertNumQueries(expected):
+            self.client.get(url)
+        self.create_collections(5)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_collector_dashboard(self):
+        # sessão, usuário com perfil, coletas disponíveis e coletas do coletor
+        self.assertConstantQueries('collector', 'core:collector_dashboard', 4)
+
+    def test_recycler_dashboard(self):
+        # sessão, usuário com perfil, coletas a processar, últimas processadas e estatísticas
+        self.assertConstantQueries('recycler', 'core:recycler_dashboard', 5)
+
+    def test_collection_status(self):
+        # sessão, usuário com perfil e coletas do cidadão
+        self.assertConstantQueries('citizen', 'core:collection_status', 3)
+
+class AsyncDashboardTest(TestCase):
+    """
+    Exercita os dashboards assíncronos pelo caminho ASGI: qualquer acesso
+    síncrono ao banco na view ou no template levantaria SynchronousOnlyOperation.
+    """
+    def setUp(self):
+        self.citizen = User.objects.create_user(username='citizen', password='password')
+        self.collector = User.objects.create_user(username='collector', password='password')
+        self.collector.profile.user_type = 'L'
+        self.collector.profile.save()
+        self.recycler = User.objects.create_user(username='recycler', password='password')
+        self.recycler.profile.user_type = 'R'
+        self.recycler.profile.save()
+        for status in ('SOLICITADA', 'EM_ROTA', 'ENTREGUE_RECICLADORA', 'PROCESSADO'):
+            residue = Residue.objects.create(citizen=self.citizen, residue_type=status, units=1, location='Rua A')
+            Collection.objects.create(residue=residue, status=status, collector=self.collector)
+        award_points(self.citizen, 20, 'Crédito')
+        Reward.objects.create(name='Adesivo', points_required=10)
+
+    async def get(self, user, url_name):
+        client = AsyncClient()
+        await client.aforce_login(user)
+        response = await client.get(reverse(url_name))
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    async def test_collector_dashboard(self):
+        response = await self.get(self.collector, 'core:collector_dashboard')
+        self.assertEqual([c.status for c in response.context['available_collections']], ['SOLICITADA'])
+        self.assertEqual([c.status for c in response.context['my_collections']], ['EM_ROTA'])
+
+    async def test_recycler_dashboard(self):
+        response = await self.get(self.recycler, 'core:recycler_dashboard')
+        self.assertEqual(len(response.context['collections_to_process']), 1)
+        self.assertEqual(len(response.context['processed_collections']), 1)
+
+    async def test_rows_cached_until_collection_changes(self):
+        await sync_to_async(cache.clear)()
+        collection = await Collection.objects.select_related('residue').aget(status='SOLICITADA')
+        response = await self.get(self.collector, 'core:collector_dashboard')
+        self.assertContains(response, '<td>SOLICITADA</td>')
+
+        # O resíduo mudou, mas a coleta não: a linha vem do cache
+        await Residue.objects.filter(pk=collection.residue_id).aupdate(residue_type='Vidro')
+        response = await self.get(self.collector, 'core:collector_dashboard')
+        self.assertContains(response, '<td>SOLICITADA</td>')
+        self.assertContains(response, reverse('core:accept_collection', args=[collection.id]))
+
+        await Collection.objects.filter(pk=collection.pk).aupdate(updated_at=timezone.now())
+        response = await self.get(self.collector, 'core:collector_dashboard')
+        self.assertContains(response, '<td>Vidro</td>')
+
+    async def test_citizen_pages(self):
+        response = await self.get(self.citizen, 'core:collection_status')
+        self.assertEqual(len(response.context['collections']), 4)
+        response = await self.get(self.citizen, 'core:points_history')
+        self.assertEqual(len(response.context['transactions']), 1)
+        response = await self.get(self.citizen, 'core:rewards_list')
+        self.assertEqual([r.name for r in response.context['affordable_rewards']], ['Adesivo'])
+
+    async def test_messages_render_from_session(self):
+        client = AsyncClient()
+        await client.aforce_login(self.citizen)
+        reward = await Reward.objects.aget(name='Adesivo')
+        await client.post(reverse('core:redeem_reward', args=[reward.id]))
+        response = await client.get(reverse('core:rewards_list'))
+        self.assertContains(response, 'Parabéns!')
+
+    async def test_role_and_login_are_enforced(self):
+        client = AsyncClient()
+        self.assertEqual((await client.get(reverse('core:points_history'))).status_code, 302)
+        await client.aforce_login(self.collector)
+        self.assertEqual((await client.get(reverse('core:points_history'))).status_code, 403)
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(username='citizen', password='password')
+        self.client.login(username='citizen', password='password')
+        residues = Residue.objects.bulk_create([
+            Residue(citizen=self.user, residue_type=f'Tipo {i}', units=1, location='Rua A')
+            for i in range(PAGE_SIZE + 5)
+        ])
+        # Força empates em created_at para validar o desempate por id
+        Residue.objects.filter(id__in=[r.id for r in residues]).update(created_at=timezone.now())
+
+    def test_pages_cover_all_rows_in_stable_order(self):
+        seen = []
+        cursor = None
+        while True:
+            page = paginate_keyset(Residue.objects.filter(citizen=self.user), cursor, '-created_at')
+            seen.extend(r.id for r in page)
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        expected = list(Residue.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_residue_list_view_pages(self):
+        response = self.client.get(reverse('core:residue_list'))
+        page = response.context['residues']
+        self.assertEqual(len(page), PAGE_SIZE)
+        self.assertTrue(page.has_next)
+
+        response = self.client.get(reverse('core:residue_list'), {'cursor': page.next_cursor})
+        page = response.context['residues']
+        self.assertEqual(len(page), 5)
+        self.assertFalse(page.has_next)
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('core:residue_list'), {'cursor': 'invalido'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['residues'].is_first)
+
+class SeedCommandTest(TestCase):
+    def test_seed_creates_consistent_dataset(self):
+        call_command(
+            'seed_reciclai', citizens=5, collectors=2, recyclers=1, residues=300,
+            rewards=3, redemptions=20, batch_size=50, stdout=StringIO(),
+        )
+        statuses = set(Collection.objects.values_list('status', flat=True))
+        self.assertEqual(statuses, {status for status, _ in Collection.STATUS_CHOICES})
+        self.assertEqual(Profile.objects.filter(user_type='C').count(), 5)
+        for profile in Profile.objects.filter(user_type='C'):
+            total = PointsTransaction.objects.filter(user=profile.user).aggregate(total=Sum('points_gained'))['total']
+            self.assertEqual(profile.points, total or 0)
+        self.assertFalse(Collection.objects.filter(status='PROCESSADO').exclude(residue__status='PROCESSADO').exists())
+
+class BenchmarkViewsTest(TestCase):
+    def test_every_route_has_a_benchmark_scenario(self):
+        names = {pattern.name for pattern in core_urls.urlpatterns}
+        self.assertEqual(names - set(BENCHMARK_ROUTES), set())
+
+    def test_index_benchmark_keeps_existing_indexes_by_default(self):
+        call_command(
+            'seed_reciclai', citizens=2, collectors=1, recyclers=1, residues=50,
+            rewards=1, redemptions=0, batch_size=50, stdout=StringIO(),
+        )
+        out = StringIO()
+        with CaptureQueriesContext(connection) as ctx:
+            call_command('benchmark_indexes', use_existing_db=True, repeat=1, stdout=out)
+        self.assertIn('--drop-indexes', out.getvalue())
+        self.assertFalse(any('DROP INDEX' in query['sql'] for query in ctx.captured_queries))
+
+class PointsLedgerTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='citizen', password='password')
+
+    def test_spend_points_never_overdraws(self):
+        award_points(self.user, 60, 'Crédito inicial')
+        self.assertIsNotNone(spend_points(self.user, 50, 'Resgate'))
+        self.assertIsNone(spend_points(self.user, 50, 'Resgate'))
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.points, 10)
+        self.assertEqual(PointsTransaction.objects.filter(user=self.user).count(), 2)
+
+    def test_saving_user_does_not_overwrite_balance(self):
+        stale_user = User.objects.select_related('profile').get(pk=self.user.pk)
+        award_points(self.user, 30, 'Crédito')
+        stale_user.save()
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.points, 30)
+
+    def test_reconcile_points_reports_and_fixes_drift(self):
+        award_points(self.user, 40, 'Crédito')
+        Profile.objects.filter(user=self.user).update(points=25)
+        out = StringIO()
+        call_command('reconcile_points', stdout=out)
+        self.assertIn('saldo 25, extrato 40', out.getvalue())
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.points, 25)
+
+        call_command('reconcile_points', fix=True, stdout=StringIO())
+        self.user.profile.refresh_from_db()
+        self.assertEqual(self.user.profile.points, 40)
+
+class CollectionClaimTest(TestCase):
+    def setUp(self):
+        self.citizen = User.objects.create_user(username='citizen', password='password')
+        self.collectors = []
+        for name in ('collector1', 'collector2'):
+            collector = User.objects.create_user(username=name, password='password')
+            collector.profile.user_type = 'L'
+            collector.profile.save()
+            self.collectors.append(collector)
+        self.collections = []
+        for i in range(3):
+            residue = Residue.objects.create(citizen=self.citizen, residue_type='Vidro', units=1, location='Rua A')
+            self.collections.append(Collection.objects.create(residue=residue))
+
+    def test_second_claim_loses(self):
+        collection = self.collections[0]
+        self.assertTrue(claim_collection(collection.id, self.collectors[0]))
+        self.assertFalse(claim_collection(collection.id, self.collectors[1]))
+        collection.refresh_from_db()
+        self.assertEqual(collection.collector, self.collectors[0])
+
+    def test_accept_already_claimed_collection(self):
+        collection = self.collections[0]
+        claim_collection(collection.id, self.collectors[0])
+        client = Client()
+        client.login(username='collector2', password='password')
+        client.post(reverse('core:accept_collection', args=[collection.id]))
+        collection.refresh_from_db()
+        self.assertEqual(collection.collector, self.collectors[0])
+
+    def test_claim_next_assigns_oldest_open_collections(self):
+        client = Client()
+        client.login(username='collector1', password='password')
+        client.post(reverse('core:claim_next'), {'quantity': 2})
+        claimed = Collection.objects.filter(collector=self.collectors[0], status='ATRIBUIDA')
+        self.assertEqual(set(claimed.values_list('id', flat=True)), {c.id for c in self.collections[:2]})
+        self.assertEqual(claim_next_collections(self.collectors[1], 5), [self.collections[2].id])
+
+
+class ThreadedTestMixin:
+    # Espera máxima de cada thread pela trava do banco
+    LOCK_WAIT_SECONDS = 10
+
+    def run_threads(self, users, target):
+        """
+        Executa `target(user)` em uma thread por usuário, cada uma com sua
+        própria conexão, todas liberadas ao mesmo tempo. Retorna {user_id: resultado}.
+        """
+        barrier = threading.Barrier(len(users))
+        results, errors = {}, []
+
+        def worker(user):
+            try:
+                barrier.wait()
+                # O SQLite em memória compartilhada não respeita busy_timeout e
+                # devolve "table is locked" na hora; tenta de novo como o
+                # driver faria ao esperar pela trava.
+                deadline = time.monotonic() + self.LOCK_WAIT_SECONDS
+                while time.monotonic() < deadline:
+                    try:
+                        results[user.id] = target(user)
+                        return
+                    except OperationalError as exc:
+                        if 'locked' not in str(exc):
+                            raise
+                        time.sleep(0.005)
+                raise AssertionError('Trava do banco não foi liberada.')
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), len(users))
+        return results
+
+class ConcurrentClaimTest(ThreadedTestMixin, TransactionTestCase):
+    """
+    Dispara várias threads, cada uma com sua própria conexão, disputando as
+    mesmas coletas.
+    """
+    def setUp(self):
+        citizen = User.objects.create_user(username='citizen', password='password')
+        self.collectors = [User.objects.create_user(username=f'collector{i}') for i in range(8)]
+        self.collection_ids = []
+        for i in range(20):
+            residue = Residue.objects.create(citizen=citizen, residue_type='Vidro', units=1, location='Rua A')
+            self.collection_ids.append(Collection.objects.create(residue=residue).id)
+
+    def test_single_winner_per_collection(self):
+        target_id = self.collection_ids[0]
+        results = self.run_threads(self.collectors, lambda collector: claim_collection(target_id, collector))
+        self.assertEqual(sum(results.values()), 1)
+        winner = [user_id for user_id, won in results.items() if won][0]
+        self.assertEqual(Collection.objects.get(id=target_id).collector_id, winner)
+
+    def test_claim_next_batches_do_not_overlap(self):
+        results = self.run_threads(self.collectors, lambda collector: claim_next_collections(collector, 3))
+        claimed = [collection_id for ids in results.values() for collection_id in ids]
+        self.assertEqual(len(claimed), len(set(claimed)))
+        for user_id, ids in results.items():
+            self.assertEqual(
+                Collection.objects.filter(id__in=ids, collector_id=user_id, status='ATRIBUIDA').count(), len(ids)
+            )
+
+class ConcurrentRedemptionTest(ThreadedTestMixin, TransactionTestCase):
+    """
+    Vários cidadãos resgatando ao mesmo tempo uma recompensa de estoque
+    limitado, cada um tentando mais vezes do que o limite por usuário.
+    """
+    ATTEMPTS = 4
+
+    def setUp(self):
+        self.citizens = [User.objects.create_user(username=f'citizen{i}') for i in range(12)]
+        Profile.objects.update(points=1000)
+        self.reward = Reward.objects.create(name='Voucher', points_required=10, stock=15, per_user_limit=2)
+
+    def redeem(self, citizen):
+        # Uma tentativa interrompida pela trava do SQLite é repetida inteira,
+        # por isso o resultado é conferido no banco, não no retorno
+        for _ in range(self.ATTEMPTS):
+            claim_reward(citizen, self.reward)
+
+    def test_no_oversell(self):
+        self.run_threads(self.citizens, self.redeem)
+        self.reward.refresh_from_db()
+        self.assertEqual(self.reward.stock, 0)
+        self.assertEqual(UserReward.objects.filter(reward=self.reward).count(), 15)
+        for citizen in self.citizens:
+            count = UserReward.objects.filter(user=citizen, reward=self.reward).count()
+            self.assertLessEqual(count, 2)
+            self.assertEqual(Profile.objects.get(user=citizen).points, 1000 - 10 * count)
+        self.assertEqual(PointsTransaction.objects.filter(points_gained=-10).count(), 15)
+
+class BulkTransitionTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.citizens = [User.objects.create_user(username=f'citizen{i}') for i in range(3)]
+        self.collector = User.objects.create_user(username='collector', password='password')
+        self.collector.profile.user_type = 'L'
+        self.collector.profile.save()
+        self.other_collector = User.objects.create_user(username='other')
+        self.recycler = User.objects.create_user(username='recycler', password='password')
+        self.recycler.profile.user_type = 'R'
+        self.recycler.profile.save()
+
+    def create_collections(self, count, status, collector=None):
+        collections = []
+        for i in range(count):
+            residue = Residue.objects.create(
+                citizen=self.citizens[i % len(self.citizens)], residue_type='Papel', units=1,
+                location='Rua A', status='COLETA_SOLICITADA',
+            )
+            collections.append(Collection.objects.create(residue=residue, status=status, collector=collector))
+        return collections
+
+    def test_collector_bulk_transition_validates_each_collection(self):
+        assigned = self.create_collections(3, 'ATRIBUIDA', self.collector)
+        on_route = self.create_collections(1, 'EM_ROTA', self.collector)
+        foreign = self.create_collections(1, 'ATRIBUIDA', self.other_collector)
+        ids = [c.id for c in assigned + on_route + foreign]
+
+        updated, rejected = bulk_transition_collections(self.collector, ids, 'EM_ROTA')
+
+        self.assertEqual(set(updated), {c.id for c in assigned})
+        self.assertEqual(set(rejected), {on_route[0].id, foreign[0].id})
+        self.assertEqual(Collection.objects.filter(status='EM_ROTA', collector=self.collector).count(), 4)
+
+    def test_bulk_process_uses_constant_queries(self):
+        self.client.login(username='recycler', password='password')
+        url = reverse('core:bulk_process')
+        few = self.create_collections(2, 'ENTREGUE_RECICLADORA', self.collector)
+        many = self.create_collections(12, 'ENTREGUE_RECICLADORA', self.collector)
+
+        with CaptureQueriesContext(connection) as few_queries:
+            self.client.post(url, {'collection_ids': [c.id for c in few]})
+        with CaptureQueriesContext(connection) as many_queries:
+            self.client.post(url, {'collection_ids': [c.id for c in many]})
+        self.assertEqual(len(few_queries), len(many_queries))
+        self.assertEqual(run_pending(), 2)
+
+        self.assertFalse(Collection.objects.exclude(status='PROCESSADO').exists())
+        self.assertFalse(Residue.objects.exclude(status='PROCESSADO').exists())
+        for citizen in self.citizens:
+            citizen.profile.refresh_from_db()
+            earned = PointsTransaction.objects.filter(user=citizen).aggregate(total=Sum('points_gained'))['total']
+            self.assertEqual(citizen.profile.points, earned)
+        self.assertEqual(PointsTransaction.objects.count(), 14)
+
+    def test_bulk_process_rejects_collections_not_delivered(self):
+        delivered = self.create_collections(1, 'ENTREGUE_RECICLADORA', self.collector)
+        collected = self.create_collections(1, 'COLETADA', self.collector)
+        processed, rejected = bulk_process_collections([delivered[0].id, collected[0].id], self.recycler)
+        self.assertEqual(processed, [delivered[0].id])
+        self.assertEqual(list(rejected), [collected[0].id])
+
+class ResidueStatusSyncTest(TestCase):
+    def setUp(self):
+        citizen = User.objects.create_user(username='citizen')
+        self.collections = []
+        for i in range(4):
+            residue = Residue.objects.create(
+                citizen=citizen, residue_type='Metal', units=1, location='Rua A', status='COLETA_SOLICITADA'
+            )
+            self.collections.append(Collection.objects.create(residue=residue, status='ENTREGUE_RECICLADORA'))
+        self.ids = [c.id for c in self.collections]
+
+    def test_sync_after_queryset_update(self):
+        Collection.objects.filter(id__in=self.ids[:3]).update(status='PROCESSADO')
+        self.assertEqual(sync_residue_status(self.ids), 3)
+        self.assertEqual(Residue.objects.filter(status='PROCESSADO').count(), 3)
+        self.assertEqual(Residue.objects.filter(status='COLETA_SOLICITADA').count(), 1)
+
+    def test_sync_skips_residues_already_in_sync(self):
+        self.assertEqual(sync_residue_status(self.ids), 0)
+        with self.assertNumQueries(1):
+            sync_residue_status(self.ids, statuses=['PROCESSADO'])
+
+    def test_cancelled_collection_keeps_residue_status(self):
+        Collection.objects.filter(id=self.ids[0]).update(status='CANCELADA')
+        self.assertEqual(sync_residue_status(self.ids), 0)
+
+class RewardsCatalogTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(username='citizen', password='password')
+        Profile.objects.filter(user=self.user).update(points=30)
+        self.cheap = Reward.objects.create(name='Adesivo', points_required=10)
+        self.exact = Reward.objects.create(name='Caneca', points_required=30)
+        self.expensive = Reward.objects.create(name='Voucher', points_required=100)
+        Reward.objects.create(name='Antiga', points_required=5, is_active=False)
+        self.client.login(username='citizen', password='password')
+
+    def test_split_by_affordability(self):
+        affordable, unaffordable = split_by_affordability(30)
+        self.assertEqual(affordable, [self.cheap, self.exact])
+        self.assertEqual(unaffordable, [self.expensive])
+
+    def test_catalog_is_served_from_cache(self):
+        self.client.get(reverse('core:rewards_list'))
+        # sessão e usuário com perfil; o catálogo vem do cache
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('core:rewards_list'))
+        self.assertEqual(response.context['affordable_rewards'], [self.cheap, self.exact])
+
+    def test_saving_a_reward_invalidates_catalog(self):
+        self.client.get(reverse('core:rewards_list'))
+        self.expensive.points_required = 20
+        with self.captureOnCommitCallbacks(execute=True):
+            self.expensive.save()
+        response = self.client.get(reverse('core:rewards_list'))
+        self.assertEqual(len(response.context['affordable_rewards']), 3)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cheap.delete()
+        response = self.client.get(reverse('core:rewards_list'))
+        self.assertNotIn(self.cheap.name, [r.name for r in response.context['affordable_rewards']])
+
+class StatisticsTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.citizen = User.objects.create_user(username='citizen', password='password')
+        self.recycler = User.objects.create_user(username='recycler', password='password')
+        self.recycler.profile.user_type = 'R'
+        self.recycler.profile.save()
+        self.collections = []
+        for residue_type, weight, units in (('Vidro', 2, None), ('vidro ', Decimal('1.5'), None), ('PET', None, 12)):
+            residue = Residue.objects.create(
+                citizen=self.citizen, residue_type=residue_type, weight=weight, units=units, location='Rua A'
+            )
+            self.collections.append(Collection.objects.create(residue=residue, status='ENTREGUE_RECICLADORA'))
+        self.reward = Reward.objects.create(name='Adesivo', points_required=15)
+
+    def snapshot(self):
+        return (
+            sorted(RecyclingStatistics.objects.values_list('user_id', 'catalog_type__name', 'weight', 'units', 'collections')),
+            sorted(PointsStatistics.objects.values_list('user_id', 'points_earned', 'points_spent')),
+        )
+
+    def test_incremental_statistics_match_rebuild(self):
+        self.client.login(username='recycler', password='password')
+        self.client.post(reverse('core:process_collection', args=[self.collections[0].id]))
+        self.client.post(reverse('core:bulk_process'), {'collection_ids': [c.id for c in self.collections[1:]]})
+        run_pending()
+        self.client.login(username='citizen', password='password')
+        self.client.post(reverse('core:redeem_reward', args=[self.reward.id]))
+
+        stats = statistics_for(self.citizen)
+        self.assertEqual(stats['total_collections'], 3)
+        self.assertEqual(stats['total_weight'], Decimal('3.5'))
+        self.assertEqual(stats['total_units'], 12)
+        # Agrupado pelo tipo do catálogo, qualquer que seja a grafia digitada
+        self.assertEqual([(row.catalog_type.name, row.collections) for row in stats['by_type']], [('Vidro', 2), ('PET', 1)])
+        self.assertEqual((stats['points_earned'], stats['points_spent']), (30, 15))
+        self.assertEqual(statistics_for(self.recycler)['total_collections'], 3)
+
+        incremental = self.snapshot()
+        call_command('rebuild_statistics', batch_size=1, stdout=StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.citizen = User.objects.create_user(username='citizen', password='password')
+        self.recycler = User.objects.create_user(username='recycler', password='password')
+        self.recycler.profile.user_type = 'R'
+        self.recycler.profile.save()
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        dates = [timezone.make_aware(timezone.datetime(2024, 3, day, 12)) for day in (1, 2, 3)]
+        for index, processed_at in enumerate(dates):
+            residue = Residue.objects.create(
+                citizen=self.citizen, residue_type=f'Tipo {index}', units=index + 1, location='Rua A'
+            )
+            Collection.objects.create(
+                residue=residue, status='PROCESSADO', processed_at=processed_at, processed_by=self.recycler
+            )
+            PointsTransaction.objects.create(user=self.citizen, points_gained=10, description=f'Coleta {index}')
+        PointsTransaction.objects.update(transaction_date=dates[0])
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_collections_csv_filters_inclusive_date_range(self):
+        self.client.login(username='recycler', password='password')
+        response = self.client.get(
+            reverse('core:export_collections'), {'format': 'csv', 'start': '2024-03-02', 'end': '2024-03-03'}
+        )
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'processado_em', 'tipo_residuo'])
+        self.assertEqual([line.split(',')[2] for line in lines[1:]], ['Tipo 1', 'Tipo 2'])
+
+    def test_ledger_json_is_staff_only(self):
+        self.client.login(username='citizen', password='password')
+        self.assertEqual(self.client.get(reverse('core:export_ledger')).status_code, 302)
+
+        self.client.login(username='staff', password='password')
+        rows = json.loads(self.read(self.client.get(reverse('core:export_ledger'), {'format': 'json'})))
+        self.assertEqual([row['descricao'] for row in rows], ['Coleta 0', 'Coleta 1', 'Coleta 2'])
+        self.assertEqual(rows[0]['usuario'], 'citizen')
+
+    def test_invalid_parameters_are_rejected(self):
+        self.client.login(username='recycler', password='password')
+        url = reverse('core:export_collections')
+        self.assertEqual(self.client.get(url, {'format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': '03/2024'}).status_code, 400)
+
+    def test_export_command_streams_to_stdout(self):
+        out = StringIO()
+        call_command('export_data', 'collections', format='json', start='2024-03-03', stdout=out)
+        self.assertEqual([row['tipo_residuo'] for row in json.loads(out.getvalue())], ['Tipo 2'])
+
+class CSVImportTest(TestCase):
+    RESIDUES_CSV = (
+        'residue_type,weight,units,location,collection_date\n'
+        'Garrafa PET,,12,Rua A,\n'
+        'Vidro,2.5,,Rua B,2024-05-01\n'
+        'Papelão,,,Rua C,\n'
+        'Lata,-1,,Rua D,\n'
+        'Óleo,1,,,\n'
+    )
+
+    def setUp(self):
+        self.client = Client()
+        self.citizen = User.objects.create_user(username='citizen', password='password')
+        self.staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+
+    def test_residue_rows_follow_residue_form_rules(self):
+        with CaptureQueriesContext(connection) as ctx:
+            result = import_residues(StringIO(self.RESIDUES_CSV), self.citizen, batch_size=2)
+        self.assertEqual(result.created, 2)
+        self.assertEqual(sorted(Residue.objects.values_list('residue_type', flat=True)), ['Garrafa PET', 'Vidro'])
+        lines = {line: message for line, message in result.errors}
+        self.assertEqual(sorted(lines), [4, 5, 6])
+        self.assertIn('Peso ou as Unidades', lines[4])
+        self.assertIn('maior que zero', lines[5])
+        self.assertIn('Endereço de Coleta', lines[6])
+        # Um bulk_create por lote com linhas válidas, nunca um INSERT por linha
+        self.assertLessEqual(sum('INSERT' in query['sql'] for query in ctx.captured_queries), 3)
+
+    def test_missing_columns_are_rejected(self):
+        with self.assertRaises(ValueError):
+            import_residues(StringIO('residue_type,weight\nPET,1\n'), self.citizen)
+
+    def test_file_error_after_first_batch_rolls_back_everything(self):
+        content = (
+            'residue_type,weight,units,location,collection_date\n'
+            + 'Garrafa PET,,1,Rua A,\n' * 1000
+        ).encode() + b'Vidro,1,,Rua \xff,\n'
+        with self.assertRaises(UnicodeDecodeError):
+            import_residues(io.TextIOWrapper(io.BytesIO(content), encoding='utf-8'), self.citizen, batch_size=100)
+        self.assertFalse(Residue.objects.exists())
+
+        self.client.login(username='citizen', password='password')
+        upload = SimpleUploadedFile('residuos.csv', content, content_type='text/csv')
+        response = self.client.post(reverse('core:residue_import'), {'file': upload})
+        self.assertIsNone(response.context['result'])
+        self.assertIn('Nenhuma linha foi importada', str(response.context['form'].errors['file']))
+        self.assertFalse(Residue.objects.exists())
+
+    def test_upload_endpoint_reports_errors(self):
+        self.client.login(username='citizen', password='password')
+        upload = SimpleUploadedFile('residuos.csv', self.RESIDUES_CSV.encode(), content_type='text/csv')
+        response = self.client.post(reverse('core:residue_import'), {'file': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['result'].created, 2)
+        self.assertEqual(len(response.context['errors']), 3)
+        self.assertEqual(Residue.objects.filter(citizen=self.citizen).count(), 2)
+
+    def test_reward_import_refreshes_catalog(self):
+        Reward.objects.create(name='Adesivo', points_required=10)
+        self.client.login(username='citizen', password='password')
+        self.client.get(reverse('core:rewards_list'))
+
+        self.client.login(username='staff', password='password')
+        upload = SimpleUploadedFile(
+            'recompensas.csv', b'name,points_required,is_active\nCaneca,50,\nBone,0,\nChaveiro,5,false\n'
+        )
+        response = self.client.post(reverse('core:reward_import'), {'file': upload})
+        self.assertEqual(response.context['result'].created, 2)
+        self.assertEqual(Reward.objects.get(name='Caneca').description, 'Descrição padrão')
+        self.assertFalse(Reward.objects.get(name='Chaveiro').is_active)
+
+        self.client.login(username='citizen', password='password')
+        response = self.client.get(reverse('core:rewards_list'))
+        names = [r.name for r in response.context['unaffordable_rewards']]
+        self.assertIn('Caneca', names)
+        self.assertNotIn('Chaveiro', names)
+
+    def test_import_command(self):
+        out = StringIO()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'residuos.csv')
+            with open(path, 'w', encoding='utf-8') as fp:
+                fp.write(self.RESIDUES_CSV)
+            call_command('import_csv', 'residues', path, citizen='citizen', stdout=out)
+        self.assertIn('2 linha(s) importada(s)', out.getvalue())
+        self.assertIn('Linha 4:', out.getvalue())
+
+class ProximityTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.citizen = User.objects.create_user(username='citizen', password='password')
+        self.collector = User.objects.create_user(username='collector', password='password')
+        self.collector.profile.user_type = 'L'
+        self.collector.profile.save()
+        rng = random.Random(7)
+        residues = [
+            set_coordinates(Residue(
+                citizen=self.citizen, residue_type='PET', units=1,
+                location=f'{rng.uniform(-23.8, -23.35):.6f}, {rng.uniform(-46.85, -46.35):.6f}',
+            ))
+            for _ in range(300)
+        ]
+        Residue.objects.bulk_create(residues)
+        Collection.objects.bulk_create([Collection(residue=residue) for residue in residues])
+
+    def test_geohash_matches_reference(self):
+        self.assertEqual(encode_geohash(42.6, -5.6, 5), 'ezs42')
+        self.assertEqual(len(geohash_neighbors('6gyf4')), 9)
+        self.assertIn('6gyf4', geohash_neighbors('6gyf4'))
+        # Fim da faixa de uma célula, com "vai um" no último caractere
+        self.assertEqual([next_geohash(cell) for cell in ('6gyf4', '6gz', 'zz')], ['6gyf5', '6h', None])
+
+    def test_offline_geocoder_is_deterministic(self):
+        self.assertEqual(geocode('Rua A, 10'), geocode('  rua a,   10 '))
+        self.assertEqual(geocode('-23.5, -46.6'), (-23.5, -46.6))
+        self.assertIsNone(geocode(''))
+
+    def test_nearest_matches_brute_force(self):
+        origin = (-23.55, -46.63)
+        expected = sorted(
+            (haversine_km(*origin, lat, lng), pk)
+            for pk, lat, lng in Collection.objects.values_list('id', 'residue__latitude', 'residue__longitude')
+        )[:10]
+        nearest = nearest_open_collections(*origin, limit=10)
+        self.assertEqual([c.id for c in nearest], [pk for _, pk in expected])
+        self.assertEqual([c.distance_km for c in nearest], sorted(c.distance_km for c in nearest))
+
+    def test_dashboard_orders_by_distance(self):
+        self.client.login(username='collector', password='password')
+        response = self.client.get(reverse('core:collector_dashboard'), {'lat': '-23.55', 'lng': '-46.63'})
+        distances = [c.distance_km for c in response.context['available_collections']]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_route_visits_every_pickup_and_improves_on_arrival_order(self):
+        Collection.objects.update(collector=self.collector, status='ATRIBUIDA')
+        start = time.perf_counter()
+        route, total_km = suggest_route(self.collector, -23.55, -46.63)
+        self.assertLess(time.perf_counter() - start, 5)
+        self.assertEqual(len(route), 300)
+        self.assertEqual(len({c.id for c in route}), 300)
+
+        arrival = list(Collection.objects.order_by('created_at', 'id').values_list('residue__latitude', 'residue__longitude'))
+        naive_km = sum(haversine_km(*a, *b) for a, b in zip([(-23.55, -46.63)] + arrival, arrival))
+        self.assertLess(total_km, naive_km / 3)
+
+        self.client.login(username='collector', password='password')
+        response = self.client.get(reverse('core:collector_route'))
+        self.assertEqual(len(response.context['stops']), 300)
+
+class CollectionFeedTest(TestCase):
+    def setUp(self):
+        self.broker = InProcessBroker()
+        patcher = mock.patch('core.events._broker', self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.citizen = User.objects.create_user(username='citizen', password='password')
+        self.collector = User.objects.create_user(username='collector', password='password')
+        self.collector.profile.user_type = 'L'
+        self.collector.profile.save()
+        self.residue = Residue.objects.create(citizen=self.citizen, residue_type='PET', units=3, location='Rua A')
+
+    def request_collection(self):
+        client = Client()
+        client.login(username='citizen', password='password')
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('core:request_collection', args=[self.residue.id]))
+        return Collection.objects.get(residue=self.residue)
+
+    def test_broker_reports_gaps(self):
+        broker = InProcessBroker(buffer_size=2)
+        for collection_id in range(3):
+            broker.publish('c', {'type': 'created', 'collection_id': collection_id})
+        self.assertEqual([e['collection_id'] for e in broker.since('c', 1)[0]], [1, 2])
+        self.assertEqual(broker.since('c', 0), (None, 3))
+        self.assertEqual(broker.since('c', 99), (None, 3))
+
+    async def test_wait_wakes_up_on_publish_from_another_thread(self):
+        timer = threading.Timer(0.05, self.broker.publish, args=('c', {'type': 'claimed', 'collection_id': 7}))
+        timer.start()
+        events, latest = await self.broker.wait('c', 0, timeout=5)
+        self.assertEqual((events[0]['collection_id'], latest), (7, 1))
+
+    async def test_wait_times_out_without_events(self):
+        self.assertEqual(await self.broker.wait('c', 0, timeout=0.01), ([], 0))
+
+    async def test_cancelled_wait_unregisters_waiter(self):
+        # Cliente que desconecta no meio da espera
+        task = asyncio.create_task(self.broker.wait('c', 0, timeout=5))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(self.broker._waiters['c'], [])
+
+    def test_events_are_published_after_commit(self):
+        collection = self.request_collection()
+        with self.captureOnCommitCallbacks(execute=True):
+            claim_collection(collection.id, self.collector)
+        events, _ = self.broker.since(COLLECTIONS_CHANNEL, 0)
+        self.assertEqual([(e['type'], e['collection_id']) for e in events], [('created', collection.id), ('claimed', collection.id)])
+
+    def test_long_poll_returns_deltas_since_cursor(self):
+        client = Client()
+        client.login(username='collector', password='password')
+        url = reverse('core:collection_updates')
+        cursor = client.get(url).json()['cursor']
+        collection = self.request_collection()
+
+        data = client.get(url, {'cursor': cursor, 'timeout': 1}).json()
+        self.assertEqual(data['cursor'], cursor + 1)
+        self.assertEqual(data['events'][0]['collection']['residue_type'], 'PET')
+        self.assertEqual(data['events'][0]['collection_id'], collection.id)
+
+        self.assertEqual(client.get(url, {'cursor': data['cursor'], 'timeout': 0}).json()['events'], [])
+        self.assertTrue(client.get(url, {'cursor': 50}).json()['reset'])
+
+    async def test_sse_streams_events(self):
+        self.broker.publish(COLLECTIONS_CHANNEL, {'type': 'claimed', 'collection_id': 5})
+        client = AsyncClient()
+        await client.aforce_login(self.collector)
+        response = await client.get(reverse('core:collection_events'), {'cursor': 0, 'timeout': 0.2})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        self.assertIn('id: 1\nevent: claimed\n', body)
+
+    def test_feed_requires_collector(self):
+        client = Client()
+        client.login(username='citizen', password='password')
+        self.assertEqual(client.get(reverse('core:collection_updates')).status_code, 403)
+        self.assertEqual(Client().get(reverse('core:collection_events')).status_code, 302)
+
+class CollectionChangesTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.citizen = User.objects.create_user(username='citizen', password='password')
+        self.other = User.objects.create_user(username='other', password='password')
+        self.collections = []
+        for citizen in (self.citizen, self.citizen, self.other):
+            residue = Residue.objects.create(citizen=citizen, residue_type='PET', units=1, location='Rua A')
+            self.collections.append(Collection.objects.create(residue=residue))
+        self.client.login(username='citizen', password='password')
+        self.url = reverse('core:collection_changes')
+
+    def test_returns_only_changes_since_cursor(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual([c['id'] for c in data['collections']], [c.id for c in self.collections[:2]])
+        self.assertFalse(data['has_more'])
+
+        self.assertEqual(self.client.get(self.url, {'since': data['cursor']}).json()['collections'], [])
+        Collection.objects.filter(id=self.collections[0].id).update(status='ATRIBUIDA', updated_at=timezone.now())
+        changes = self.client.get(self.url, {'since': data['cursor']}).json()
+        self.assertEqual([(c['id'], c['status']) for c in changes['collections']], [(self.collections[0].id, 'ATRIBUIDA')])
+
+    def test_unchanged_poll_returns_304_without_loading_rows(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertFalse(any('"core_residue"."residue_type"' in q['sql'] for q in ctx.captured_queries))
+
+        Collection.objects.filter(id=self.collections[1].id).update(status='CANCELADA', updated_at=timezone.now())
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_change_in_the_same_second_is_not_hidden(self):
+        response = self.client.get(self.url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        since = http_date(time.time() + 1)
+
+        Collection.objects.filter(id=self.collections[0].id).update(status='ATRIBUIDA', updated_at=timezone.now())
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ATRIBUIDA', [c['status'] for c in response.json()['collections']])
+
+class DatabaseConfigTest(TestCase):
+    def test_sqlite_pragmas_are_applied_to_new_connections(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Apenas para SQLite.')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        self.citizen = User.objects.create_user(username='citizen', password='password')
+        for i in range(3):
+            residue = Residue.objects.create(citizen=self.citizen, residue_type='PET', units=1, location='Rua A')
+            Collection.objects.create(residue=residue)
+
+    def test_server_timing_and_histograms(self):
+        self.client.force_login(self.citizen)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('core:residue_list'))
+        self.assertRegex(
+            response['Server-Timing'],
+            rf'^app;dur=[\d.]+, db;dur=[\d.]+;desc="{len(queries)} consultas"$',
+        )
+        stats = metrics.registry.snapshot()['core:residue_list']
+        self.assertEqual(stats['requests'], 1)
+        self.assertEqual(stats['queries']['max'], len(queries))
+        self.assertEqual(sum(stats['latency_ms']['buckets'].values()), 1)
+
+    async def test_async_view_queries_are_counted(self):
+        client = AsyncClient()
+        await client.aforce_login(self.citizen)
+        response = await client.get(reverse('core:collection_status'))
+        self.assertEqual(response.status_code, 200)
+        stats = metrics.registry.snapshot()['core:collection_status']
+        self.assertGreater(stats['queries']['max'], 0)
+        self.assertGreater(stats['sql_ms']['total'], 0)
+
+    def test_slow_requests_are_logged_with_repeated_queries(self):
+        self.client.force_login(self.citizen)
+        with override_settings(REQUEST_METRICS_SLOW_QUERIES=1):
+            with self.assertLogs('core.middleware', 'WARNING') as logs:
+                self.client.get(reverse('core:residue_list'))
+        self.assertIn('core:residue_list', logs.output[0])
+        self.assertEqual(metrics.registry.snapshot()['core:residue_list']['slow_requests'], 1)
+
+        request_metrics = metrics.RequestMetrics()
+        for pk in range(3):
+            request_metrics.record('SELECT * FROM core_residue WHERE id = %s', 0.001)
+        request_metrics.record('SELECT 1', 0.001)
+        self.assertEqual(request_metrics.repeated_statements(), [('SELECT * FROM core_residue WHERE id = %s', 3)])
+
+    def test_endpoint_is_staff_only(self):
+        self.client.force_login(self.citizen)
+        self.client.get(reverse('core:residue_list'))
+        self.assertEqual(self.client.get(reverse('core:request_metrics')).status_code, 302)
+
+        staff = User.objects.create_user(username='staff', password='password', is_staff=True)
+        self.client.force_login(staff)
+        views = self.client.get(reverse('core:request_metrics')).json()['views']
+        self.assertEqual(views['core:residue_list']['requests'], 1)
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        self.citizen = User.objects.create_user(username='citizen', email='citizen@example.com')
+        self.recycler = User.objects.create_user(username='recycler')
+        self.collections = []
+        for residue_type in ('Vidro', 'PET'):
+            residue = Residue.objects.create(citizen=self.citizen, residue_type=residue_type, units=1, location='Rua A')
+            self.collections.append(Collection.objects.create(residue=residue, status='ENTREGUE_RECICLADORA'))
+
+    def test_processing_credits_points_once_and_notifies(self):
+        ids = [c.id for c in self.collections]
+        processed, _ = bulk_process_collections(ids, self.recycler)
+        self.assertEqual(sorted(processed), sorted(ids))
+        # Reenfileirar o mesmo lote não cria outra tarefa
+        enqueue_processed_credit(ids, self.recycler.id)
+        self.assertEqual(Task.objects.count(), 1)
+
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(Profile.objects.get(user=self.citizen).points, 20)
+        self.assertEqual(statistics_for(self.recycler, include_points=False)['total_collections'], 2)
+        self.assertEqual(run_pending(), 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[0].to, ['citizen@example.com'])
+        self.assertEqual(run_pending(), 0)
+        self.assertFalse(Task.objects.exclude(status='CONCLUIDA').exists())
+
+    def test_failures_are_retried_with_backoff_then_marked_failed(self):
+        calls = []
+
+        @register('test_flaky')
+        def flaky():
+            calls.append(1)
+            PointsTransaction.objects.create(user=self.citizen, points_gained=1, description='Não deve ficar')
+            raise RuntimeError('falha')
+
+        enqueue('test_flaky', key='flaky')
+        task = Task.objects.get(key='flaky')
+        Task.objects.filter(pk=task.pk).update(max_attempts=2)
+        self.assertEqual(run_pending(), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), ('PENDENTE', 1))
+        self.assertGreater(task.run_after, timezone.now())
+        self.assertIn('RuntimeError', task.last_error)
+        # Os efeitos da tentativa que falhou são revertidos
+        self.assertFalse(PointsTransaction.objects.exists())
+
+        self.assertEqual(run_pending(), 0)
+        Task.objects.filter(pk=task.pk).update(run_after=timezone.now())
+        self.assertEqual(run_pending(), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, len(calls)), ('FALHOU', 2, 2))
+
+    def test_expired_lease_is_reclaimed_and_stale_run_discarded(self):
+        bulk_process_collections([self.collections[0].id], self.recycler)
+        stale = claim_tasks()[0]
+        Task.objects.filter(pk=stale.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        fresh = claim_tasks()[0]
+        self.assertEqual(fresh.attempts, 2)
+
+        # O worker antigo perdeu a tarefa: sua execução é revertida
+        self.assertFalse(run_task(stale))
+        self.assertEqual(Profile.objects.get(user=self.citizen).points, 0)
+        self.assertTrue(run_task(fresh))
+        self.assertEqual(Profile.objects.get(user=self.citizen).points, 10)
+
+class RunWorkerTest(TransactionTestCase):
+    def test_run_worker_drains_queue(self):
+        citizen = User.objects.create_user(username='citizen', email='citizen@example.com')
+        recycler = User.objects.create_user(username='recycler')
+        ids = []
+        for i in range(5):
+            residue = Residue.objects.create(citizen=citizen, residue_type='Vidro', units=1, location='Rua A')
+            ids.append(Collection.objects.create(residue=residue, status='ENTREGUE_RECICLADORA').id)
+        for collection_id in ids:
+            bulk_process_collections([collection_id], recycler)
+
+        call_command('run_worker', workers=2, once=True, stdout=StringIO())
+        self.assertEqual(Profile.objects.get(user=citizen).points, 50)
+        self.assertEqual(Task.objects.filter(status='CONCLUIDA').count(), 10)
+        self.assertEqual(len(mail.outbox), 5)
+
+class PointsRulesTest(TestCase):
+    def setUp(self):
+        # As regras e tipos criados aqui são revertidos sem signal: descarta o avaliador compilado
+        invalidate_rules()
+        self.addCleanup(invalidate_rules)
+        self.addCleanup(invalidate_types)
+        self.citizen = User.objects.create_user(username='citizen')
+        self.recycler = User.objects.create_user(username='recycler')
+        self.now = timezone.now()
+
+    def process(self, residue_type, weight=None, units=None):
+        residue = Residue.objects.create(
+            citizen=self.citizen, residue_type=residue_type, weight=weight, units=units, location='Rua A'
+        )
+        collection = Collection.objects.create(residue=residue, status='ENTREGUE_RECICLADORA')
+        bulk_process_collections([collection.id], self.recycler)
+        run_pending()
+        collection.refresh_from_db()
+        return collection
+
+    def test_batch_scoring(self):
+        PointsRule.objects.create(residue_type='Vidro', points_per_kg=Decimal('4'), minimum_points=5, maximum_points=100)
+        PointsRule.objects.create(residue_type='PET', points_per_unit=Decimal('0.5'))
+        PointsRule.objects.create(residue_type='', points_per_kg=Decimal('1'), points_per_unit=Decimal('1'))
+        PointsCampaign.objects.create(
+            name='Semana do PET', residue_type='pet', multiplier=Decimal('2'),
+            starts_at=self.now - timedelta(days=1), ends_at=self.now + timedelta(days=1),
+        )
+        scores = get_evaluator().score_batch(
+            ['Vidro', 'vidro ', 'Vidro', 'PET', 'PET', 'Metal'],
+            [Decimal('2.5'), Decimal('0.5'), Decimal('80'), None, None, Decimal('1.15')],
+            [None, None, None, 7, 7, 3],
+            [self.now, self.now, self.now, self.now, self.now - timedelta(days=2), self.now],
+        )
+        # 10 pts; mínimo 5; teto 100; 3 pts em dobro; fora da campanha; regra padrão (1,15 + 3)
+        self.assertEqual(scores, [10, 5, 100, 6, 3, 4])
+
+    def test_rules_match_catalog_types(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ResidueType.objects.create(name='Garráfa PET', key='garrafa pet', aliases='PET\nGarrafinha')
+            ResidueType.objects.create(name='Latinha', key='latinha', aliases='Lata')
+        PointsRule.objects.create(residue_type='Garrafa PET', points_per_unit=Decimal('0.5'))
+        PointsRule.objects.create(residue_type='Lata', points_per_unit=Decimal('1'))
+        # Grafia com acento, apelido e apelido do tipo da regra
+        self.assertEqual(self.process('Garráfa PET', units=28).points_awarded, 14)
+        self.assertEqual(get_evaluator().score_batch(['garrafinha', 'latinha'], [None, None], [10, 3], [self.now] * 2), [5, 3])
+
+    def test_without_rules_each_collection_is_worth_the_default(self):
+        self.assertEqual(get_evaluator().score('Vidro', Decimal('30'), None, self.now), 10)
+
+    def test_processing_uses_current_rules(self):
+        self.assertEqual(self.process('Vidro', weight=Decimal('3')).points_awarded, 10)
+        # Alterar uma regra recompila o avaliador, após o commit
+        with self.captureOnCommitCallbacks(execute=True):
+            PointsRule.objects.create(residue_type='Vidro', points_per_kg=Decimal('5'))
+        self.assertEqual(self.process('Vidro', weight=Decimal('3')).points_awarded, 15)
+        self.assertEqual(Profile.objects.get(user=self.citizen).points, 25)
+
+    def test_recalculate_points(self):
+        collections = [self.process('Vidro', weight=Decimal('3')), self.process('PET', units=40)]
+        with self.captureOnCommitCallbacks(execute=True):
+            PointsRule.objects.create(residue_type='Vidro', points_per_kg=Decimal('5'))
+            PointsRule.objects.create(residue_type='PET', points_per_unit=Decimal('0.1'))
+
+        call_command('recalculate_points', dry_run=True, stdout=StringIO())
+        self.assertEqual(Profile.objects.get(user=self.citizen).points, 20)
+
+        out = StringIO()
+        call_command('recalculate_points', batch_size=1, stdout=out)
+        self.assertIn('2 alteradas', out.getvalue())
+        # 15 + 4 pontos pelas novas regras
+        self.assertEqual(Profile.objects.get(user=self.citizen).points, 19)
+        self.assertEqual(
+            [Collection.objects.get(pk=c.pk).points_awarded for c in collections], [15, 4]
+        )
+        self.assertEqual(
+            PointsTransaction.objects.filter(user=self.citizen).aggregate(total=Sum('points_gained'))['total'], 19
+        )
+        # Um ajuste por lote: +5 no vidro e -6 no PET
+        stats = statistics_for(self.citizen)
+        self.assertEqual((stats['points_earned'], stats['points_spent']), (25, 6))
+
+        out = StringIO()
+        call_command('recalculate_points', stdout=out)
+        self.assertIn('0 alteradas', out.getvalue())
+
+    def test_overlapping_rescores_apply_each_adjustment_once(self):
+        collection = self.process('Vidro', weight=Decimal('3'))
+        with self.captureOnCommitCallbacks(execute=True):
+            PointsRule.objects.create(residue_type='Vidro', points_per_kg=Decimal('5'))
+        # Página lida por duas execuções antes de qualquer uma aplicar
+        rows = list(Collection.objects.filter(pk=collection.pk).values_list(*RECALCULATE_COLUMNS))
+
+        self.assertEqual(rescore_collections(rows), ({collection.pk: 15}, {self.citizen.pk: 5}))
+        self.assertEqual(rescore_collections(rows), ({}, {}))
+        self.assertEqual(Profile.objects.get(user=self.citizen).points, 15)
+        self.assertEqual(PointsTransaction.objects.filter(user=self.citizen).count(), 2)
+
+
+class ResidueTypeCatalogTest(TestCase):
+    def setUp(self):
+        # Tipos criados aqui são revertidos sem signal: descarta o índice compilado
+        invalidate_types()
+        self.addCleanup(invalidate_types)
+        self.client = Client()
+        self.citizen = User.objects.create_user(username='citizen', password='password')
+        self.client.login(username='citizen', password='password')
+
+    def create_residue(self, residue_type):
+        self.client.post(reverse('core:residue_create'), {
+            'residue_type': residue_type, 'units': 1, 'location': 'Rua A',
+        })
+        return Residue.objects.filter(citizen=self.citizen).latest('id')
+
+    def test_spellings_map_to_one_catalog_entry(self):
+        residues = [self.create_residue(name) for name in ('Garrafa PET', '  garrafa   pet', 'GARRÁFA Pet')]
+        self.assertEqual(ResidueType.objects.count(), 1)
+        self.assertEqual({residue.catalog_type.name for residue in residues}, {'Garrafa PET'})
+        self.assertEqual({residue.residue_type for residue in residues}, {'Garrafa PET'})
+        self.assertFalse(ResidueType.objects.get().is_reviewed)
+        # Texto todo em minúsculas ganha a inicial maiúscula no catálogo
+        self.assertEqual(self.create_residue('óleo de  cozinha').residue_type, 'Óleo de cozinha')
+
+        ResidueType.objects.filter(name='Garrafa PET').update(aliases='PET\nGarrafinha')
+        invalidate_types()
+        self.assertEqual(self.create_residue('pet').residue_type, 'Garrafa PET')
+
+    def test_names_without_key_are_rejected(self):
+        response = self.client.post(reverse('core:residue_create'), {
+            'residue_type': '\u0301', 'units': 1, 'location': 'Rua A',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Informe um tipo de resíduo válido.', response.context['form'].errors['residue_type'])
+
+        rows = 'residue_type,weight,units,location,collection_date\n\u0301,1,,Rua A,\nVidro,1,,Rua B,\n'
+        result = import_residues(StringIO(rows), self.citizen)
+        self.assertEqual(result.created, 1)
+        self.assertEqual([line for line, _ in result.errors], [2])
+        self.assertFalse(Residue.objects.exclude(residue_type='Vidro').exists())
+        with self.assertRaises(ValueError):
+            resolve_types(['\u0301'])
+
+    def test_import_resolves_each_batch_at_once(self):
+        rows = 'residue_type,weight,units,location,collection_date\n' + 'Vidro,1,,Rua A,\nvidro ,1,,Rua B,\n' * 3
+        result = import_residues(StringIO(rows), self.citizen, batch_size=4)
+        self.assertEqual(result.created, 6)
+        vidro = ResidueType.objects.get()
+        self.assertEqual(vidro.residues.count(), 6)
+        self.assertEqual(set(Residue.objects.values_list('residue_type', flat=True)), {'Vidro'})
+
+    def test_autocomplete(self):
+        ResidueType.objects.bulk_create([
+            ResidueType(name='Papel', key='papel', is_reviewed=True),
+            ResidueType(name='Papelão', key='papelao', is_reviewed=True),
+            ResidueType(name='Garrafa PET', key='garrafa pet', aliases='PET', is_reviewed=True),
+            ResidueType(name='Plástico', key='plastico', is_reviewed=True),
+            # Criado pelo texto de um cidadão, ainda sem revisão: reconhecido, mas não sugerido
+            ResidueType(name='Pano velho', key='pano velho'),
+        ])
+        url = reverse('core:residue_type_autocomplete')
+
+        data = self.client.get(url, {'q': 'PA'}).json()
+        self.assertEqual([item['name'] for item in data['results']], ['Papel', 'Papelão'])
+        self.assertIsNone(data['match'])
+
+        data = self.client.get(url, {'q': 'pet'}).json()
+        self.assertEqual([item['name'] for item in data['results']], ['Garrafa PET'])
+        self.assertEqual(data['match']['name'], 'Garrafa PET')
+
+        self.assertEqual([name for _, name in get_index().complete('plast')], ['Plástico'])
+        # O índice fica em memória até a próxima alteração do catálogo
+        with self.assertNumQueries(0):
+            get_index().complete('pa')
+        self.assertEqual(get_index().match('PANO VELHO')[1], 'Pano velho')
+        with self.captureOnCommitCallbacks(execute=True):
+            ResidueType.objects.create(name='Pano', key='pano', is_reviewed=True)
+        self.assertEqual([name for _, name in get_index().complete('pa')], ['Pano', 'Papel', 'Papelão'])
+
+    def test_migration_maps_existing_strings(self):
+        migration = importlib.import_module('core.migrations.0014_residue_type_catalog')
+        # Resíduos anteriores ao catálogo: bulk_create não passa pelo pre_save que liga o tipo
+        Residue.objects.bulk_create([
+            Residue(citizen=self.citizen, residue_type=name, units=1, location='Rua A')
+            for name in ('Garrafa PET', 'Garrafa PET', 'garrafa  pet', 'Vidro', 'vídro', '\u0301')
+        ])
+
+        with mock.patch.object(migration, 'BATCH_SIZE', 2):
+            migration.map_residue_types(apps, None)
+
+        self.assertEqual(sorted(ResidueType.objects.values_list('name', 'key')), [
+            ('Garrafa PET', 'garrafa pet'), ('Não informado', 'nao informado'), ('Vidro', 'vidro'),
+        ])
+        self.assertFalse(Residue.objects.filter(catalog_type__isnull=True).exists())
+        self.assertEqual(ResidueType.objects.get(key='vidro').residues.count(), 2)
+        # O texto dos resíduos passa a ser o nome do catálogo
+        self.assertEqual(
+            sorted(Residue.objects.values_list('residue_type', flat=True)),
+            ['Garrafa PET'] * 3 + ['Não informado', 'Vidro', 'Vidro'],
+        )
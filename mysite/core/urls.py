@@ -12,18 +12,33 @@ urlpatterns = [
     # --- Fluxo do Cidadão ---
     path('cidadao/residuos/', views.residue_list, name='residue_list'),
     path('cidadao/residuos/cadastrar/', views.residue_create, name='residue_create'),
+    path('cidadao/residuos/importar/', views.residue_import, name='residue_import'),
+    path('cidadao/residuos/tipos/', views.residue_type_autocomplete, name='residue_type_autocomplete'),
     path('cidadao/residuos/<int:residue_id>/solicitar-coleta/', views.request_collection, name='request_collection'),
     path('cidadao/coletas/', views.collection_status, name='collection_status'),
+    path('cidadao/coletas/alteracoes/', views.collection_changes, name='collection_changes'),
     path('cidadao/pontos/', views.points_history, name='points_history'),
     path('cidadao/recompensas/', views.rewards_list, name='rewards_list'),
     path('cidadao/recompensas/<int:reward_id>/resgatar/', views.redeem_reward, name='redeem_reward'),
 
     # --- Fluxo do Coletor ---
     path('coletor/dashboard/', views.collector_dashboard, name='collector_dashboard'),
+    path('coletor/coletas/novidades/', views.collection_updates, name='collection_updates'),
+    path('coletor/coletas/eventos/', views.collection_events, name='collection_events'),
+    path('coletor/rota/', views.collector_route, name='collector_route'),
+    path('coletor/coletas/aceitar-proximas/', views.claim_next, name='claim_next'),
     path('coletor/coletas/<int:collection_id>/aceitar/', views.accept_collection, name='accept_collection'),
     path('coletor/coletas/<int:collection_id>/transicao/', views.collection_transition, name='collection_transition'),
+    path('coletor/coletas/transicao-em-lote/', views.bulk_collection_transition, name='bulk_collection_transition'),
 
     # --- Fluxo da Recicladora ---
     path('recicladora/dashboard/', views.recycler_dashboard, name='recycler_dashboard'),
     path('recicladora/coletas/<int:collection_id>/processar/', views.process_collection, name='process_collection'),
+    path('recicladora/coletas/processar-em-lote/', views.bulk_process, name='bulk_process'),
+    path('recicladora/exportar/coletas/', views.export_collections, name='export_collections'),
+
+    # --- Administração ---
+    path('administracao/recompensas/importar/', views.reward_import, name='reward_import'),
+    path('administracao/exportar/extrato/', views.export_ledger, name='export_ledger'),
+    path('administracao/metricas/', views.request_metrics, name='request_metrics'),
 ]
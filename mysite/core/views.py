@@ -1,13 +1,38 @@
+import asyncio
+import csv
+import io
+import json
+from functools import wraps
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
-from django.http import HttpResponseForbidden
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login
 from django.db import transaction
 from django.contrib import messages
 from django.utils import timezone
-from .models import Residue, Collection, Profile, PointsTransaction, Reward, UserReward
-from .forms import CustomUserCreationForm, ResidueForm, CollectionStatusForm
+from django.db.models import Count, Max
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from .models import Residue, Collection, Profile, PointsTransaction, Reward
+from .catalog import split_by_affordability
+from .events import COLLECTIONS_CHANNEL, get_broker, publish_collection_events
+from . import exports, imports, metrics
+from .stats import astatistics_for, statistics_for
+from .forms import CustomUserCreationForm, ResidueForm, CollectionStatusForm, CSVImportForm
+from .geo import geocode, set_coordinates
+from .pagination import apaginate_keyset, decode_cursor, encode_cursor, paginate_keyset
+from .points import get_evaluator
+from .residue_types import get_index
+from .routing import nearest_open_collections, suggest_route
+from .services import (
+    bulk_process_collections, bulk_transition_collections,
+    claim_collection, claim_next_collections, claim_reward, enqueue_processed_credit, sync_residue_status,
+)
 
 # --- Views Públicas e de Autenticação ---
 
@@ -41,37 +66,56 @@ def signup(request):
         form = CustomUserCreationForm()
     return render(request, 'registration/signup.html', {'form': form})
 
+async def _alist(queryset):
+    """
+    Avalia o queryset com o ORM assíncrono, para views async.
+    """
+    return [obj async for obj in queryset.aiterator()]
+
 # --- Decorators de Verificação de Perfil ---
 
-def citizen_required(view_func):
-    @login_required
-    def _wrapped_view(request, *args, **kwargs):
-        if request.user.profile.user_type != 'C':
-            return HttpResponseForbidden("Acesso negado. Apenas para cidadãos.")
-        return view_func(request, *args, **kwargs)
-    return _wrapped_view
-
-def collector_required(view_func):
-    @login_required
-    def _wrapped_view(request, *args, **kwargs):
-        if request.user.profile.user_type != 'L':
-            return HttpResponseForbidden("Acesso negado. Apenas para coletores.")
-        return view_func(request, *args, **kwargs)
-    return _wrapped_view
-
-def recycler_required(view_func):
-    @login_required
-    def _wrapped_view(request, *args, **kwargs):
-        if request.user.profile.user_type != 'R':
-            return HttpResponseForbidden("Acesso negado. Apenas para recicladoras.")
-        return view_func(request, *args, **kwargs)
-    return _wrapped_view
+def _role_required(user_type, message):
+    """
+    Restringe a view a usuários autenticados com o perfil `user_type`.
+    Aceita views síncronas e assíncronas.
+    """
+    def decorator(view_func):
+        if asyncio.iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _async_wrapped_view(request, *args, **kwargs):
+                user = await request.auser()
+                if not user.is_authenticated:
+                    return redirect_to_login(request.get_full_path())
+                # Substitui o request.user preguiçoso, que consultaria o banco
+                # de forma síncrona ao ser usado na view ou no template
+                request.user = user
+                if await sync_to_async(lambda: user.profile.user_type)() != user_type:
+                    return HttpResponseForbidden(message)
+                return await view_func(request, *args, **kwargs)
+            return _async_wrapped_view
+
+        @login_required
+        def _wrapped_view(request, *args, **kwargs):
+            if request.user.profile.user_type != user_type:
+                return HttpResponseForbidden(message)
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
+
+citizen_required = _role_required('C', "Acesso negado. Apenas para cidadãos.")
+collector_required = _role_required('L', "Acesso negado. Apenas para coletores.")
+recycler_required = _role_required('R', "Acesso negado. Apenas para recicladoras.")
 
 # --- Fluxo do Cidadão (Existente) ---
 @citizen_required
 def residue_list(request):
-    residues = Residue.objects.filter(citizen=request.user).order_by('-created_at')
-    return render(request, 'core/residue_list.html', {'residues': residues})
+    residues = paginate_keyset(
+        Residue.objects.filter(citizen=request.user),
+        request.GET.get('cursor'),
+        '-created_at',
+    )
+    context = {'residues': residues, 'statistics': statistics_for(request.user)}
+    return render(request, 'core/residue_list.html', context)
 
 @citizen_required
 def residue_create(request):
@@ -80,6 +124,7 @@ def residue_create(request):
         if form.is_valid():
             residue = form.save(commit=False)
             residue.citizen = request.user
+            set_coordinates(residue)
             residue.save()
             messages.success(request, 'Resíduo cadastrado com sucesso! Agora você pode solicitar a coleta.')
             return redirect('core:residue_list')
@@ -87,6 +132,66 @@ def residue_create(request):
         form = ResidueForm()
     return render(request, 'core/residue_form.html', {'form': form})
 
+@citizen_required
+@cache_control(private=True, max_age=60)
+def residue_type_autocomplete(request):
+    """
+    Tipos do catálogo para o texto de `?q=`, em JSON: `match` é o tipo em que
+    o texto digitado seria gravado (ou null, se viraria um tipo novo) e
+    `results`, as sugestões cujas palavras começam pelo texto.
+
+    A resposta vem do índice em memória (core.residue_types), sem consultas
+    ao banco enquanto o catálogo não muda.
+    """
+    query = request.GET.get('q', '')[:100]
+    index = get_index()
+    match = index.match(query)
+    return JsonResponse({
+        'match': {'id': match[0], 'name': match[1]} if match else None,
+        'results': [{'id': type_id, 'name': name} for type_id, name in index.complete(query)],
+    })
+
+# Erros de importação exibidos na página; o total aparece no resumo
+MAX_IMPORT_ERRORS_SHOWN = 100
+
+def _csv_import(request, run_import, context):
+    """
+    Trata o upload de um CSV: lê o arquivo em streaming, importa com
+    `run_import(linhas)` e exibe o resumo e os erros por linha.
+    """
+    result = None
+    if request.method == 'POST':
+        form = CSVImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            lines = io.TextIOWrapper(form.cleaned_data['file'], encoding='utf-8-sig', newline='')
+            try:
+                result = run_import(lines)
+            except (ValueError, csv.Error) as error:
+                form.add_error('file', f'Arquivo inválido: {error}. Nenhuma linha foi importada.')
+            else:
+                messages.success(request, f'{result.created} linha(s) importada(s).')
+                if result.errors:
+                    messages.error(request, f'{result.rejected} linha(s) recusada(s); veja os erros abaixo.')
+    else:
+        form = CSVImportForm()
+    context.update({
+        'form': form,
+        'result': result,
+        'errors': result.errors[:MAX_IMPORT_ERRORS_SHOWN] if result else [],
+    })
+    return render(request, 'core/csv_import.html', context)
+
+@citizen_required
+def residue_import(request):
+    """
+    Cadastro de vários resíduos de uma vez a partir de um CSV.
+    """
+    return _csv_import(request, lambda lines: imports.import_residues(lines, request.user), {
+        'title': 'Importar Resíduos',
+        'columns': imports.RESIDUE_COLUMNS,
+        'back_url': reverse('core:residue_list'),
+    })
+
 @citizen_required
 @transaction.atomic
 def request_collection(request, residue_id):
@@ -94,24 +199,95 @@ def request_collection(request, residue_id):
     if residue.status != 'AGUARDANDO_SOLICITACAO_DE_COLETA':
         messages.error(request, 'Este resíduo já teve sua coleta solicitada ou finalizada.')
         return redirect('core:residue_list')
-    Collection.objects.create(residue=residue, status='SOLICITADA')
+    collection = Collection.objects.create(residue=residue, status='SOLICITADA')
+    publish_collection_events('created', [collection.id])
     residue.status = 'COLETA_SOLICITADA'
-    residue.save()
+    residue.save(update_fields=['status'])
     messages.success(request, 'Coleta solicitada com sucesso!')
     return redirect('core:collection_status')
 
 @citizen_required
-def collection_status(request):
-    collections = Collection.objects.filter(residue__citizen=request.user).order_by('-updated_at')
+async def collection_status(request):
+    collections = await apaginate_keyset(
+        Collection.objects.for_citizen_status().filter(residue__citizen=request.user),
+        request.GET.get('cursor'),
+        '-updated_at',
+    )
     return render(request, 'core/collection_status.html', {'collections': collections})
 
+CHANGES_PAGE_SIZE = 100
+
+def _collection_changes_state(request):
+    """
+    (maior updated_at, quantidade) das coletas do cidadão, em uma consulta
+    agregada; calculado uma vez por requisição para o ETag.
+    """
+    if not hasattr(request, '_collection_changes_state'):
+        request._collection_changes_state = Collection.objects.filter(
+            residue__citizen=request.user
+        ).aggregate(last_update=Max('updated_at'), total=Count('id'))
+    return request._collection_changes_state
+
+def _collection_changes_etag(request):
+    state = _collection_changes_state(request)
+    last_update = state['last_update'].isoformat() if state['last_update'] else ''
+    return f'{request.user.pk}:{last_update}:{state["total"]}'
+
 @citizen_required
-def points_history(request):
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_collection_changes_etag)
+def collection_changes(request):
+    """
+    Coletas do cidadão alteradas depois de `?since=` (cursor da resposta
+    anterior), em JSON, da mais antiga para a mais recente alteração.
+
+    O ETag vem de um único `Max('updated_at')` com a contagem: se nada
+    mudou desde a última consulta, a resposta é 304 sem carregar as coletas.
+    Não há Last-Modified: com resolução de segundos, ele responderia 304 a
+    um If-Modified-Since e esconderia alterações feitas no mesmo segundo.
+    O cursor devolvido deve ser enviado no próximo `since`; `has_more` indica
+    que há mais alterações a buscar imediatamente.
+    """
+    since = request.GET.get('since')
+    page = paginate_keyset(
+        Collection.objects.for_citizen_status().filter(residue__citizen=request.user),
+        since,
+        'updated_at',
+        page_size=CHANGES_PAGE_SIZE,
+    )
+    if page:
+        last = page.object_list[-1]
+        cursor = encode_cursor(last.updated_at, last.pk)
+    else:
+        cursor = since if decode_cursor(since) else None
+    return JsonResponse({
+        'collections': [
+            {
+                'id': collection.id,
+                'status': collection.status,
+                'status_display': collection.get_status_display(),
+                'residue_type': collection.residue.residue_type,
+                'location': collection.residue.location,
+                'created_at': collection.created_at,
+                'updated_at': collection.updated_at,
+            }
+            for collection in page
+        ],
+        'cursor': cursor,
+        'has_more': page.has_next,
+    })
+
+@citizen_required
+async def points_history(request):
     """
     Exibe o saldo de pontos e o histórico de transações do cidadão.
     """
     profile = request.user.profile
-    transactions = PointsTransaction.objects.filter(user=request.user).order_by('-transaction_date')
+    transactions = await apaginate_keyset(
+        PointsTransaction.objects.filter(user=request.user),
+        request.GET.get('cursor'),
+        '-transaction_date',
+    )
     
     context = { 
         'profile': profile,
@@ -121,81 +297,236 @@ def points_history(request):
 
 # --- Sistema de Recompensas ---
 @citizen_required
-def rewards_list(request):
+async def rewards_list(request):
     """
     Lista todas as recompensas ativas que o cidadão pode resgatar.
     """
-    rewards = Reward.objects.filter(is_active=True).order_by('points_required')
     user_points = request.user.profile.points
+    affordable_rewards, unaffordable_rewards = await sync_to_async(split_by_affordability)(user_points)
     context = {
-        'rewards': rewards,
+        'affordable_rewards': affordable_rewards,
+        'unaffordable_rewards': unaffordable_rewards,
         'user_points': user_points,
     }
     return render(request, 'core/rewards_list.html', context)
 
 @citizen_required
-@transaction.atomic
 def redeem_reward(request, reward_id):
     """
-    Processa o resgate de uma recompensa, se o usuário tiver pontos suficientes.
+    Processa o resgate de uma recompensa, respeitando saldo, estoque e limite por usuário.
     """
+    # Lida fora da transação do resgate, que começa direto pelos UPDATEs
     reward = get_object_or_404(Reward, id=reward_id, is_active=True)
-    profile = request.user.profile
-    
-    if profile.points >= reward.points_required:
-        # Deduz os pontos
-        profile.points -= reward.points_required
-        profile.save()
-        
-        # Registra o resgate
-        UserReward.objects.create(user=request.user, reward=reward)
-        
-        # Opcional: registrar a transação de "gasto" de pontos
-        PointsTransaction.objects.create(
-            user=request.user,
-            points_gained=-reward.points_required,
-            description=f'Resgate da recompensa: {reward.name}'
-        )
-        
+
+    user_reward, error = claim_reward(request.user, reward)
+    if user_reward is not None:
         messages.success(request, f'Parabéns! Você resgatou a recompensa "{reward.name}".')
     else:
-        messages.error(request, 'Você não tem pontos suficientes para resgatar esta recompensa.')
-        
+        messages.error(request, error)
+
     return redirect('core:rewards_list')
 
 # --- Fluxo do Coletor (Existente) ---
+CLAIM_NEXT_DEFAULT = 5
+CLAIM_NEXT_MAX = 50
+
+def _origin(request):
+    """
+    Posição informada pelo coletor: `lat`/`lng` (geolocalização do navegador)
+    ou um endereço em `perto`. Retorna (latitude, longitude) ou None.
+    """
+    try:
+        latitude, longitude = float(request.GET['lat']), float(request.GET['lng'])
+    except (KeyError, ValueError):
+        return geocode(request.GET.get('perto', ''))
+    if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+        return latitude, longitude
+    return None
+
 @collector_required
-def collector_dashboard(request):
-    available_collections = Collection.objects.filter(status='SOLICITADA').order_by('created_at')
+async def collector_dashboard(request):
+    # Lido antes das consultas: eventos posteriores chegam pelo feed
+    feed_cursor = get_broker().latest(COLLECTIONS_CHANNEL)
+    origin = _origin(request)
+    if origin is not None:
+        # Coletas mais próximas do coletor, em vez da fila por data
+        available = sync_to_async(nearest_open_collections)(*origin)
+    else:
+        available = apaginate_keyset(
+            Collection.objects.for_collector_dashboard().filter(status='SOLICITADA'),
+            request.GET.get('cursor'),
+            'created_at',
+        )
     my_collections_status = ['ATRIBUIDA', 'EM_ROTA', 'COLETADA']
-    my_collections = Collection.objects.filter(
-        collector=request.user,
-        status__in=my_collections_status
-    ).order_by('-updated_at')
-    context = {'available_collections': available_collections, 'my_collections': my_collections}
+    available_collections, my_collections = await asyncio.gather(available, _alist(
+        Collection.objects.for_collector_dashboard().filter(
+            collector=request.user,
+            status__in=my_collections_status
+        ).order_by('-updated_at')
+    ))
+    context = {
+        'available_collections': available_collections,
+        'my_collections': my_collections,
+        'feed_cursor': feed_cursor,
+        'origin': origin,
+        'near': request.GET.get('perto', ''),
+    }
     return render(request, 'core/collector_dashboard.html', context)
 
 @collector_required
-@transaction.atomic
+def collector_route(request):
+    """
+    Ordem sugerida para visitar as coletas atribuídas ao coletor.
+    """
+    origin = _origin(request)
+    stops, total_km = suggest_route(request.user, *(origin or (None, None)))
+    context = {'stops': stops, 'total_km': total_km, 'origin': origin, 'near': request.GET.get('perto', '')}
+    return render(request, 'core/collector_route.html', context)
+
+# --- Feed de Coletas em Aberto (ASGI) ---
+LONG_POLL_SECONDS = 25
+SSE_KEEPALIVE_SECONDS = 15
+SSE_MAX_SECONDS = 300
+
+def _feed_params(request, max_timeout):
+    """
+    Cursor (o cabeçalho Last-Event-ID, enviado pelo EventSource ao reconectar,
+    ou `?cursor=`) e tempo
+    de espera (`?timeout=`, limitado a `max_timeout`) das views do feed.
+    """
+    cursor = request.headers.get('Last-Event-ID') or request.GET.get('cursor')
+    try:
+        cursor = int(cursor) if cursor else None
+    except ValueError:
+        cursor = None
+    try:
+        timeout = min(max(float(request.GET.get('timeout', max_timeout)), 0), max_timeout)
+    except ValueError:
+        timeout = max_timeout
+    return cursor, timeout
+
+async def _serialize_events(events):
+    """
+    Converte eventos do broker no formato enviado aos coletores, carregando
+    em uma consulta os dados das coletas criadas que ainda estão em aberto.
+    """
+    created_ids = [event['collection_id'] for event in events if event['type'] == 'created']
+    collections = {}
+    if created_ids:
+        queryset = Collection.objects.for_collector_dashboard().filter(id__in=created_ids, status='SOLICITADA')
+        collections = {collection.id: collection async for collection in queryset}
+
+    serialized = []
+    for event in events:
+        item = {'id': event['id'], 'type': event['type'], 'collection_id': event['collection_id']}
+        if event['type'] == 'created':
+            collection = collections.get(event['collection_id'])
+            if collection is None:
+                # Já foi aceita; o evento 'claimed' correspondente também é entregue
+                continue
+            item['collection'] = {
+                'residue_type': collection.residue.residue_type,
+                'location': collection.residue.location,
+                'created_at': timezone.localtime(collection.created_at).strftime('%d/%m/%Y'),
+                'accept_url': reverse('core:accept_collection', args=[collection.id]),
+            }
+        serialized.append(item)
+    return serialized
+
+@collector_required
+async def collection_updates(request):
+    """
+    Long-poll das novidades do pool de coletas desde `?cursor=`.
+
+    Responde assim que houver eventos ou após `timeout` segundos, com
+    {"cursor", "events"}. Sem cursor, responde na hora com o cursor atual;
+    com um cursor que o broker não conhece mais, responde {"reset": true}
+    para que o cliente recarregue a lista inteira.
+    """
+    broker = get_broker()
+    cursor, timeout = _feed_params(request, LONG_POLL_SECONDS)
+    if cursor is None:
+        return JsonResponse({'cursor': broker.latest(COLLECTIONS_CHANNEL), 'events': []})
+    events, latest = await broker.wait(COLLECTIONS_CHANNEL, cursor, timeout)
+    if events is None:
+        return JsonResponse({'cursor': latest, 'events': [], 'reset': True})
+    return JsonResponse({'cursor': events[-1]['id'] if events else cursor, 'events': await _serialize_events(events)})
+
+@collector_required
+async def collection_events(request):
+    """
+    Server-sent events com as coletas criadas e aceitas no pool em aberto.
+
+    A conexão é encerrada após `?timeout=` segundos (no máximo
+    SSE_MAX_SECONDS); o EventSource reconecta sozinho e retoma do último
+    evento recebido pelo cabeçalho Last-Event-ID.
+    """
+    broker = get_broker()
+    cursor, lifetime = _feed_params(request, SSE_MAX_SECONDS)
+    if cursor is None:
+        cursor = broker.latest(COLLECTIONS_CHANNEL)
+
+    async def stream(cursor):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + lifetime
+        yield 'retry: 3000\n\n'
+        while (remaining := deadline - loop.time()) > 0:
+            events, _ = await broker.wait(COLLECTIONS_CHANNEL, cursor, min(SSE_KEEPALIVE_SECONDS, remaining))
+            if events is None:
+                yield 'event: reset\ndata: {}\n\n'
+                return
+            if not events:
+                yield ': keep-alive\n\n'
+                continue
+            for item in await _serialize_events(events):
+                yield f'id: {item["id"]}\nevent: {item["type"]}\ndata: {json.dumps(item)}\n\n'
+            cursor = events[-1]['id']
+
+    response = StreamingHttpResponse(stream(cursor), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@collector_required
 def accept_collection(request, collection_id):
     if request.method != 'POST':
         return HttpResponseForbidden("Acesso negado.")
 
-    collection = get_object_or_404(Collection, id=collection_id)
+    residue_type = get_object_or_404(
+        Residue.objects.values_list('residue_type', flat=True), collection__id=collection_id
+    )
 
-    if collection.status != 'SOLICITADA':
+    if not claim_collection(collection_id, request.user):
         messages.error(request, 'Esta coleta não está mais disponível.')
         return redirect('core:collector_dashboard')
 
-    collection.collector = request.user
-    collection.status = 'ATRIBUIDA'
-    collection.save()
-    messages.success(request, f'Coleta do resíduo "{collection.residue.residue_type}" atribuída a você!')
+    messages.success(request, f'Coleta do resíduo "{residue_type}" atribuída a você!')
+    return redirect('core:collector_dashboard')
+
+@collector_required
+def claim_next(request):
+    """
+    Atribui ao coletor as próximas coletas em aberto, das mais antigas para as mais novas.
+    """
+    if request.method != 'POST':
+        return HttpResponseForbidden("Acesso negado.")
+
+    try:
+        quantity = int(request.POST.get('quantity', CLAIM_NEXT_DEFAULT))
+    except ValueError:
+        quantity = CLAIM_NEXT_DEFAULT
+    quantity = max(1, min(quantity, CLAIM_NEXT_MAX))
+
+    claimed = claim_next_collections(request.user, quantity)
+    if claimed:
+        messages.success(request, f'{len(claimed)} coleta(s) atribuída(s) a você!')
+    else:
+        messages.error(request, 'Não há coletas disponíveis no momento.')
     return redirect('core:collector_dashboard')
 
 @collector_required
 def collection_transition(request, collection_id):
-    collection = get_object_or_404(Collection, id=collection_id)
+    collection = get_object_or_404(Collection.objects.select_related('residue'), id=collection_id)
 
     # Garante que apenas o coletor responsável ou um coletor novo (para coletas 'SOLICITADA')
     # possa acessar esta view.
@@ -204,9 +535,19 @@ def collection_transition(request, collection_id):
         return redirect('core:collector_dashboard')
 
     if request.method == 'POST':
+        previous_status = collection.status
         form = CollectionStatusForm(request.POST, instance=collection, user=request.user)
         if form.is_valid():
-            form.save()
+            if previous_status == 'SOLICITADA' and form.cleaned_data['status'] == 'ATRIBUIDA':
+                # A atribuição concorre com outros coletores: usa o UPDATE condicional
+                if not claim_collection(collection.id, request.user):
+                    messages.error(request, 'Esta coleta não está mais disponível.')
+                    return redirect('core:collector_dashboard')
+            else:
+                # Coleta e resíduo mudam juntos, como em bulk_transition_collections
+                with transaction.atomic():
+                    form.save()
+                    sync_residue_status([collection.id], statuses=[collection.status])
             messages.success(request, 'Status da coleta atualizado com sucesso.')
             return redirect('core:collector_dashboard')
     else:
@@ -215,60 +556,174 @@ def collection_transition(request, collection_id):
     context = {'form': form, 'collection': collection}
     return render(request, 'core/collection_transition.html', context)
 
+BULK_TRANSITION_STATUSES = ('EM_ROTA', 'COLETADA', 'ENTREGUE_RECICLADORA')
+
+def _selected_ids(request):
+    """
+    Lê os ids marcados nos checkboxes `collection_ids`, ignorando valores inválidos.
+    """
+    ids = []
+    for value in request.POST.getlist('collection_ids'):
+        try:
+            ids.append(int(value))
+        except ValueError:
+            continue
+    return ids
+
+def _report_bulk_result(request, done, rejected, success_message):
+    if done:
+        messages.success(request, success_message.format(count=len(done)))
+    for collection_id, reason in sorted(rejected.items()):
+        messages.error(request, f'Coleta #{collection_id}: {reason}')
+
+@collector_required
+def bulk_collection_transition(request):
+    """
+    Atualiza o status de várias coletas do coletor de uma só vez.
+    """
+    if request.method != 'POST':
+        return HttpResponseForbidden("Acesso negado.")
+
+    next_status = request.POST.get('status')
+    ids = _selected_ids(request)
+    if next_status not in BULK_TRANSITION_STATUSES or not ids:
+        messages.error(request, 'Selecione as coletas e um status válido.')
+        return redirect('core:collector_dashboard')
+
+    updated, rejected = bulk_transition_collections(request.user, ids, next_status)
+    _report_bulk_result(request, updated, rejected, '{count} coleta(s) atualizada(s) com sucesso.')
+    return redirect('core:collector_dashboard')
+
 # --- Fluxo da Recicladora ---
 
 @recycler_required
-def recycler_dashboard(request):
+async def recycler_dashboard(request):
     """
     Dashboard da recicladora, mostrando coletas entregues e prontas para processamento.
     """
-    collections_to_process = Collection.objects.filter(status='ENTREGUE_RECICLADORA').order_by('updated_at')
-    processed_collections = Collection.objects.filter(status='PROCESSADO').order_by('-processed_at')[:10] # Mostra as 10 últimas
-    
+    collections_to_process, processed_collections, statistics = await asyncio.gather(
+        apaginate_keyset(
+            Collection.objects.for_recycler_dashboard().filter(status='ENTREGUE_RECICLADORA'),
+            request.GET.get('cursor'),
+            'updated_at',
+        ),
+        _alist(Collection.objects.for_recycler_dashboard().filter(
+            status='PROCESSADO'
+        ).order_by('-processed_at')[:10]), # Mostra as 10 últimas
+        astatistics_for(request.user, include_points=False),
+    )
+
     context = {
         'collections_to_process': collections_to_process,
         'processed_collections': processed_collections,
+        'statistics': statistics,
     }
     return render(request, 'core/recycler_dashboard.html', context)
 
 @recycler_required
 @transaction.atomic
 def process_collection(request, collection_id):
-    collection = get_object_or_404(
-        Collection.objects.select_related('residue__citizen__profile'),
-        id=collection_id,
-        status='ENTREGUE_RECICLADORA'
-    )
-    
+    queryset = Collection.objects.select_related('residue__citizen', 'collector')
+    if request.method == 'POST':
+        # Trava a coleta para que dois processamentos simultâneos não concedam pontos em dobro
+        queryset = queryset.select_for_update(of=('self',))
+    collection = get_object_or_404(queryset, id=collection_id, status='ENTREGUE_RECICLADORA')
+
     if request.method == 'POST':
         residue = collection.residue
-        citizen_profile = residue.citizen.profile
-        
-        # Define a quantidade de pontos a serem ganhos
-        points_to_award = 10  # Exemplo: 10 pontos por coleta processada
-        
-        # Adiciona os pontos ao perfil do cidadão
-        citizen_profile.points += points_to_award
-        
-        # Cria um registro da transação de pontos
-        PointsTransaction.objects.create(
-            user=residue.citizen,
-            points_gained=points_to_award,
-            description=f'Coleta de {residue.residue_type} processada.'
-        )
-        
+
         # Atualiza o status da coleta
         collection.status = 'PROCESSADO'
         collection.processed_at = timezone.now()
-        
-        # Salva todas as alterações
-        collection.save()
-        citizen_profile.save()
-        
-        messages.success(request, f'O resíduo "{residue.residue_type}" foi processado e {points_to_award} pontos foram concedidos ao cidadão.')
+        collection.processed_by = request.user
+        collection.save(update_fields=['status', 'processed_at', 'processed_by', 'updated_at'])
+        sync_residue_status([collection.id], statuses=['PROCESSADO'])
+
+        # Pontos, extrato, estatísticas e notificação ficam para o worker
+        enqueue_processed_credit([collection.id], request.user.id)
+
+        points = get_evaluator().score(residue.residue_type, residue.weight, residue.units, collection.processed_at)
+        messages.success(request, f'O resíduo "{residue.residue_type}" foi processado; {points} pontos serão creditados ao cidadão em instantes.')
         return redirect('core:recycler_dashboard')
         
     context = {
         'collection': collection
     }
     return render(request, 'core/process_collection.html', context)
+
+@recycler_required
+def bulk_process(request):
+    """
+    Processa de uma só vez as coletas entregues selecionadas pela recicladora.
+    """
+    if request.method != 'POST':
+        return HttpResponseForbidden("Acesso negado.")
+
+    ids = _selected_ids(request)
+    if not ids:
+        messages.error(request, 'Selecione ao menos uma coleta para processar.')
+        return redirect('core:recycler_dashboard')
+
+    processed, rejected = bulk_process_collections(ids, request.user)
+    _report_bulk_result(
+        request, processed, rejected,
+        '{count} coleta(s) processada(s); os pontos serão creditados aos cidadãos em instantes.',
+    )
+    return redirect('core:recycler_dashboard')
+
+@staff_member_required
+def reward_import(request):
+    """
+    Carga do catálogo de recompensas a partir de um CSV.
+    """
+    return _csv_import(request, imports.import_rewards, {
+        'title': 'Importar Recompensas',
+        'columns': imports.REWARD_COLUMNS,
+        'back_url': reverse('admin:core_reward_changelist'),
+    })
+
+# --- Exportações ---
+
+def _export_response(request, queryset_for, columns, filename):
+    """
+    Resposta em streaming com as linhas do período `?start=&end=` (AAAA-MM-DD)
+    no formato `?format=csv|json`.
+    """
+    export_format = request.GET.get('format', 'csv')
+    if export_format not in exports.EXPORT_FORMATS:
+        return HttpResponseBadRequest("Formato inválido. Use 'csv' ou 'json'.")
+    try:
+        lower, upper = exports.parse_date_range(request.GET.get('start'), request.GET.get('end'))
+    except ValueError:
+        return HttpResponseBadRequest('Datas inválidas. Use o formato AAAA-MM-DD.')
+
+    response = StreamingHttpResponse(
+        exports.stream_rows(queryset_for(lower, upper), columns, export_format),
+        content_type=exports.content_type_for(export_format),
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{export_format}"'
+    return response
+
+@recycler_required
+def export_collections(request):
+    """
+    Exporta as coletas processadas no período informado.
+    """
+    return _export_response(request, exports.processed_collections, exports.COLLECTION_COLUMNS, 'coletas-processadas')
+
+@staff_member_required
+def export_ledger(request):
+    """
+    Exporta o extrato de pontos de todos os usuários no período informado.
+    """
+    return _export_response(request, exports.ledger, exports.LEDGER_COLUMNS, 'extrato-pontos')
+
+# --- Instrumentação ---
+
+@staff_member_required
+def request_metrics(request):
+    """
+    Histogramas de latência, consultas e tempo de SQL por view, acumulados
+    por este processo desde que foi iniciado.
+    """
+    return JsonResponse({'views': metrics.registry.snapshot()})
@@ -1,8 +1,13 @@
-
 import os
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+# Lido pelas settings, que ainda não foram carregadas (ver SERVER_INTERFACE)
+os.environ.setdefault('DJANGO_SERVER_INTERFACE', 'asgi')
 
+# O feed de coletas dos coletores (core.views.collection_events e
+# collection_updates) mantém conexões abertas enquanto aguarda eventos.
+# Sirva-o por ASGI (ex.: `uvicorn mysite.asgi:application`), onde uma conexão
+# ociosa não ocupa uma thread do servidor.
 application = get_asgi_application()
@@ -35,6 +35,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primeiro, para medir também as consultas de sessão e autenticação
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,36 +48,146 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'mysite.urls'
 
+# Em produção os templates compilados ficam em memória (cached.Loader); em
+# desenvolvimento são relidos do disco a cada requisição.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.fragment_cache',
             ],
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
         },
     },
 ]
 
+# Validade (s) dos fragmentos por linha dos dashboards; as chaves incluem o
+# updated_at da coleta, então alterações nunca servem um fragmento antigo.
+TEMPLATE_FRAGMENT_TIMEOUT = int(os.environ.get('DJANGO_TEMPLATE_FRAGMENT_TIMEOUT', 60 * 60 * 24))
+
 WSGI_APPLICATION = 'mysite.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
+# SQLite por padrão. Em produção, DJANGO_DB_ENGINE=postgresql e as variáveis
+# DJANGO_DB_* abaixo; requer o pacote psycopg.
+
+DATABASE_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+
+# 'asgi' quando servido por mysite.asgi (que define a variável). O Django 5.0
+# não reaproveita conexões persistentes sob ASGI: cada requisição abriria uma
+# conexão nova que ficaria aberta, então o padrão de CONN_MAX_AGE passa a 0
+# e o reaproveitamento fica com o pool externo (ver DJANGO_DB_POOLER).
+SERVER_INTERFACE = os.environ.get('DJANGO_SERVER_INTERFACE', 'wsgi')
+
+if DATABASE_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'reciclai'),
+            'USER': os.environ.get('DJANGO_DB_USER', 'reciclai'),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DJANGO_DB_PORT', '5432'),
+            # Sob WSGI, conexões persistentes (uma por thread/worker),
+            # verificadas antes de serem reaproveitadas em uma nova requisição
+            'CONN_MAX_AGE': int(os.environ.get(
+                'DJANGO_DB_CONN_MAX_AGE', '0' if SERVER_INTERFACE == 'asgi' else '60'
+            )),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DJANGO_DB_CONNECT_TIMEOUT', '5')),
+            },
+        }
+    }
+    # Atrás de um pool externo (PgBouncer em modo transação), a conexão do
+    # servidor muda a cada transação: cursores do lado do servidor, usados
+    # por QuerySet.iterator(), precisam ser desligados.
+    if os.environ.get('DJANGO_DB_POOLER') == 'pgbouncer':
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+
+# PRAGMAs aplicados a cada nova conexão SQLite (core.signals). O WAL permite
+# leituras simultâneas a uma escrita; synchronous=NORMAL é seguro com WAL;
+# busy_timeout é quanto uma escrita espera pelo lock antes de falhar (ms).
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('DJANGO_DB_BUSY_TIMEOUT', '20000')),
+    'temp_store': 'MEMORY',
+    'cache_size': -20000,
+    'mmap_size': 134217728,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Memória local por padrão; em produção aponte DJANGO_CACHE_BACKEND e
+# DJANGO_CACHE_LOCATION para um backend compartilhado (ex.: Redis ou Memcached).
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', 'reciclai'),
     }
 }
 
 
+# Eventos do pool de coletas (feed SSE/long-poll dos coletores)
+# O broker em memória atende um único processo; com vários workers, aponte
+# DJANGO_EVENTS_BROKER para uma implementação de core.events.Broker
+# compartilhada entre eles.
+
+EVENTS_BROKER = os.environ.get('DJANGO_EVENTS_BROKER', 'core.events.InProcessBroker')
+
+
+# Instrumentação das requisições (core.middleware.RequestMetricsMiddleware)
+# Requisições acima de qualquer um dos limites vão para o log com as
+# consultas mais repetidas. O long-poll e o SSE esperam de propósito.
+
+REQUEST_METRICS_SLOW_MS = float(os.environ.get('DJANGO_SLOW_REQUEST_MS', 500))
+REQUEST_METRICS_SLOW_QUERIES = int(os.environ.get('DJANGO_SLOW_REQUEST_QUERIES', 30))
+REQUEST_METRICS_IGNORE = ['core:collection_updates', 'core:collection_events']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': os.environ.get('DJANGO_CORE_LOG_LEVEL', 'INFO')},
+    },
+}
+
+
+# Fila de tarefas em banco (core.tasks), processada por `manage.py run_worker`.
+# As notificações aos cidadãos saem por e-mail.
+
+EMAIL_BACKEND = os.environ.get('DJANGO_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('DJANGO_DEFAULT_FROM_EMAIL', 'Reciclaí <nao-responda@reciclai.local>')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -117,6 +229,11 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+AUTHENTICATION_BACKENDS = [
+    # Carrega o Profile junto com o User na mesma consulta
+    'core.backends.ProfileBackend',
+]
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'core:dashboard'
 LOGOUT_REDIRECT_URL = 'core:public_index'